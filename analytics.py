@@ -0,0 +1,123 @@
+"""
+Revenue and occupancy analytics over the route_daily_stats rollup.
+
+BookTicket and CancelTicket keep one row per route per travel date up to
+date, so every report here reads a few hundred rollup rows instead of
+scanning tickets. RebuildRouteDailyStats recomputes a date range from the
+tickets table for backfills; it runs as the "rebuild_route_stats" job.
+
+    python analytics.py rebuild --from 2026-01-01 --to 2026-12-31
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from db import ConnectionPool, create_pool
+from jobs import job_type
+
+STAT_COLUMNS = [
+    "Route_ID", "Stat_Date", "Capacity", "Bookings", "Seats_Booked", "Revenue",
+    "Cancellations", "Seats_Cancelled", "Refunds",
+]
+
+
+def load_daily_stats(pool: ConnectionPool, start: date, end: date,
+                     route_id: Optional[int] = None) -> pd.DataFrame:
+    """Rollup rows for travel dates start..end (inclusive), with derived columns."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(STAT_COLUMNS)} FROM route_daily_stats
+            WHERE Stat_Date BETWEEN %s AND %s
+            AND (%s IS NULL OR Route_ID = %s)
+            ORDER BY Stat_Date, Route_ID
+        """, (start, end, route_id, route_id))
+        rows = cursor.fetchall()
+
+    df = pd.DataFrame(rows, columns=STAT_COLUMNS)
+    df["Stat_Date"] = pd.to_datetime(df["Stat_Date"])
+    for column in ("Revenue", "Refunds"):
+        df[column] = df[column].astype(float)
+    df["Net_Revenue"] = df["Revenue"] - df["Refunds"]
+    df["Seats_Sold"] = df["Seats_Booked"] - df["Seats_Cancelled"]
+    df["Load_Factor"] = _ratio(df["Seats_Sold"], df["Capacity"])
+    return df
+
+
+def _ratio(numerator: pd.Series, denominator: pd.Series) -> np.ndarray:
+    """numerator / denominator, with 0 where the denominator is 0."""
+    num = numerator.to_numpy(dtype=float)
+    den = denominator.to_numpy(dtype=float)
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+def route_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Totals per route over the loaded range, best earning first."""
+    totals = df.groupby("Route_ID", as_index=False)[
+        ["Capacity", "Bookings", "Seats_Sold", "Net_Revenue", "Cancellations"]
+    ].sum()
+    totals["Load_Factor"] = _ratio(totals["Seats_Sold"], totals["Capacity"])
+    totals["Cancellation_Rate"] = _ratio(totals["Cancellations"], totals["Bookings"])
+    return totals.sort_values("Net_Revenue", ascending=False, ignore_index=True)
+
+
+def daily_series(df: pd.DataFrame, value: str = "Net_Revenue") -> pd.DataFrame:
+    """One row per travel date and one column per route, for charting."""
+    return df.pivot_table(index="Stat_Date", columns="Route_ID", values=value,
+                          aggfunc="sum", fill_value=0)
+
+
+def totals(df: pd.DataFrame) -> dict:
+    """Headline figures for the loaded range."""
+    capacity = int(df["Capacity"].sum())
+    seats_sold = int(df["Seats_Sold"].sum())
+    bookings = int(df["Bookings"].sum())
+    return {
+        "net_revenue": float(df["Net_Revenue"].sum()),
+        "bookings": bookings,
+        "seats_sold": seats_sold,
+        "load_factor": seats_sold / capacity if capacity else 0.0,
+        "cancellation_rate": int(df["Cancellations"].sum()) / bookings if bookings else 0.0,
+    }
+
+
+def rebuild_daily_stats(pool: ConnectionPool, start: date, end: date) -> int:
+    """Recompute the rollup for travel dates start..end from tickets. Returns rows written."""
+    def work(conn):
+        with conn.cursor() as cursor:
+            cursor.callproc('RebuildRouteDailyStats', (start, end))
+            for result in cursor.stored_results():
+                return result.fetchone()[0]
+
+    return pool.run_transaction(work)
+
+
+@job_type("rebuild_route_stats")
+def _rebuild_route_stats(pool, params, progress):
+    rows = rebuild_daily_stats(pool, date.fromisoformat(params['start']),
+                               date.fromisoformat(params['end']))
+    progress(1, 1)
+    return {"rows": rows}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the route_daily_stats rollup.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, required=True)
+    args = parser.parse_args(argv)
+
+    pool = create_pool()
+    start = time.perf_counter()
+    rows = rebuild_daily_stats(pool, args.start, args.end)
+    pool.close()
+    print(f"Rebuilt {rows} route-days in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+"""
+Asynchronous HTTP API for partner agents and kiosks.
+
+Runs on aiohttp with an aiomysql connection pool, beside the Streamlit app,
+against the same database and stored procedures. The database settings are
+read the same way as for the app (BUS_DB_* environment variables).
+
+    python api.py --port 8080
+
+    GET  /routes                            every route
+    GET  /availability?date=YYYY-MM-DD      free seats per route on a travel date
+    POST /bookings                          book seats; send an Idempotency-Key header
+                                            so a retried request cannot book twice
+    POST /group-bookings                    book a group of passengers all-or-nothing;
+                                            the Idempotency-Key header is required
+    POST /tickets/{ticket_id}/cancel        cancel a ticket
+    GET  /routes/{route_id}/tickets         one page of a route's tickets, newest first;
+                                            ?archived=1 for the archived tickets
+
+When BUS_API_KEYS (comma separated) is set, every request must send one of
+the keys in an X-API-Key header.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from datetime import date, datetime
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import aiomysql
+from aiohttp import web
+from mysql.connector import errorcode
+
+from booking import (GROUP_INSERT, GROUP_LOOKUP, GROUP_TICKET_INSERT, GROUP_TICKETS,
+                     GROUP_TOTALS, IDEMPOTENCY_INSERT, IDEMPOTENCY_LOOKUP, IDEMPOTENCY_SAVE,
+                     STATS_BOOKED, TRIP_CREATE, TRIP_TAKE, GroupPassenger,
+                     IdempotencyConflict, check_group_hash, fares_query, group_hash,
+                     lock_trips_query, plan_group, replay, request_hash, trip_fares_query)
+from db import RETRYABLE_ERRNOS, DatabaseConfig, load_database_config
+from fares import trip_fares
+from seats import MAX_SEATS
+
+T = TypeVar("T")
+
+# Seconds the route list is cached for
+ROUTES_TTL = 60.0
+MAX_PAGE_SIZE = 200
+MAX_GROUP_SIZE = 500
+
+API_KEYS = {key.strip() for key in os.environ.get("BUS_API_KEYS", "").split(",") if key.strip()}
+
+ROUTES_SQL = """
+    SELECT Route_ID, RouteName, Source, Destination, Distance, Duration,
+           Distance_Km, Duration_Hours, Fare, Seat_Capacity
+    FROM bus_routes
+    ORDER BY Route_ID
+"""
+
+json_response = partial(web.json_response, dumps=partial(json.dumps, default=str))
+
+
+async def create_async_pool(config: Optional[DatabaseConfig] = None) -> aiomysql.Pool:
+    """Create the aiomysql pool from the shared database settings."""
+    config = config or load_database_config()
+    # autocommit so plain reads do not leave a transaction open on release;
+    # writes start one explicitly in run_transaction
+    return await aiomysql.create_pool(
+        host=config.host, port=config.port, user=config.user,
+        password=config.password, db=config.database,
+        minsize=1, maxsize=config.pool_size, autocommit=True, pool_recycle=3600,
+    )
+
+
+async def run_transaction(pool: aiomysql.Pool, work: Callable[[Any], Awaitable[T]],
+                          attempts: int = 4, backoff: float = 0.02) -> T:
+    """Async counterpart of ConnectionPool.run_transaction."""
+    for attempt in range(1, attempts + 1):
+        async with pool.acquire() as conn:
+            await conn.begin()
+            try:
+                result = await work(conn)
+                await conn.commit()
+                return result
+            except Exception as e:
+                await conn.rollback()
+                retryable = isinstance(e, aiomysql.Error) and e.args and e.args[0] in RETRYABLE_ERRNOS
+                if not retryable or attempt == attempts:
+                    raise
+        await asyncio.sleep(backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+    raise ValueError("attempts must be at least 1")
+
+
+async def fetch_all(pool: aiomysql.Pool, sql: str, args: tuple = ()) -> List[Dict[str, Any]]:
+    async with pool.acquire() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(sql, args)
+        return await cursor.fetchall()
+
+
+async def call_procedure(conn, procedure: str, args: tuple) -> List[List[Dict[str, Any]]]:
+    """CALL a stored procedure and return all of its result sets."""
+    placeholders = ", ".join(["%s"] * len(args))
+    async with conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(f"CALL {procedure}({placeholders})", args)
+        results = [list(await cursor.fetchall())]
+        while await cursor.nextset():
+            if cursor.description:
+                results.append(list(await cursor.fetchall()))
+        return results
+
+
+# Service functions
+
+async def get_routes(app: web.Application, refresh: bool = False) -> List[Dict[str, Any]]:
+    cache = app["routes_cache"]
+    if refresh or not cache or time.monotonic() - cache["loaded_at"] > ROUTES_TTL:
+        cache["rows"] = await fetch_all(app["pool"], ROUTES_SQL)
+        cache["loaded_at"] = time.monotonic()
+    return cache["rows"]
+
+
+async def get_availability(pool: aiomysql.Pool, travel_date: date) -> Dict[int, int]:
+    rows = await fetch_all(pool, """
+        SELECT Route_ID, Available_Seats FROM trips WHERE Travel_Date = %s
+    """, (travel_date,))
+    return {row['Route_ID']: row['Available_Seats'] for row in rows}
+
+
+async def book(pool: aiomysql.Pool, args: tuple, key: Optional[str]) -> Dict[str, Any]:
+    """Run BookTicket, under an idempotency key when one is given."""
+    async def work(conn):
+        if key:
+            async with conn.cursor() as cursor:
+                try:
+                    await cursor.execute(IDEMPOTENCY_INSERT, (key, request_hash(args)))
+                except aiomysql.IntegrityError as e:
+                    if e.args[0] != errorcode.ER_DUP_ENTRY:
+                        raise
+                    await cursor.execute(IDEMPOTENCY_LOOKUP, (key,))
+                    stored_hash, response = await cursor.fetchone()
+                    return replay(key, stored_hash, response, args)
+
+        result = (await call_procedure(conn, 'BookTicket', args))[0][0]
+        if key:
+            async with conn.cursor() as cursor:
+                await cursor.execute(IDEMPOTENCY_SAVE, (
+                    result.get('Ticket_ID'), json.dumps(result, default=str), key
+                ))
+        return result
+
+    return await run_transaction(pool, work)
+
+
+async def _group_result(cursor, group_id: int, replayed: bool) -> Dict[str, Any]:
+    await cursor.execute(GROUP_TICKETS, (group_id,))
+    tickets = await cursor.fetchall()
+    return {"result": "SUCCESS", "Group_ID": group_id, "Tickets": tickets,
+            "Total_Fare": sum(t['Total_Fare'] for t in tickets), "Replayed": replayed}
+
+
+async def book_group(pool: aiomysql.Pool, passengers: List[GroupPassenger], key: str,
+                     booked_by: Optional[str]) -> Dict[str, Any]:
+    """Async counterpart of booking.book_group."""
+    digest = group_hash(passengers)
+
+    async def work(conn):
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            try:
+                await cursor.execute(GROUP_INSERT, (key, digest, booked_by))
+            except aiomysql.IntegrityError as e:
+                if e.args[0] != errorcode.ER_DUP_ENTRY:
+                    raise
+                await cursor.execute(GROUP_LOOKUP, (key,))
+                group = await cursor.fetchone()
+                check_group_hash(key, group['Request_Hash'], digest)
+                return await _group_result(cursor, group['Group_ID'], replayed=True)
+            group_id = cursor.lastrowid
+
+            route_ids = sorted({p.route_id for p in passengers})
+            await cursor.execute(fares_query(route_ids), tuple(route_ids))
+            base_fares = {row['Route_ID']: row['Fare'] for row in await cursor.fetchall()}
+            unknown = [r for r in route_ids if r not in base_fares]
+            if unknown:
+                await conn.rollback()
+                return {"result": "UNKNOWN_ROUTE", "Route_IDs": unknown}
+
+            trip_keys = sorted({(p.route_id, p.travel_date) for p in passengers})
+            await cursor.executemany(TRIP_CREATE, [(d, r) for r, d in trip_keys])
+            await cursor.execute(lock_trips_query(trip_keys), tuple(v for k in trip_keys for v in k))
+            trips = {(row['Route_ID'], row['Travel_Date']): row for row in await cursor.fetchall()}
+            await cursor.execute(trip_fares_query(trip_keys), tuple(v for k in trip_keys for v in k))
+            fares = trip_fares(trips, Counter((p.route_id, p.travel_date) for p in passengers),
+                               base_fares, await cursor.fetchall())
+
+            plan = plan_group(passengers, trips, fares, group_id)
+            if "short" in plan:
+                await conn.rollback()
+                return {"result": "INSUFFICIENT_SEATS", "Short_Trips": plan["short"]}
+
+            await cursor.executemany(TRIP_TAKE, plan["trips"])
+            await cursor.executemany(GROUP_TICKET_INSERT, plan["tickets"])
+            await cursor.executemany(STATS_BOOKED, plan["stats"])
+            await cursor.execute(GROUP_TOTALS, (len(passengers), plan["total_fare"], group_id))
+            return await _group_result(cursor, group_id, replayed=False)
+
+    return await run_transaction(pool, work)
+
+
+async def cancel(pool: aiomysql.Pool, ticket_id: int) -> Dict[str, Any]:
+    async def work(conn):
+        return (await call_procedure(conn, 'CancelTicket', (ticket_id,)))[0][0]
+
+    return await run_transaction(pool, work)
+
+
+async def ticket_page(pool: aiomysql.Pool, route_id: int, status: Optional[str],
+                      from_date: Optional[date], to_date: Optional[date],
+                      after: tuple, limit: int, archived: bool = False) -> tuple:
+    procedure = 'GetArchivedRouteTickets' if archived else 'GetRouteTickets'
+    async with pool.acquire() as conn:
+        results = await call_procedure(conn, procedure, (
+            route_id, status, from_date, to_date, after[0], after[1], limit
+        ))
+    return results[0], results[1][0]['Total']
+
+
+# Request handling
+
+def bad_request(message: str) -> web.HTTPBadRequest:
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+
+def _parse(value: Any, convert: Callable[[Any], T], name: str) -> T:
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise bad_request(f"Invalid {name}: {value!r}")
+
+
+def _optional_date(request: web.Request, name: str) -> Optional[date]:
+    value = request.query.get(name)
+    return _parse(value, date.fromisoformat, name) if value else None
+
+
+@web.middleware
+async def api_key_middleware(request: web.Request, handler):
+    if API_KEYS and request.headers.get("X-API-Key") not in API_KEYS:
+        return json_response({"error": "Missing or invalid API key"}, status=401)
+    return await handler(request)
+
+
+async def routes_handler(request: web.Request) -> web.Response:
+    return json_response(await get_routes(request.app))
+
+
+async def availability_handler(request: web.Request) -> web.Response:
+    travel_date = _optional_date(request, "date")
+    if travel_date is None:
+        raise bad_request("date is required")
+    routes = await get_routes(request.app)
+    seats = await get_availability(request.app["pool"], travel_date)
+    return json_response({
+        "date": travel_date,
+        "routes": [{"Route_ID": r['Route_ID'], "RouteName": r['RouteName'],
+                    "Available_Seats": seats.get(r['Route_ID'], r['Seat_Capacity'])}
+                   for r in routes],
+    })
+
+
+async def _json_body(request: web.Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise bad_request("Body must be JSON")
+    if not isinstance(body, dict):
+        raise bad_request("Body must be a JSON object")
+    return body
+
+
+def _passenger(body: Dict[str, Any]) -> tuple:
+    """Validated (route_id, name, email, phone, travel_date) of one passenger."""
+    route_id = _parse(body.get("route_id"), int, "route_id")
+    travel_date = _parse(body.get("travel_date"), date.fromisoformat, "travel_date")
+    if travel_date < date.today():
+        raise bad_request("travel_date is in the past")
+    details = []
+    for field, max_length in (("passenger_name", 100), ("passenger_email", 100),
+                              ("passenger_phone", 20)):
+        value = str(body.get(field) or "").strip()
+        if not value or len(value) > max_length:
+            raise bad_request(f"{field} is required (at most {max_length} characters)")
+        details.append(value)
+    return (route_id, *details, travel_date)
+
+
+def _idempotency_key(request: web.Request, required: bool = False) -> Optional[str]:
+    key = request.headers.get("Idempotency-Key")
+    if key is None and required:
+        raise bad_request("Idempotency-Key header is required")
+    if key is not None and not 1 <= len(key) <= 100:
+        raise bad_request("Idempotency-Key must be 1 to 100 characters")
+    return key
+
+
+async def _unknown_routes(app: web.Application, route_ids: set) -> set:
+    missing = route_ids - {r['Route_ID'] for r in await get_routes(app)}
+    if missing:
+        # The routes may have been created after the cache was loaded
+        missing = route_ids - {r['Route_ID'] for r in await get_routes(app, refresh=True)}
+    return missing
+
+
+async def book_handler(request: web.Request) -> web.Response:
+    body = await _json_body(request)
+    passenger = _passenger(body)
+    seats = _parse(body.get("seats", 1), int, "seats")
+    if not 1 <= seats <= MAX_SEATS:
+        raise bad_request(f"seats must be between 1 and {MAX_SEATS}")
+    key = _idempotency_key(request)
+
+    app = request.app
+    route_id = passenger[0]
+    if await _unknown_routes(app, {route_id}):
+        return json_response({"error": f"Unknown route {route_id}"}, status=404)
+
+    args = (*passenger, seats)
+    try:
+        result = await book(app["pool"], args, key)
+    except IdempotencyConflict as e:
+        return json_response({"error": str(e)}, status=422)
+
+    if result['result'] != 'SUCCESS':
+        return json_response({"error": "Not enough seats available"}, status=409)
+    replayed = result.get('Replayed', False)
+    return json_response({
+        "ticket_id": result['Ticket_ID'],
+        "seat_numbers": result['Seat_Numbers'],
+        "replayed": replayed,
+    }, status=200 if replayed else 201)
+
+
+async def group_book_handler(request: web.Request) -> web.Response:
+    """
+    Body: {"passengers": [{route_id, travel_date, passenger_name, passenger_email,
+    passenger_phone}, ...], "booked_by": optional agent name}. One seat per passenger.
+    """
+    body = await _json_body(request)
+    key = _idempotency_key(request, required=True)
+    items = body.get("passengers")
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_GROUP_SIZE:
+        raise bad_request(f"passengers must be a list of 1 to {MAX_GROUP_SIZE} passengers")
+    passengers = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise bad_request("Each passenger must be a JSON object")
+        route_id, name, email, phone, travel_date = _passenger(item)
+        passengers.append(GroupPassenger(route_id, travel_date, name, email, phone))
+    booked_by = str(body.get("booked_by") or "")[:100] or None
+
+    unknown = await _unknown_routes(request.app, {p.route_id for p in passengers})
+    if unknown:
+        return json_response({"error": f"Unknown routes {sorted(unknown)}"}, status=404)
+
+    try:
+        result = await book_group(request.app["pool"], passengers, key, booked_by)
+    except IdempotencyConflict as e:
+        return json_response({"error": str(e)}, status=422)
+
+    if result['result'] == 'INSUFFICIENT_SEATS':
+        return json_response({"error": "Not enough seats available",
+                              "short_trips": result['Short_Trips']}, status=409)
+    if result['result'] != 'SUCCESS':
+        return json_response({"error": f"Unknown routes {result['Route_IDs']}"}, status=404)
+    return json_response({
+        "group_id": result['Group_ID'],
+        "tickets": result['Tickets'],
+        "total_fare": result['Total_Fare'],
+        "replayed": result['Replayed'],
+    }, status=200 if result['Replayed'] else 201)
+
+
+async def cancel_handler(request: web.Request) -> web.Response:
+    ticket_id = _parse(request.match_info["ticket_id"], int, "ticket_id")
+    pool = request.app["pool"]
+    result = await cancel(pool, ticket_id)
+    if result['result'] == 'SUCCESS':
+        return json_response({"ticket_id": ticket_id, "status": "Cancelled"})
+    if not await fetch_all(pool, "SELECT 1 FROM tickets WHERE Ticket_ID = %s", (ticket_id,)):
+        return json_response({"error": f"Unknown ticket {ticket_id}"}, status=404)
+    return json_response({"error": "Ticket is already cancelled"}, status=409)
+
+
+async def tickets_handler(request: web.Request) -> web.Response:
+    """
+    Query parameters: status, from, to, limit, archived=1, and
+    after_created/after_id taken from the previous page's "next" cursor.
+    """
+    route_id = _parse(request.match_info["route_id"], int, "route_id")
+    status = request.query.get("status")
+    if status not in (None, "Booked", "Cancelled"):
+        raise bad_request("status must be Booked or Cancelled")
+    limit = _parse(request.query.get("limit", 50), int, "limit")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise bad_request(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after = (None, None)
+    if "after_created" in request.query:
+        after = (_parse(request.query["after_created"], datetime.fromisoformat, "after_created"),
+                 _parse(request.query.get("after_id"), int, "after_id"))
+
+    tickets, total = await ticket_page(
+        request.app["pool"], route_id, status,
+        _optional_date(request, "from"), _optional_date(request, "to"), after, limit,
+        request.query.get("archived") == "1"
+    )
+    next_cursor = None
+    if len(tickets) == limit:
+        last = tickets[-1]
+        next_cursor = {"after_created": last['Created_At'].isoformat(),
+                       "after_id": last['Ticket_ID']}
+    return json_response({"tickets": tickets, "total": total, "next": next_cursor})
+
+
+async def _open_pool(app: web.Application) -> None:
+    app["pool"] = await create_async_pool(app["config"])
+
+
+async def _close_pool(app: web.Application) -> None:
+    app["pool"].close()
+    await app["pool"].wait_closed()
+
+
+def create_app(config: Optional[DatabaseConfig] = None) -> web.Application:
+    app = web.Application(middlewares=[api_key_middleware])
+    app["config"] = config or load_database_config()
+    app["routes_cache"] = {}
+    app.on_startup.append(_open_pool)
+    app.on_cleanup.append(_close_pool)
+    app.router.add_get("/routes", routes_handler)
+    app.router.add_get("/availability", availability_handler)
+    app.router.add_post("/bookings", book_handler)
+    app.router.add_post("/group-bookings", group_book_handler)
+    app.router.add_post("/tickets/{ticket_id}/cancel", cancel_handler)
+    app.router.add_get("/routes/{route_id}/tickets", tickets_handler)
+    return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the booking HTTP API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
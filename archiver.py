@@ -0,0 +1,235 @@
+"""
+Retention for tickets and notifications.
+
+Tickets whose travel date is past the retention period, and notifications
+that were read long ago (or left unread for much longer), are moved from the
+hot tables into the compressed tickets_archive and notifications_archive
+tables. The hot tables, and every index the portal reads, then only grow
+with recent activity. Archived rows are read only when asked for, through
+the archived=True variants of the storage reads. The per-route daily
+statistics are kept in route_daily_stats, so analytics are unaffected, and
+a notification's delivery history moves to notification_outbox_archive
+with it.
+
+Rows move in bounded batches, each in its own short transaction that locks
+only the rows it moves, with a pause in between, so the archiver can run
+next to live bookings. It resumes where it stopped, so a schedule such as
+
+    15 3 * * *  python archiver.py run      # nightly, from cron
+
+catches up over as many runs as it needs after a long gap.
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db import ConnectionPool, create_pool
+
+# Days after the travel date that a ticket stays in the hot table
+TICKET_RETENTION_DAYS = int(os.environ.get("BUS_TICKET_RETENTION_DAYS", "180"))
+# Days a read notification stays, and an unread one
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("BUS_NOTIFICATION_RETENTION_DAYS", "90"))
+UNREAD_RETENTION_DAYS = int(os.environ.get("BUS_UNREAD_RETENTION_DAYS", "365"))
+
+ARCHIVE_BATCH_SIZE = int(os.environ.get("BUS_ARCHIVE_BATCH_SIZE", "1000"))
+# Seconds between batches, leaving the server to the live workload
+ARCHIVE_PAUSE = float(os.environ.get("BUS_ARCHIVE_PAUSE", "0.05"))
+
+
+@dataclass(frozen=True)
+class ArchivedChild:
+    """Rows of another table that are archived along with the row they reference."""
+    table: str
+    archive: str
+    parent_column: str
+    columns: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ArchivedTable:
+    """A hot table, its archive, and the index the archiver walks it by."""
+    table: str
+    archive: str
+    id_column: str
+    order_column: str
+    columns: Tuple[str, ...]
+    children: Tuple[ArchivedChild, ...] = ()
+
+
+TICKETS = ArchivedTable(
+    "tickets", "tickets_archive", "Ticket_ID", "Booking_Date",
+    ("Ticket_ID", "Route_ID", "Passenger_Name", "Passenger_Email", "Passenger_Phone",
+     "Booking_Date", "Number_Of_Seats", "Total_Fare", "Seat_Numbers", "Seat_Mask",
+     "Status", "Group_ID", "Created_At"),
+)
+NOTIFICATIONS = ArchivedTable(
+    "notifications", "notifications_archive", "Notification_ID", "Created_At",
+    ("Notification_ID", "User_ID", "Message", "is_read", "Created_At"),
+    (ArchivedChild("notification_outbox", "notification_outbox_archive", "Notification_ID",
+                   ("Outbox_ID", "Notification_ID", "Channel", "Recipient", "Status",
+                    "Attempts", "Last_Error", "Created_At", "Sent_At")),),
+)
+
+
+@dataclass
+class ArchiveResult:
+    """Outcome of archiving one table."""
+    table: str
+    moved: int
+    batches: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.moved / self.seconds if self.seconds else 0.0
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def archive_rows(pool: ConnectionPool, spec: ArchivedTable, condition: str, params: tuple,
+                 batch_size: int = ARCHIVE_BATCH_SIZE, pause: float = ARCHIVE_PAUSE,
+                 max_batches: Optional[int] = None,
+                 progress: Optional[Callable[[int], None]] = None) -> ArchiveResult:
+    """
+    Move the rows of spec.table matching condition into spec.archive,
+    batch_size rows per transaction, walking (order_column, id_column) up
+    from the oldest, together with the spec.children rows referencing them.
+    progress(moved) is called after each batch.
+    """
+    order, key = spec.order_column, spec.id_column
+    columns = ", ".join(spec.columns)
+
+    def move(after: tuple):
+        def work(conn) -> List[tuple]:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT {order}, {key} FROM {spec.table}
+                    WHERE {condition}
+                    AND (%s IS NULL OR {order} > %s OR ({order} = %s AND {key} > %s))
+                    ORDER BY {order}, {key}
+                    LIMIT %s
+                    FOR UPDATE
+                """, params + (after[0], after[0], after[0], after[1], batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    return rows
+                ids = [row[1] for row in rows]
+                marks = _placeholders(ids)
+                for child in spec.children:
+                    child_columns = ", ".join(child.columns)
+                    cursor.execute(f"""
+                        INSERT INTO {child.archive} ({child_columns})
+                        SELECT {child_columns} FROM {child.table}
+                        WHERE {child.parent_column} IN ({marks})
+                    """, tuple(ids))
+                    cursor.execute(f"""
+                        DELETE FROM {child.table} WHERE {child.parent_column} IN ({marks})
+                    """, tuple(ids))
+                cursor.execute(f"""
+                    INSERT INTO {spec.archive} ({columns})
+                    SELECT {columns} FROM {spec.table}
+                    WHERE {key} IN ({marks})
+                """, tuple(ids))
+                cursor.execute(f"DELETE FROM {spec.table} WHERE {key} IN ({marks})", tuple(ids))
+                return rows
+
+        return pool.run_transaction(work)
+
+    start = time.perf_counter()
+    after: tuple = (None, None)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = move(after)
+        if not rows:
+            break
+        moved += len(rows)
+        batches += 1
+        after = tuple(rows[-1])
+        if progress:
+            progress(moved)
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause)
+    return ArchiveResult(spec.table, moved, batches, time.perf_counter() - start)
+
+
+def archive_tickets(pool: ConnectionPool, travelled_before: date, **kwargs) -> ArchiveResult:
+    """Archive every ticket, booked or cancelled, for travel dates before travelled_before."""
+    return archive_rows(pool, TICKETS, "Booking_Date < %s", (travelled_before,), **kwargs)
+
+
+def archive_notifications(pool: ConnectionPool, read_before: datetime, unread_before: datetime,
+                          **kwargs) -> ArchiveResult:
+    """
+    Archive notifications read and created before read_before, and unread
+    ones created before unread_before. Notifications still waiting in the
+    delivery outbox stay until they are delivered or dead-lettered.
+    """
+    return archive_rows(pool, NOTIFICATIONS, """
+        Created_At < %s
+        AND (is_read = TRUE OR Created_At < %s)
+        AND NOT EXISTS (SELECT 1 FROM notification_outbox o
+                        WHERE o.Notification_ID = notifications.Notification_ID
+                        AND o.Status = 'Pending')
+    """, (max(read_before, unread_before), unread_before), **kwargs)
+
+
+def archive_all(pool: ConnectionPool, today: Optional[date] = None,
+                ticket_days: int = TICKET_RETENTION_DAYS,
+                notification_days: int = NOTIFICATION_RETENTION_DAYS,
+                unread_days: int = UNREAD_RETENTION_DAYS,
+                **kwargs) -> List[ArchiveResult]:
+    """Apply the retention periods to tickets and notifications."""
+    today = today or date.today()
+    midnight = datetime.combine(today, datetime.min.time())
+    return [
+        archive_tickets(pool, today - timedelta(days=ticket_days), **kwargs),
+        archive_notifications(pool, midnight - timedelta(days=notification_days),
+                              midnight - timedelta(days=unread_days), **kwargs),
+    ]
+
+
+def table_sizes(pool: ConnectionPool) -> List[Dict[str, Any]]:
+    """Approximate rows and on-disk megabytes of the hot and archive tables."""
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT TABLE_NAME as Table_Name, TABLE_ROWS as Approx_Rows,
+                   ROUND((DATA_LENGTH + INDEX_LENGTH) / 1048576, 1) as Size_MB
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME IN ('tickets', 'tickets_archive',
+                               'notifications', 'notifications_archive',
+                               'notification_outbox', 'notification_outbox_archive')
+            ORDER BY TABLE_NAME
+        """)
+        return cursor.fetchall()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archive old tickets and notifications.")
+    parser.add_argument("command", choices=["run", "stats"])
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=ARCHIVE_PAUSE)
+    parser.add_argument("--max-batches", type=int, default=None,
+                        help="stop each table after this many batches")
+    args = parser.parse_args(argv)
+
+    pool = create_pool()
+    if args.command == "run":
+        for result in archive_all(pool, batch_size=args.batch_size, pause=args.pause,
+                                  max_batches=args.max_batches):
+            print(f"{result.table}: archived {result.moved} rows in {result.batches} batches, "
+                  f"{result.seconds:.1f}s ({result.rows_per_sec:.0f} rows/sec)")
+    for row in table_sizes(pool):
+        print(f"{row['Table_Name']:<24} ~{row['Approx_Rows']:>10} rows  {row['Size_MB']:>8} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
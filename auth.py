@@ -0,0 +1,260 @@
+"""
+Password hashing, login and brute-force throttling for administrators and operators.
+
+Passwords are stored as self-describing strings, so the KDF and its cost
+can be tuned without invalidating existing hashes:
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+Legacy unsalted SHA-256 hex digests are still accepted and are replaced with
+the current scheme on the next successful login. Failed logins are counted
+per username and per client address in a sliding window; once either is
+over the limit, further attempts are refused without touching the database.
+
+    python auth.py migrate-users     # hash plain-text users.password values
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from db import ConnectionPool, create_pool
+from storage import Storage
+
+# KDF settings for new hashes: BUS_PASSWORD_SCHEME is 'scrypt' or 'pbkdf2_sha256'
+PASSWORD_SCHEME = os.environ.get("BUS_PASSWORD_SCHEME", "scrypt")
+SCRYPT_N = int(os.environ.get("BUS_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("BUS_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("BUS_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.environ.get("BUS_PBKDF2_ITERATIONS", "600000"))
+
+# Failed attempts allowed per username or client address within the window
+MAX_FAILURES = int(os.environ.get("BUS_LOGIN_MAX_FAILURES", "5"))
+FAILURE_WINDOW = float(os.environ.get("BUS_LOGIN_WINDOW", "300"))
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # OpenSSL needs roughly 128 * n * r bytes; allow twice that
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=HASH_BYTES)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+
+def hash_password(password: str, scheme: Optional[str] = None) -> str:
+    """Hash a password with a fresh salt using the configured scheme."""
+    scheme = scheme or PASSWORD_SCHEME
+    salt = os.urandom(SALT_BYTES)
+    if scheme == "scrypt":
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    if scheme == "pbkdf2_sha256":
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+    raise ValueError(f"Unknown password scheme {scheme!r}")
+
+
+def is_legacy_hash(stored: str) -> bool:
+    """True for an unsalted SHA-256 hex digest."""
+    return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored.lower())
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against any supported stored hash, in constant time."""
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, _unb64(parts[4]), n, r, p)
+            return hmac.compare_digest(digest, _unb64(parts[5]))
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            digest = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+            return hmac.compare_digest(digest, _unb64(parts[3]))
+    except ValueError:
+        return False
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored.lower())
+    return False
+
+
+def needs_rehash(stored: str) -> bool:
+    """True when a hash is legacy or was made with other settings than the current ones."""
+    parts = stored.split("$")
+    if PASSWORD_SCHEME == "scrypt":
+        return parts[:4] != ["scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return parts[:2] != ["pbkdf2_sha256", str(PBKDF2_ITERATIONS)]
+
+
+# Verified when the username does not exist, so unknown and known usernames
+# take the same time to reject
+_DUMMY_HASH = hash_password("not a real password")
+
+
+class SlidingWindowLimiter:
+    """
+    Counts failures per key over the last `window` seconds. A key with `limit`
+    failures in the window is locked until the oldest of them ages out.
+    At most max_keys keys are tracked; the least recently used are dropped.
+    """
+
+    def __init__(self, limit: int = MAX_FAILURES, window: float = FAILURE_WINDOW,
+                 max_keys: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._failures: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def _recent(self, key: str, now: float) -> Optional[Deque[float]]:
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, *keys: str) -> float:
+        """Seconds until every key may try again; 0 when none is locked."""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key in keys:
+                failures = self._recent(key, now)
+                if failures and len(failures) >= self.limit:
+                    wait = max(wait, failures[0] + self.window - now)
+            if wait:
+                self.rejected += 1
+        return wait
+
+    def record_failure(self, *keys: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                failures = self._failures.setdefault(key, deque(maxlen=self.limit))
+                failures.append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tracked_keys": len(self._failures), "rejected": self.rejected}
+
+
+@dataclass
+class LoginResult:
+    """Outcome of a login attempt; retry_after is set when the attempt was throttled."""
+    user: Optional[Dict[str, Any]] = None
+    retry_after: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.user is not None
+
+
+def login(storage: Storage, kind: str, username: str, password: str,
+          client: Optional[str] = None,
+          limiter: Optional[SlidingWindowLimiter] = None) -> LoginResult:
+    """
+    Check an 'admin' or 'operator' login with a single query.
+    On success the stored hash is upgraded if it is legacy or out of date.
+    """
+    keys = [f"{kind}:user:{username.lower()}"]
+    if client:
+        keys.append(f"ip:{client}")
+    if limiter:
+        wait = limiter.retry_after(*keys)
+        if wait:
+            return LoginResult(retry_after=wait)
+
+    account = storage.find_account(kind, username)
+    stored = account.pop('Password') if account else _DUMMY_HASH
+    if not verify_password(password, stored) or account is None:
+        if limiter:
+            limiter.record_failure(*keys)
+        return LoginResult()
+
+    if needs_rehash(stored):
+        # Conditional, so a password changed meanwhile is not overwritten
+        account_id = account['Admin_ID'] if kind == "admin" else account['Operator_ID']
+        storage.update_password(kind, account_id, hash_password(password), stored)
+
+    if limiter:
+        limiter.reset(keys[0])
+    return LoginResult(user=account)
+
+
+def migrate_users(pool: ConnectionPool, batch_size: int = 500) -> int:
+    """Replace plain-text users.password values with hashes. Returns how many were changed."""
+    changed = 0
+    last_id = 0
+    while True:
+        with pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT User_ID, password FROM users WHERE User_ID > %s
+                ORDER BY User_ID LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return changed
+            last_id = rows[-1][0]
+            updates = [(hash_password(password), user_id, password)
+                       for user_id, password in rows
+                       if not password.startswith(("scrypt$", "pbkdf2_sha256$"))]
+            cursor.executemany(
+                "UPDATE users SET password = %s WHERE User_ID = %s AND password = %s", updates
+            )
+            conn.commit()
+            changed += len(updates)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Password maintenance.")
+    parser.add_argument("command", choices=["migrate-users", "hash"])
+    parser.add_argument("password", nargs="?", help="password to hash (for 'hash')")
+    args = parser.parse_args(argv)
+
+    if args.command == "hash":
+        if not args.password:
+            parser.error("hash needs a password")
+        print(hash_password(args.password))
+        return 0
+
+    pool = create_pool()
+    changed = migrate_users(pool)
+    pool.close()
+    print(f"Hashed {changed} plain-text user passwords")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
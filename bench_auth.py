@@ -0,0 +1,96 @@
+"""
+Benchmark the cost of a login under concurrent attempts.
+
+Measures password verification for each KDF on one thread and on --threads
+threads, how cheaply the limiter turns away a brute-force storm, and with
+--db the full login() round trip against the bus_mgmt database.
+
+    python bench_auth.py --threads 8 --attempts 200 --db
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import auth
+from db import create_pool
+from storage.mysql import MySQLStorage
+
+
+def timed(fn, count: int, threads: int) -> list:
+    """Run fn count times on the given number of threads; return each call's seconds."""
+    def one(_):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(one, range(count)))
+
+
+def report(label: str, samples: list, elapsed: float) -> None:
+    samples = sorted(samples)
+    print(f"  {label:<34} {len(samples) / elapsed:>9.0f}/sec  "
+          f"median {1000 * statistics.median(samples):7.2f} ms  "
+          f"p99 {1000 * samples[int(0.99 * (len(samples) - 1))]:7.2f} ms")
+
+
+def run(label: str, fn, count: int, threads: int) -> None:
+    start = time.perf_counter()
+    samples = timed(fn, count, threads)
+    report(label, samples, time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark login cost.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--db", action="store_true", help="also time login() against MySQL")
+    args = parser.parse_args(argv)
+
+    print("password verification")
+    for scheme in ("scrypt", "pbkdf2_sha256"):
+        stored = auth.hash_password("correct horse", scheme)
+        for threads in (1, args.threads):
+            run(f"{scheme}, {threads} thread(s)",
+                lambda: auth.verify_password("correct horse", stored), args.attempts, threads)
+
+    print("brute-force storm against one locked username")
+    limiter = auth.SlidingWindowLimiter()
+    limiter.record_failure(*["admin:user:victim"] * limiter.limit)
+    run(f"limiter rejections, {args.threads} threads",
+        lambda: limiter.retry_after("admin:user:victim", "ip:203.0.113.7"),
+        args.attempts * 100, args.threads)
+
+    if args.db:
+        pool = create_pool()
+        username = f"bench-{uuid.uuid4().hex[:8]}"
+        with pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO Operators (Username, Password, First_Name, Last_Name, Email, Status)
+                VALUES (%s, %s, 'Bench', 'Mark', %s, 'Active')
+            """, (username, auth.hash_password("correct horse"), f"{username}@example.com"))
+            conn.commit()
+        storage = MySQLStorage(pool)
+        try:
+            print(f"login() round trip as {username}")
+            run(f"successful logins, {args.threads} threads",
+                lambda: auth.login(storage, "operator", username, "correct horse"),
+                args.attempts, args.threads)
+            storm = auth.SlidingWindowLimiter()
+            run(f"wrong passwords with limiter, {args.threads} threads",
+                lambda: auth.login(storage, "operator", username, "guess", "203.0.113.7", storm),
+                args.attempts, args.threads)
+            print(f"  limiter: {storm.stats()}")
+        finally:
+            with pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("DELETE FROM Operators WHERE Username = %s", (username,))
+                conn.commit()
+            pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
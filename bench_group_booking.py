@@ -0,0 +1,78 @@
+"""
+Benchmark group bookings against booking the same passengers one at a time.
+
+Creates throwaway routes, then books the same number of passengers twice:
+once with one book_seats call per passenger and once with book_group, each
+group spread over all the routes on its own travel date. Prints passengers
+booked per second for both.
+
+    python bench_group_booking.py --passengers 2000 --group-size 40 --routes 3
+"""
+import argparse
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+from booking import GroupPassenger, book_group, book_seats
+from db import create_pool
+from seats import MAX_SEATS
+from stress_booking import check_route, create_stress_route
+
+
+def make_groups(route_ids, passengers: int, group_size: int, first_day: int):
+    """Passenger groups, each on its own travel date, round-robin over the routes."""
+    groups = []
+    for g, start in enumerate(range(0, passengers, group_size)):
+        travel_date = date.today() + timedelta(days=first_day + g)
+        groups.append([
+            GroupPassenger(route_ids[i % len(route_ids)], travel_date,
+                           f"Passenger {start + i}", f"p{start + i}@example.com", "0000000000")
+            for i in range(min(group_size, passengers - start))
+        ])
+    return groups
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark group bookings.")
+    parser.add_argument("--passengers", type=int, default=2000)
+    parser.add_argument("--group-size", type=int, default=40)
+    parser.add_argument("--routes", type=int, default=3, help="routes each group is spread over")
+    args = parser.parse_args(argv)
+    if args.group_size > args.routes * MAX_SEATS:
+        parser.error(f"a group can have at most {args.routes * MAX_SEATS} passengers on {args.routes} routes")
+
+    pool = create_pool()
+    route_ids = [create_stress_route(pool, MAX_SEATS) for _ in range(args.routes)]
+
+    single_groups = make_groups(route_ids, args.passengers, args.group_size, 0)
+    start = time.perf_counter()
+    for group in single_groups:
+        for p in group:
+            book_seats(pool, p.route_id, p.name, p.email, p.phone, p.travel_date, 1)
+    single = time.perf_counter() - start
+
+    batch_groups = make_groups(route_ids, args.passengers, args.group_size, len(single_groups))
+    failed = 0
+    start = time.perf_counter()
+    for group in batch_groups:
+        if book_group(pool, group, uuid.uuid4().hex, "benchmark")['result'] != 'SUCCESS':
+            failed += 1
+    batch = time.perf_counter() - start
+
+    consistent = all(c["consistent"] and not c["oversold"]
+                     for route_id in route_ids for c in check_route(pool, route_id))
+    pool.close()
+
+    print(f"{args.passengers} passengers in groups of {args.group_size} over {args.routes} routes")
+    print(f"  one book_seats call each: {single:.2f}s ({args.passengers / single:.0f} passengers/sec)")
+    print(f"  book_group:               {batch:.2f}s ({args.passengers / batch:.0f} passengers/sec, "
+          f"{single / batch:.1f}x)")
+    if failed or not consistent:
+        print(f"FAIL: {failed} groups not booked, seat maps consistent={consistent}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
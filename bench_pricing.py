@@ -0,0 +1,134 @@
+"""
+Benchmark the fare engine.
+
+Times the vectorized fare matrix against pricing each route, date and tier
+in a Python loop, then prices --routes synthetic routes into a throwaway
+SQLite file and times saving the matrix and quoting fares from it. With
+--db the save and quotes run against the configured backend (BUS_STORAGE)
+on its existing routes instead.
+
+    python bench_pricing.py --routes 10000 --days 90
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from pricing import DEFAULT_RULES, FareQuotes, PricingRules, fare_matrix, reprice
+from storage import create_storage
+from storage.sqlite import SQLiteStorage
+
+
+def tier(tiers, value) -> float:
+    multiplier = tiers[0][1]
+    for threshold, m in tiers:
+        if value >= threshold:
+            multiplier = m
+    return multiplier
+
+
+def loop_fares(base_fares, travel_dates, today: date, rules: PricingRules = DEFAULT_RULES) -> list:
+    """The fare matrix one fare at a time, as a baseline for fare_matrix."""
+    fares = []
+    for base in base_fares:
+        for travel_date in travel_dates:
+            factor = tier(rules.advance_tiers, (travel_date - today).days)
+            if travel_date.weekday() in rules.weekend_days:
+                factor *= rules.weekend_multiplier
+            for _, load in rules.occupancy_tiers:
+                fare = min(max(base * factor * load, base * rules.floor), base * rules.ceiling)
+                fares.append((round(fare, 2), round(fare * (1 - rules.group_discount), 2)))
+    return fares
+
+
+def create_routes(storage, count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(count):
+        storage.create_route({
+            'RouteName': f"Bench-{i}", 'Source': f"City {i % 97}",
+            'Destination': f"City {(i * 7 + 1) % 97}", 'Distance': "100 km",
+            'Duration': "2 hours", 'Distance_Km': 100, 'Duration_Hours': 2,
+            'Fare': rng.randrange(100, 2000), 'Seat_Capacity': 40,
+        })
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the fare engine.")
+    parser.add_argument("--routes", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--sample", type=int, default=200,
+                        help="routes priced by the Python loop, scaled up to --routes")
+    parser.add_argument("--quotes", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", action="store_true",
+                        help="save and quote against the configured backend")
+    args = parser.parse_args(argv)
+
+    today = date.today()
+    base_fares = np.random.default_rng(args.seed).integers(100, 2000, args.routes).astype(float)
+    travel_dates = np.datetime64(today, "D") + np.arange(args.days)
+    fares = args.routes * args.days * len(DEFAULT_RULES.occupancy_tiers)
+
+    print(f"fare matrix: {args.routes} routes x {args.days} days = {fares} fares")
+    start = time.perf_counter()
+    fare_matrix(base_fares, travel_dates, today)
+    vectorized = time.perf_counter() - start
+    print(f"  vectorized  {vectorized * 1000:9.1f} ms  {fares / vectorized:>12.0f} fares/sec")
+
+    start = time.perf_counter()
+    loop_fares(base_fares[:args.sample].tolist(),
+               [today + timedelta(days=d) for d in range(args.days)], today)
+    looped = (time.perf_counter() - start) * args.routes / args.sample
+    print(f"  loop        {looped * 1000:9.1f} ms  {fares / looped:>12.0f} fares/sec "
+          f"(from {args.sample} routes)")
+    print(f"  speedup     {looped / vectorized:9.1f}x")
+
+    path = None
+    if args.db:
+        storage = create_storage()
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        storage = SQLiteStorage(path)
+        create_routes(storage, args.routes, args.seed)
+
+    try:
+        print(f"saving to {storage.name}")
+        result = reprice(storage, today, args.days)
+        print(f"  {result['routes']} routes x {result['days']} days in {result['seconds']}s "
+              f"({result['rows'] / result['seconds']:.0f} rows/sec)")
+
+        routes = [dict(r, Available_Seats=r['Seat_Capacity']) for r in storage.list_routes()]
+        quotes = FareQuotes(storage)
+        rng = random.Random(args.seed)
+        samples = []
+        start = time.perf_counter()
+        for _ in range(args.quotes):
+            route = rng.choice(routes)
+            route['Available_Seats'] = rng.randrange(route['Seat_Capacity'] + 1)
+            began = time.perf_counter()
+            quotes.quote(route, today + timedelta(days=rng.randrange(args.days)),
+                         rng.randrange(1, 6), route['Available_Seats'])
+            samples.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        samples.sort()
+        print(f"quotes: {args.quotes / elapsed:.0f}/sec  "
+              f"median {1e6 * statistics.median(samples):.1f} us  "
+              f"p99 {1e6 * samples[int(0.99 * (len(samples) - 1))]:.1f} us  {quotes.stats()}")
+    finally:
+        storage.close()
+        if path:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
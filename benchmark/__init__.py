@@ -0,0 +1,16 @@
+"""
+Reproducible benchmarks for the bus_mgmt database.
+
+Load a seeded synthetic data set into a scratch database created from d.sql,
+run the scripted workloads against it, and compare the JSON reports of two
+runs:
+
+    BUS_DB_NAME=bus_bench python -m benchmark generate --scale medium --seed 42
+    BUS_DB_NAME=bus_bench python -m benchmark run --threads 16 --seconds 60 --output before.json
+    python -m benchmark compare before.json after.json
+"""
+from benchmark.generate import PRESETS, Scale, generate, scale_for
+from benchmark.workloads import DEFAULT_MIX, OPERATIONS, compare, discover, run
+
+__all__ = ["DEFAULT_MIX", "OPERATIONS", "PRESETS", "Scale", "compare", "discover",
+           "generate", "run", "scale_for"]
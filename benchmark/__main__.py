@@ -0,0 +1,90 @@
+"""Command line for the benchmarks; see the benchmark package docstring."""
+import argparse
+import json
+import sys
+from datetime import date
+
+from db import create_pool
+
+from benchmark.generate import PRESETS, generate, scale_for
+from benchmark.workloads import compare, parse_mix, run
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description="Generate benchmark data and run workloads.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="load a seeded synthetic data set")
+    gen.add_argument("--scale", choices=sorted(PRESETS), default="small")
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--start-date", type=date.fromisoformat, default=None,
+                     help="trips are generated around this date (default today)")
+    gen.add_argument("--method", choices=["auto", "load", "insert"], default="auto")
+    gen.add_argument("--batch-size", type=int, default=5000)
+    for name in ("routes", "users", "operators", "notifications", "complaints", "tickets", "days"):
+        gen.add_argument(f"--{name}", type=int, default=None, help=f"override the preset's {name}")
+
+    bench = commands.add_parser("run", help="run the workloads and report as JSON")
+    bench.add_argument("--threads", type=int, default=16)
+    bench.add_argument("--seconds", type=float, default=30.0)
+    bench.add_argument("--warmup", type=float, default=5.0)
+    bench.add_argument("--seed", type=int, default=42)
+    bench.add_argument("--mix", help="weights such as book=30,cancel=5,login=10")
+    bench.add_argument("--output", help="write the report here instead of stdout")
+
+    diff = commands.add_parser("compare", help="compare two run reports")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--fail-over", type=float, default=None,
+                      help="exit 1 if any p99 latency grew by more than this percent")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current)
+        print(f"{'operation':<16}{'ops/sec':>10}{'change':>9}{'p50 ms':>10}{'change':>9}"
+              f"{'p99 ms':>10}{'change':>9}")
+        for row in rows:
+            print(f"{row['operation']:<16}{row['throughput']:>10}{_pct(row['throughput_change']):>9}"
+                  f"{row['p50_ms']!s:>10}{_pct(row['p50_change']):>9}"
+                  f"{row['p99_ms']!s:>10}{_pct(row['p99_change']):>9}")
+        if args.fail_over is not None and any(
+                (row['p99_change'] or 0) > args.fail_over for row in rows):
+            return 1
+        return 0
+
+    pool = create_pool()
+    try:
+        if args.command == "generate":
+            scale = scale_for(args.scale, routes=args.routes, users=args.users,
+                              operators=args.operators, notifications=args.notifications,
+                              complaints=args.complaints, tickets=args.tickets, days=args.days)
+            report = generate(pool, scale, args.seed, args.start_date, args.method, args.batch_size)
+        else:
+            report = run(pool, parse_mix(args.mix), args.threads, args.seconds,
+                         args.warmup, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        pool.close()
+
+    text = json.dumps(report, indent=2, default=str)
+    if getattr(args, "output", None):
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def _pct(value) -> str:
+    return "" if value is None else f"{value:+.1f}%"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
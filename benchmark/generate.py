@@ -0,0 +1,353 @@
+"""
+Seeded synthetic data for the benchmarks.
+
+The same seed, scale and start date always produce the same rows. Rows get
+explicit IDs above the current maximum of each table, so they can be added
+to a database that already has data, and are written straight to the tables
+with LOAD DATA LOCAL INFILE, or with batched multi-row INSERTs when the
+server or client does not allow local infile. Trips are generated together
+with their tickets, so every trip's seat map matches the tickets booked on it.
+"""
+import csv
+import os
+import random
+import tempfile
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import mysql.connector
+from mysql.connector import Error
+
+import auth
+from analytics import rebuild_daily_stats
+from db import ConnectionPool, load_database_config
+from seats import mask_from_seats
+
+# Generated rows are recognised by these name prefixes
+ROUTE_PREFIX = "Bench-"
+USER_PREFIX = "bench_user_"
+OPERATOR_PREFIX = "bench_op_"
+
+# Every generated operator and user has this password
+BENCH_PASSWORD = "bench-password"
+
+CITIES = ["Bengaluru", "Mysuru", "Chennai", "Hyderabad", "Mumbai", "Pune", "Goa",
+          "Mangaluru", "Hubballi", "Kochi", "Coimbatore", "Madurai", "Vijayawada",
+          "Tirupati", "Belagavi", "Davangere", "Shivamogga", "Udupi", "Salem", "Nashik"]
+FIRST_NAMES = ["Asha", "Ravi", "Meera", "Arjun", "Kiran", "Divya", "Rahul", "Sneha",
+               "Vikram", "Priya", "Nikhil", "Ananya", "Suresh", "Lakshmi", "Farhan", "Neha"]
+LAST_NAMES = ["Rao", "Sharma", "Iyer", "Reddy", "Nair", "Patel", "Gowda", "Khan",
+              "Menon", "Das", "Joshi", "Kulkarni", "Shetty", "Pillai", "Singh", "Bhat"]
+CAPACITIES = [30, 36, 40, 45, 50, 64]
+SEAT_COUNT_WEIGHTS = [60, 25, 10, 5]
+CANCELLED_SHARE = 0.05
+
+
+@dataclass
+class Scale:
+    """How many rows of each kind to generate."""
+    routes: int
+    users: int
+    operators: int
+    notifications: int
+    complaints: int
+    tickets: int
+    days: int
+
+
+PRESETS = {
+    "small": Scale(routes=100, users=2_000, operators=50, notifications=10_000,
+                   complaints=500, tickets=20_000, days=30),
+    "medium": Scale(routes=1_000, users=50_000, operators=200, notifications=200_000,
+                    complaints=5_000, tickets=500_000, days=60),
+    "large": Scale(routes=3_000, users=300_000, operators=1_000, notifications=1_000_000,
+                   complaints=20_000, tickets=3_000_000, days=90),
+}
+
+COLUMNS = {
+    "bus_routes": ("Route_ID", "RouteName", "Source", "Destination", "Distance", "Duration",
+                   "Distance_Km", "Duration_Hours", "Fare", "Seat_Capacity"),
+    "users": ("User_ID", "Username", "email", "password", "Role", "Created_At"),
+    "Operators": ("Operator_ID", "Username", "Password", "First_Name", "Last_Name",
+                  "Email", "Status"),
+    "notifications": ("Notification_ID", "User_ID", "Message", "is_read", "Created_At"),
+    "complaints": ("Complaint_ID", "Operator_ID", "Subject", "Message", "Status", "Created_At"),
+    "trips": ("Trip_ID", "Route_ID", "Travel_Date", "Capacity", "Available_Seats",
+              "Seat_Map", "Held_Seats"),
+    "tickets": ("Ticket_ID", "Route_ID", "Passenger_Name", "Passenger_Email",
+                "Passenger_Phone", "Booking_Date", "Number_Of_Seats", "Total_Fare",
+                "Seat_Numbers", "Seat_Mask", "Status", "Created_At"),
+}
+
+ID_COLUMNS = {table: columns[0] for table, columns in COLUMNS.items()}
+
+
+def scale_for(preset: str, **overrides: Optional[int]) -> Scale:
+    """A preset scale with any non-None counts replaced."""
+    return replace(PRESETS[preset], **{k: v for k, v in overrides.items() if v is not None})
+
+
+class _CsvSink:
+    """Collects a table's rows in a temporary CSV file for LOAD DATA LOCAL INFILE."""
+
+    def __init__(self, table: str, directory: str):
+        self.table = table
+        self.rows = 0
+        self.path = os.path.join(directory, f"{table}.csv")
+        self._file = open(self.path, "w", newline="")
+        self._writer = csv.writer(self._file, lineterminator="\n")
+
+    def add(self, row: Sequence[Any]) -> None:
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def finish(self, conn) -> None:
+        self._file.close()
+        with conn.cursor() as cursor:
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE {self.table}
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                LINES TERMINATED BY '\\n'
+                ({", ".join(COLUMNS[self.table])})
+            """, (self.path,))
+        conn.commit()
+        os.remove(self.path)
+
+
+class _InsertSink:
+    """Inserts a table's rows batch_size at a time, committing each batch."""
+
+    def __init__(self, table: str, conn, batch_size: int):
+        self.table = table
+        self.rows = 0
+        self._conn = conn
+        self._batch_size = batch_size
+        self._batch: List[Sequence[Any]] = []
+        columns = COLUMNS[table]
+        self._sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+    def add(self, row: Sequence[Any]) -> None:
+        self._batch.append(row)
+        self.rows += 1
+        if len(self._batch) >= self._batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            with self._conn.cursor() as cursor:
+                cursor.executemany(self._sql, self._batch)
+            self._conn.commit()
+            self._batch = []
+
+    def finish(self, conn) -> None:
+        self._flush()
+
+
+class Generator:
+    """Produces the synthetic rows for one seed, scale and start date."""
+
+    def __init__(self, scale: Scale, seed: int, start_date: date, first_ids: Dict[str, int]):
+        self.scale = scale
+        self.seed = seed
+        self.start_date = start_date
+        self.first_ids = first_ids
+        self.password_hash = auth.hash_password(BENCH_PASSWORD)
+        self.route_capacity: Dict[int, int] = {}
+        self.route_fare: Dict[int, float] = {}
+
+    def _rng(self, table: str) -> random.Random:
+        # One stream per table, so changing one count leaves the other tables unchanged
+        return random.Random(f"{self.seed}:{table}")
+
+    def _created_at(self, rng: random.Random, max_days: int = 365) -> datetime:
+        midnight = datetime.combine(self.start_date, datetime.min.time())
+        return midnight - timedelta(seconds=rng.randrange(max_days * 86400))
+
+    @property
+    def first_date(self) -> date:
+        """Half the trips are in the past and half from start_date on."""
+        return self.start_date - timedelta(days=self.scale.days // 2)
+
+    def routes(self) -> Iterable[tuple]:
+        rng = self._rng("routes")
+        for i in range(self.scale.routes):
+            route_id = self.first_ids["bus_routes"] + i
+            source, destination = rng.sample(CITIES, 2)
+            km = rng.randint(40, 1200)
+            hours = round(km / rng.uniform(45, 65), 1)
+            fare = round(km * rng.uniform(1.2, 2.5), 2)
+            capacity = rng.choice(CAPACITIES)
+            self.route_capacity[route_id] = capacity
+            self.route_fare[route_id] = fare
+            yield (route_id, f"{ROUTE_PREFIX}{self.seed}-{i}", source, destination,
+                   f"{km} km", f"{hours} hours", km, hours, fare, capacity)
+
+    def users(self) -> Iterable[tuple]:
+        rng = self._rng("users")
+        for i in range(self.scale.users):
+            role = rng.choices(["user", "operator", "conductor"], [90, 5, 5])[0]
+            yield (self.first_ids["users"] + i, f"{USER_PREFIX}{self.seed}_{i}",
+                   f"{USER_PREFIX}{self.seed}_{i}@example.com", self.password_hash,
+                   role, self._created_at(rng))
+
+    def operators(self) -> Iterable[tuple]:
+        rng = self._rng("operators")
+        for i in range(self.scale.operators):
+            yield (self.first_ids["Operators"] + i, f"{OPERATOR_PREFIX}{self.seed}_{i}",
+                   self.password_hash, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                   f"{OPERATOR_PREFIX}{self.seed}_{i}@example.com", "Active")
+
+    def notifications(self) -> Iterable[tuple]:
+        rng = self._rng("notifications")
+        first_user = self.first_ids["users"]
+        for i in range(self.scale.notifications):
+            # Skewed, so a few users have long notification histories
+            user_id = first_user + int(self.scale.users * rng.random() ** 3)
+            yield (self.first_ids["notifications"] + i, user_id,
+                   f"Route update #{i}: departure times revised", int(rng.random() < 0.7),
+                   self._created_at(rng, 180))
+
+    def complaints(self) -> Iterable[tuple]:
+        rng = self._rng("complaints")
+        for i in range(self.scale.complaints):
+            status = rng.choices(["Pending", "In Progress", "Resolved"], [30, 20, 50])[0]
+            yield (self.first_ids["complaints"] + i,
+                   self.first_ids["Operators"] + rng.randrange(self.scale.operators),
+                   f"Complaint #{i}", "The bus was late and the AC did not work.",
+                   status, self._created_at(rng, 180))
+
+    def trips_and_tickets(self, trip_sink, ticket_sink) -> None:
+        """Fill each trip with tickets until the requested ticket count is reached."""
+        rng = self._rng("tickets")
+        trip_count = self.scale.routes * self.scale.days
+        per_trip = self.scale.tickets / trip_count if trip_count else 0
+        ticket_id = self.first_ids["tickets"]
+        trip_id = self.first_ids["trips"]
+        remaining = self.scale.tickets
+        for day in range(self.scale.days):
+            travel_date = self.first_date + timedelta(days=day)
+            for route_id, capacity in self.route_capacity.items():
+                wanted = int(per_trip) + (rng.random() < per_trip % 1)
+                next_seat = 0
+                for _ in range(min(wanted, remaining)):
+                    free = capacity - next_seat
+                    if not free:
+                        break
+                    count = min(free, rng.choices(range(1, 5), SEAT_COUNT_WEIGHTS)[0])
+                    seats = list(range(next_seat + 1, next_seat + count + 1))
+                    cancelled = rng.random() < CANCELLED_SHARE
+                    if not cancelled:
+                        next_seat += count
+                    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                    # Booked up to 30 days ahead, and never after start_date
+                    booked_at = datetime.combine(min(travel_date, self.start_date),
+                                                 datetime.min.time()) - timedelta(
+                        seconds=rng.randrange(1, 30 * 86400))
+                    ticket_sink.add((
+                        ticket_id, route_id, name, f"passenger{ticket_id}@example.com",
+                        f"9{ticket_id % 1_000_000_000:09d}", travel_date, count,
+                        round(self.route_fare[route_id] * count, 2),
+                        ",".join(map(str, seats)), mask_from_seats(seats),
+                        "Cancelled" if cancelled else "Booked", booked_at,
+                    ))
+                    ticket_id += 1
+                    remaining -= 1
+                seat_map = (1 << next_seat) - 1
+                trip_sink.add((trip_id, route_id, travel_date, capacity,
+                               capacity - next_seat, seat_map, 0))
+                trip_id += 1
+
+
+def _next_ids(conn) -> Dict[str, int]:
+    first_ids = {}
+    with conn.cursor() as cursor:
+        for table, column in ID_COLUMNS.items():
+            cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+            first_ids[table] = int(cursor.fetchone()[0])
+    return first_ids
+
+
+def _local_infile_enabled(conn) -> bool:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT @@GLOBAL.local_infile")
+        return bool(int(cursor.fetchone()[0]))
+
+
+def generate(pool: ConnectionPool, scale: Scale, seed: int = 42,
+             start_date: Optional[date] = None, method: str = "auto",
+             batch_size: int = 5000) -> Dict[str, Any]:
+    """
+    Generate and load one data set. method is 'load' (LOAD DATA LOCAL INFILE),
+    'insert' (batched INSERTs) or 'auto', which uses LOAD DATA when the server
+    allows it. Returns the rows loaded per table, the method and the timings.
+    """
+    start_date = start_date or date.today()
+    config = load_database_config()
+    conn = mysql.connector.connect(
+        host=config.host, port=config.port, user=config.user, password=config.password,
+        database=config.database, autocommit=False, allow_local_infile=True,
+    )
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    try:
+        if method == "auto":
+            method = "load" if _local_infile_enabled(conn) else "insert"
+        with conn.cursor() as cursor:
+            # Only for this session: IDs are known to be unique and references valid,
+            # and the generated notifications are not queued for email delivery
+            cursor.execute("SET unique_checks = 0, foreign_key_checks = 0, "
+                           "@skip_notification_outbox = 1")
+        generator = Generator(scale, seed, start_date, _next_ids(conn))
+
+        with tempfile.TemporaryDirectory(prefix="bus-bench-") as directory:
+            def sink(table: str):
+                if method == "load":
+                    return _CsvSink(table, directory)
+                return _InsertSink(table, conn, batch_size)
+
+            counts = {}
+            for table, rows in (("bus_routes", generator.routes),
+                                ("users", generator.users),
+                                ("Operators", generator.operators),
+                                ("notifications", generator.notifications),
+                                ("complaints", generator.complaints)):
+                table_start = time.perf_counter()
+                table_sink = sink(table)
+                for row in rows():
+                    table_sink.add(row)
+                table_sink.finish(conn)
+                counts[table] = table_sink.rows
+                timings[table] = round(time.perf_counter() - table_start, 3)
+
+            table_start = time.perf_counter()
+            trip_sink, ticket_sink = sink("trips"), sink("tickets")
+            generator.trips_and_tickets(trip_sink, ticket_sink)
+            trip_sink.finish(conn)
+            ticket_sink.finish(conn)
+            counts["trips"], counts["tickets"] = trip_sink.rows, ticket_sink.rows
+            timings["trips_and_tickets"] = round(time.perf_counter() - table_start, 3)
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    table_start = time.perf_counter()
+    last_date = generator.first_date + timedelta(days=max(scale.days - 1, 0))
+    rebuild_daily_stats(pool, generator.first_date, last_date)
+    timings["route_daily_stats"] = round(time.perf_counter() - table_start, 3)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "seed": seed,
+        "start_date": start_date.isoformat(),
+        "scale": asdict(scale),
+        "method": method,
+        "rows": counts,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(sum(counts.values()) / elapsed) if elapsed else 0,
+        "table_seconds": timings,
+    }
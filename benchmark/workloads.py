@@ -0,0 +1,303 @@
+"""
+Scripted workloads run concurrently from a thread pool.
+
+Each operation issues the same calls the app makes for one user action.
+Threads pick operations at random according to the mix, with per-thread
+seeded generators, and latencies are kept per thread and merged at the end
+so that recording them adds no contention.
+"""
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from mysql.connector import Error
+
+import auth
+from booking import book_seats, cancel_booking, route_tickets
+from db import ConnectionPool
+from storage import StorageError
+from storage.mysql import MySQLStorage
+
+from benchmark.generate import BENCH_PASSWORD, OPERATOR_PREFIX, ROUTE_PREFIX, USER_PREFIX
+
+DEFAULT_MIX = {"book": 25, "cancel": 5, "route_tickets": 20,
+               "notifications": 30, "complaints": 5, "login": 15}
+
+NOTIFICATION_PAGE_SIZE = 50
+
+# name -> fn(pool, dataset, rng) returning an outcome label
+OPERATIONS: Dict[str, Callable[..., str]] = {}
+
+
+def operation(name: str):
+    """Register a workload operation under the given name."""
+    def register(fn):
+        OPERATIONS[name] = fn
+        return fn
+    return register
+
+
+@dataclass
+class Dataset:
+    """The generated rows the workloads pick from."""
+    route_ids: List[int]
+    first_date: date
+    last_date: date
+    first_ticket_id: int
+    last_ticket_id: int
+    first_user_id: int
+    last_user_id: int
+    operator_usernames: List[str]
+
+
+def discover(pool: ConnectionPool) -> Dataset:
+    """Find the benchmark data loaded by benchmark.generate."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT Route_ID FROM bus_routes WHERE RouteName LIKE %s",
+                       (ROUTE_PREFIX + "%",))
+        route_ids = [row[0] for row in cursor.fetchall()]
+        if not route_ids:
+            raise ValueError("No benchmark data found; run 'python -m benchmark generate' first")
+        cursor.execute("""
+            SELECT MIN(Travel_Date), MAX(Travel_Date) FROM trips
+            WHERE Route_ID BETWEEN %s AND %s
+        """, (min(route_ids), max(route_ids)))
+        first_date, last_date = cursor.fetchone()
+        cursor.execute("SELECT MIN(Ticket_ID), MAX(Ticket_ID) FROM tickets")
+        first_ticket_id, last_ticket_id = cursor.fetchone()
+        cursor.execute("SELECT MIN(User_ID), MAX(User_ID) FROM users WHERE Username LIKE %s",
+                       (USER_PREFIX + "%",))
+        first_user_id, last_user_id = cursor.fetchone()
+        cursor.execute("SELECT Username FROM Operators WHERE Username LIKE %s LIMIT 1000",
+                       (OPERATOR_PREFIX + "%",))
+        operator_usernames = [row[0] for row in cursor.fetchall()]
+    return Dataset(route_ids, first_date, last_date, first_ticket_id or 0,
+                   last_ticket_id or 0, first_user_id or 0, last_user_id or 0,
+                   operator_usernames)
+
+
+@operation("book")
+def _book(pool: ConnectionPool, data: Dataset, rng: random.Random) -> str:
+    first = max(data.first_date, date.today())
+    travel_date = first + timedelta(days=rng.randrange(max((data.last_date - first).days, 0) + 1))
+    result = book_seats(pool, rng.choice(data.route_ids), "Bench Passenger",
+                        "bench@example.com", "9000000000", travel_date, rng.randint(1, 2))
+    return result['result'] if result else "NO_RESULT"
+
+
+@operation("cancel")
+def _cancel(pool: ConnectionPool, data: Dataset, rng: random.Random) -> str:
+    result = cancel_booking(pool, rng.randint(data.first_ticket_id, data.last_ticket_id))
+    return result['result'] if result else "NO_RESULT"
+
+
+@operation("route_tickets")
+def _route_tickets(pool: ConnectionPool, data: Dataset, rng: random.Random) -> str:
+    route_id = rng.choice(data.route_ids)
+    tickets, _ = route_tickets(pool, route_id, rng.choice([None, "Booked"]))
+    if tickets and rng.random() < 0.3:
+        last = tickets[-1]
+        route_tickets(pool, route_id, after=(last['Created_At'], last['Ticket_ID']))
+        return "TWO_PAGES"
+    return "ONE_PAGE"
+
+
+@operation("notifications")
+def _notifications(pool: ConnectionPool, data: Dataset, rng: random.Random) -> str:
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        if rng.random() < 0.8:
+            # A user's own notification feed
+            user_id = rng.randint(data.first_user_id, data.last_user_id)
+            cursor.callproc('GetUserNotifications', (user_id, None, None, NOTIFICATION_PAGE_SIZE))
+            for result in cursor.stored_results():
+                result.fetchall()
+            return "USER_PAGE"
+        # The admin's newest-first list of everyone's notifications
+        cursor.execute("""
+            SELECT n.Notification_ID, n.User_ID, n.Message, n.is_read, n.Created_At,
+                   u.Username as Recipient
+            FROM notifications n
+            JOIN users u ON n.User_ID = u.User_ID
+            ORDER BY n.Created_At DESC, n.Notification_ID DESC
+            LIMIT %s
+        """, (NOTIFICATION_PAGE_SIZE,))
+        cursor.fetchall()
+        return "ADMIN_PAGE"
+
+
+@operation("complaints")
+def _complaints(pool: ConnectionPool, data: Dataset, rng: random.Random) -> str:
+    # The admin's triage view: one status, first page of the queue
+    status = rng.choice(["Pending", "In Progress", "Resolved"])
+    MySQLStorage(pool).complaints(status=status)
+    return "LISTED"
+
+
+@operation("login")
+def _login(pool: ConnectionPool, data: Dataset, rng: random.Random) -> str:
+    result = auth.login(MySQLStorage(pool), "operator",
+                        rng.choice(data.operator_usernames), BENCH_PASSWORD)
+    return "OK" if result.ok else "REJECTED"
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    """Parse 'book=30,login=10' into operation weights."""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float], errors: int, outcomes: Counter, seconds: float) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    summary: Dict[str, Any] = {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / seconds, 2) if seconds else 0.0,
+    }
+    if ordered:
+        summary["latency_ms"] = {
+            "mean": round(1000 * sum(ordered) / len(ordered), 3),
+            **{f"p{p}": round(1000 * percentile(ordered, p), 3) for p in (50, 90, 95, 99)},
+            "max": round(1000 * ordered[-1], 3),
+        }
+    summary["outcomes"] = dict(outcomes)
+    return summary
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _server_version(pool: ConnectionPool) -> str:
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT VERSION()")
+        return cursor.fetchone()[0]
+
+
+def run(pool: ConnectionPool, mix: Dict[str, int], threads: int = 16,
+        seconds: float = 30.0, warmup: float = 5.0, seed: int = 42) -> Dict[str, Any]:
+    """
+    Run the mix from the given number of threads for warmup + seconds.
+    Only operations started after the warmup are measured. Returns the
+    report: run settings, then count, errors, throughput, latency
+    percentiles and outcomes per operation and in total.
+    """
+    data = discover(pool)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + seconds
+    per_thread = []
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        rng = random.Random(f"{seed}:{index}")
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Counter = Counter()
+        outcomes: Dict[str, Counter] = defaultdict(Counter)
+        while True:
+            began = time.monotonic()
+            if began >= deadline:
+                break
+            name = rng.choices(names, weights)[0]
+            op_start = time.perf_counter()
+            try:
+                outcome = OPERATIONS[name](pool, data, rng)
+            except (Error, StorageError) as e:
+                # Storage methods re-raise the driver's error as StorageError
+                cause = e if isinstance(e, Error) else e.__cause__
+                outcome = f"ERROR {getattr(cause, 'errno', None)}"
+                if began >= measure_from:
+                    errors[name] += 1
+            elapsed = time.perf_counter() - op_start
+            if began >= measure_from:
+                latencies[name].append(elapsed)
+                outcomes[name][outcome] += 1
+        with lock:
+            per_thread.append((latencies, errors, outcomes))
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(worker, i) for i in range(threads)]:
+            future.result()
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    outcomes: Dict[str, Counter] = defaultdict(Counter)
+    for thread_latencies, thread_errors, thread_outcomes in per_thread:
+        for name, samples in thread_latencies.items():
+            latencies[name].extend(samples)
+        errors.update(thread_errors)
+        for name, counts in thread_outcomes.items():
+            outcomes[name].update(counts)
+
+    return {
+        "settings": {
+            "mix": mix,
+            "threads": threads,
+            "seconds": seconds,
+            "warmup": warmup,
+            "seed": seed,
+            "routes": len(data.route_ids),
+            "tickets": data.last_ticket_id - data.first_ticket_id + 1,
+            "git_commit": _git_commit(),
+            "server_version": _server_version(pool),
+            "python": platform.python_version(),
+            "profiling": pool.profiler is not None,
+            "started_at": started_at,
+        },
+        "operations": {name: summarize(latencies[name], errors[name], outcomes[name], seconds)
+                       for name in names},
+        "total": summarize([s for samples in latencies.values() for s in samples],
+                           sum(errors.values()), Counter(), seconds),
+        "pool": pool.stats(),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per operation throughput and latency of current relative to baseline, in percent."""
+    def change(old: Optional[float], new: Optional[float]) -> Optional[float]:
+        if not old or new is None:
+            return None
+        return round(100 * (new - old) / old, 1)
+
+    rows = []
+    for name in list(baseline["operations"]) + ["total"]:
+        old = baseline["total"] if name == "total" else baseline["operations"].get(name)
+        new = current["total"] if name == "total" else current["operations"].get(name)
+        if not old or not new:
+            continue
+        old_latency, new_latency = old.get("latency_ms", {}), new.get("latency_ms", {})
+        rows.append({
+            "operation": name,
+            "throughput": new["throughput"],
+            "throughput_change": change(old["throughput"], new["throughput"]),
+            **{f"{p}_ms": new_latency.get(p) for p in ("p50", "p99")},
+            **{f"{p}_change": change(old_latency.get(p), new_latency.get(p)) for p in ("p50", "p99")},
+        })
+    return rows
@@ -0,0 +1,301 @@
+"""Ticket booking and cancellation transactions, independent of the UI."""
+import hashlib
+import json
+from collections import Counter
+from dataclasses import astuple, dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mysql.connector import errorcode
+from mysql.connector.errors import IntegrityError
+
+from db import ConnectionPool
+from fares import trip_fares
+from seats import allocate_seats
+
+IDEMPOTENCY_INSERT = """
+    INSERT INTO idempotency_keys (Idempotency_Key, Request_Hash) VALUES (%s, %s)
+"""
+IDEMPOTENCY_LOOKUP = """
+    SELECT Request_Hash, Response FROM idempotency_keys WHERE Idempotency_Key = %s
+"""
+IDEMPOTENCY_SAVE = """
+    UPDATE idempotency_keys SET Ticket_ID = %s, Response = %s WHERE Idempotency_Key = %s
+"""
+
+GROUP_INSERT = """
+    INSERT INTO booking_groups (Idempotency_Key, Request_Hash, Booked_By) VALUES (%s, %s, %s)
+"""
+GROUP_LOOKUP = """
+    SELECT Group_ID, Request_Hash FROM booking_groups WHERE Idempotency_Key = %s
+"""
+GROUP_TOTALS = """
+    UPDATE booking_groups SET Passengers = %s, Total_Fare = %s WHERE Group_ID = %s
+"""
+GROUP_TICKETS = """
+    SELECT Ticket_ID, Route_ID, Booking_Date, Passenger_Name, Seat_Numbers, Total_Fare
+    FROM tickets WHERE Group_ID = %s ORDER BY Ticket_ID
+"""
+TRIP_CREATE = """
+    INSERT INTO trips (Route_ID, Travel_Date, Capacity, Available_Seats, Seat_Map)
+    SELECT Route_ID, %s, Seat_Capacity, Seat_Capacity, 0
+    FROM bus_routes WHERE Route_ID = %s
+    ON DUPLICATE KEY UPDATE Trip_ID = Trip_ID
+"""
+TRIP_TAKE = """
+    UPDATE trips SET Seat_Map = Seat_Map | %s, Available_Seats = Available_Seats - %s
+    WHERE Trip_ID = %s
+"""
+GROUP_TICKET_INSERT = """
+    INSERT INTO tickets (Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
+                         Booking_Date, Number_Of_Seats, Total_Fare, Seat_Numbers,
+                         Seat_Mask, Group_ID)
+    VALUES (%s, %s, %s, %s, %s, 1, %s, %s, %s, %s)
+"""
+STATS_BOOKED = """
+    INSERT INTO route_daily_stats (Route_ID, Stat_Date, Capacity, Bookings, Seats_Booked, Revenue)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        Capacity = VALUES(Capacity),
+        Bookings = Bookings + VALUES(Bookings),
+        Seats_Booked = Seats_Booked + VALUES(Seats_Booked),
+        Revenue = Revenue + VALUES(Revenue)
+"""
+
+
+@dataclass(frozen=True)
+class GroupPassenger:
+    """One passenger of a group booking, who gets one seat on one trip."""
+    route_id: int
+    travel_date: date
+    name: str
+    email: str
+    phone: str
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different booking request."""
+
+
+def request_hash(args: tuple) -> str:
+    """Fingerprint of a booking request, stored with its idempotency key."""
+    return hashlib.sha256(json.dumps(args, default=str).encode()).hexdigest()
+
+
+def replay(key: str, stored_hash: str, response: str, args: tuple) -> Dict[str, Any]:
+    """Return the stored result for a repeated key, or raise IdempotencyConflict."""
+    if stored_hash != request_hash(args):
+        raise IdempotencyConflict(f"Idempotency key {key!r} was used for a different request")
+    result = json.loads(response)
+    result['Replayed'] = True
+    return result
+
+
+def call_for_result(conn, procedure: str, args: tuple) -> Optional[Dict[str, Any]]:
+    """Call a procedure that reports its outcome as a single 'result' row."""
+    with conn.cursor(dictionary=True) as cursor:
+        cursor.callproc(procedure, args)
+
+        result = None
+        for result_cursor in cursor.stored_results():
+            result = result_cursor.fetchone()
+        return result
+
+
+def _book_once(conn, key: str, args: tuple) -> Optional[Dict[str, Any]]:
+    """Book under an idempotency key, or replay the result already stored for it."""
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(IDEMPOTENCY_INSERT, (key, request_hash(args)))
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            # The first request has committed; its response is stored with the key
+            cursor.execute(IDEMPOTENCY_LOOKUP, (key,))
+            stored_hash, response = cursor.fetchone()
+            return replay(key, stored_hash, response, args)
+
+    result = call_for_result(conn, 'BookTicket', args)
+    with conn.cursor() as cursor:
+        cursor.execute(IDEMPOTENCY_SAVE, (
+            result.get('Ticket_ID') if result else None,
+            json.dumps(result, default=str), key
+        ))
+    return result
+
+
+def book_seats(pool: ConnectionPool, route_id: int, passenger_name: str,
+               passenger_email: str, passenger_phone: str,
+               booking_date: date, num_seats: int,
+               idempotency_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Run BookTicket in its own transaction, retrying on deadlocks.
+    Returns the procedure's result row, e.g. {'result': 'SUCCESS', 'Ticket_ID': 7}.
+    With an idempotency_key, a repeat of the same request returns the first
+    result (with 'Replayed': True) instead of booking again.
+    """
+    args = (route_id, passenger_name, passenger_email,
+            passenger_phone, booking_date, num_seats)
+    if idempotency_key:
+        return pool.run_transaction(lambda conn: _book_once(conn, idempotency_key, args))
+    return pool.run_transaction(lambda conn: call_for_result(conn, 'BookTicket', args))
+
+
+def cancel_booking(pool: ConnectionPool, ticket_id: int) -> Optional[Dict[str, Any]]:
+    """Run CancelTicket in its own transaction, retrying on deadlocks."""
+    return pool.run_transaction(lambda conn: call_for_result(conn, 'CancelTicket', (ticket_id,)))
+
+
+def fares_query(route_ids: Sequence[int]) -> str:
+    return f"SELECT Route_ID, Fare FROM bus_routes WHERE Route_ID IN ({', '.join(['%s'] * len(route_ids))})"
+
+
+def lock_trips_query(trip_keys: Sequence[tuple]) -> str:
+    """Lock the trips for (Route_ID, Travel_Date) keys in one statement, in Trip_ID order."""
+    return f"""
+        SELECT Trip_ID, Route_ID, Travel_Date, Capacity, Seat_Map FROM trips
+        WHERE (Route_ID, Travel_Date) IN ({', '.join(['(%s, %s)'] * len(trip_keys))})
+        ORDER BY Trip_ID
+        FOR UPDATE
+    """
+
+
+def trip_fares_query(trip_keys: Sequence[tuple]) -> str:
+    """The route_fares tiers of the (Route_ID, Travel_Date) keys, for pricing.trip_fares."""
+    return f"""
+        SELECT Route_ID, Travel_Date, Min_Load, Fare, Group_Fare, Group_Min_Seats
+        FROM route_fares
+        WHERE (Route_ID, Travel_Date) IN ({', '.join(['(%s, %s)'] * len(trip_keys))})
+        ORDER BY Route_ID, Travel_Date, Min_Load
+    """
+
+
+def plan_group(passengers: Sequence[GroupPassenger], trips: Dict[tuple, Dict[str, Any]],
+               fares: Dict[tuple, Any], group_id: int) -> Dict[str, Any]:
+    """
+    Allocate seats for a whole group on locked trips, at the per-seat fare of
+    each trip. Returns the rows to write, or the trips that are short of seats.
+    """
+    wanted = Counter((p.route_id, p.travel_date) for p in passengers)
+    seats: Dict[tuple, List[int]] = {}
+    short = []
+    for key, count in wanted.items():
+        trip = trips[key]
+        allocated = allocate_seats(int(trip['Seat_Map']), trip['Capacity'], count)
+        if allocated is None:
+            short.append({"Route_ID": key[0], "Travel_Date": key[1], "Requested": count,
+                          "Available": trip['Capacity'] - bin(int(trip['Seat_Map'])).count("1")})
+        else:
+            seats[key] = allocated
+    if short:
+        return {"short": short}
+
+    remaining = {key: iter(allocated) for key, allocated in seats.items()}
+    tickets = []
+    for p in passengers:
+        seat = next(remaining[(p.route_id, p.travel_date)])
+        tickets.append((p.route_id, p.name, p.email, p.phone, p.travel_date,
+                        fares[(p.route_id, p.travel_date)], str(seat), 1 << (seat - 1), group_id))
+    return {
+        "trips": [(sum(1 << (s - 1) for s in allocated), len(allocated), trips[key]['Trip_ID'])
+                  for key, allocated in seats.items()],
+        "tickets": tickets,
+        "stats": [(key[0], key[1], trips[key]['Capacity'], len(allocated), len(allocated),
+                   round(fares[key] * len(allocated), 2)) for key, allocated in seats.items()],
+        "total_fare": sum(t[5] for t in tickets),
+    }
+
+
+def _group_result(cursor, group_id: int, replayed: bool) -> Dict[str, Any]:
+    cursor.execute(GROUP_TICKETS, (group_id,))
+    tickets = cursor.fetchall()
+    return {"result": "SUCCESS", "Group_ID": group_id, "Tickets": tickets,
+            "Total_Fare": sum(t['Total_Fare'] for t in tickets), "Replayed": replayed}
+
+
+def group_hash(passengers: Sequence[GroupPassenger]) -> str:
+    return request_hash(tuple(astuple(p) for p in passengers))
+
+
+def check_group_hash(key: str, stored_hash: str, digest: str) -> None:
+    if stored_hash != digest:
+        raise IdempotencyConflict(f"Idempotency key {key!r} was used for a different request")
+
+
+def _book_group(conn, key: str, booked_by: Optional[str],
+                passengers: Sequence[GroupPassenger]) -> Dict[str, Any]:
+    digest = group_hash(passengers)
+    with conn.cursor(dictionary=True) as cursor:
+        try:
+            cursor.execute(GROUP_INSERT, (key, digest, booked_by))
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            cursor.execute(GROUP_LOOKUP, (key,))
+            group = cursor.fetchone()
+            check_group_hash(key, group['Request_Hash'], digest)
+            return _group_result(cursor, group['Group_ID'], replayed=True)
+        group_id = cursor.lastrowid
+
+        route_ids = sorted({p.route_id for p in passengers})
+        cursor.execute(fares_query(route_ids), tuple(route_ids))
+        base_fares = {row['Route_ID']: row['Fare'] for row in cursor.fetchall()}
+        unknown = [r for r in route_ids if r not in base_fares]
+        if unknown:
+            conn.rollback()
+            return {"result": "UNKNOWN_ROUTE", "Route_IDs": unknown}
+
+        # Create missing trips, then lock every trip of the group at once
+        trip_keys = sorted({(p.route_id, p.travel_date) for p in passengers})
+        cursor.executemany(TRIP_CREATE, [(d, r) for r, d in trip_keys])
+        cursor.execute(lock_trips_query(trip_keys), tuple(v for k in trip_keys for v in k))
+        trips = {(row['Route_ID'], row['Travel_Date']): row for row in cursor.fetchall()}
+        # Priced on the locked seat maps, as BookTicket prices a single booking
+        cursor.execute(trip_fares_query(trip_keys), tuple(v for k in trip_keys for v in k))
+        fares = trip_fares(trips, Counter((p.route_id, p.travel_date) for p in passengers),
+                           base_fares, cursor.fetchall())
+
+        plan = plan_group(passengers, trips, fares, group_id)
+        if "short" in plan:
+            conn.rollback()
+            return {"result": "INSUFFICIENT_SEATS", "Short_Trips": plan["short"]}
+
+        cursor.executemany(TRIP_TAKE, plan["trips"])
+        cursor.executemany(GROUP_TICKET_INSERT, plan["tickets"])
+        cursor.executemany(STATS_BOOKED, plan["stats"])
+        cursor.execute(GROUP_TOTALS, (len(passengers), plan["total_fare"], group_id))
+        return _group_result(cursor, group_id, replayed=False)
+
+
+def book_group(pool: ConnectionPool, passengers: Sequence[GroupPassenger],
+               idempotency_key: str, booked_by: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Book one seat per passenger, across any number of routes and dates, in a
+    single transaction: either every passenger gets a ticket or none does.
+    Returns {'result': 'SUCCESS', 'Group_ID', 'Tickets', 'Total_Fare', 'Replayed'},
+    or 'INSUFFICIENT_SEATS' with the Short_Trips, or 'UNKNOWN_ROUTE'.
+    Repeating a request with the same idempotency_key returns the first booking.
+    """
+    if not passengers:
+        raise ValueError("A group booking needs at least one passenger")
+    return pool.run_transaction(lambda conn: _book_group(conn, idempotency_key, booked_by, passengers))
+
+
+def route_tickets(pool: ConnectionPool, route_id: int, status: Optional[str] = None,
+                  from_date: Optional[date] = None, to_date: Optional[date] = None,
+                  after: Optional[tuple] = None, limit: int = 50,
+                  archived: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    One page of tickets for a route, newest first, and the total matching count.
+    For the next page pass the (Created_At, Ticket_ID) of the last ticket as after.
+    With archived, the page comes from tickets_archive instead.
+    """
+    after_created_at, after_ticket_id = after or (None, None)
+    procedure = 'GetArchivedRouteTickets' if archived else 'GetRouteTickets'
+    with pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.callproc(procedure, (
+            route_id, status, from_date, to_date,
+            after_created_at, after_ticket_id, limit
+        ))
+        results = [result.fetchall() for result in cursor.stored_results()]
+    return results[0], results[1][0]['Total']
@@ -0,0 +1,79 @@
+"""Send one notification to many users in batched inserts inside a single transaction."""
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, List, Optional
+
+from db import ConnectionPool
+
+# Who a broadcast can be sent to
+TARGETS = ("all", "role", "passengers")
+
+
+@dataclass
+class BroadcastResult:
+    """Outcome of a broadcast."""
+    recipients: int
+    inserted: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.inserted / self.seconds if self.seconds else 0.0
+
+
+def resolve_recipients(conn, target: str, role: Optional[str] = None,
+                       route_id: Optional[int] = None,
+                       travel_date: Optional[date] = None) -> List[int]:
+    """
+    Return the User_IDs a broadcast goes to.
+    'passengers' matches users whose email holds a Booked ticket on the route and date.
+    """
+    with conn.cursor() as cursor:
+        if target == "all":
+            cursor.execute("SELECT User_ID FROM users ORDER BY User_ID")
+        elif target == "role":
+            cursor.execute("""
+                SELECT User_ID FROM users
+                WHERE Role = %s
+                ORDER BY User_ID
+            """, (role,))
+        elif target == "passengers":
+            cursor.execute("""
+                SELECT DISTINCT u.User_ID
+                FROM tickets t
+                JOIN users u ON u.email = t.Passenger_Email
+                WHERE t.Route_ID = %s AND t.Booking_Date = %s AND t.Status = 'Booked'
+                ORDER BY u.User_ID
+            """, (route_id, travel_date))
+        else:
+            raise ValueError(f"Unknown broadcast target {target!r}; expected one of {TARGETS}")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def broadcast_notification(pool: ConnectionPool, message: str, target: str,
+                           role: Optional[str] = None, route_id: Optional[int] = None,
+                           travel_date: Optional[date] = None, batch_size: int = 1000,
+                           progress: Optional[Callable[[int, int], None]] = None) -> BroadcastResult:
+    """
+    Insert the message for every recipient of the target in one transaction.
+    Rows go in batch_size at a time with executemany (a multi-row INSERT);
+    progress(done, total) is called after each batch.
+    """
+    def work(conn) -> BroadcastResult:
+        start = time.perf_counter()
+        user_ids = resolve_recipients(conn, target, role, route_id, travel_date)
+        inserted = 0
+        with conn.cursor() as cursor:
+            for i in range(0, len(user_ids), batch_size):
+                batch = user_ids[i:i + batch_size]
+                cursor.executemany("""
+                    INSERT INTO notifications (User_ID, Message, is_read)
+                    VALUES (%s, %s, FALSE)
+                """, [(user_id, message) for user_id in batch])
+                inserted += len(batch)
+                if progress:
+                    progress(inserted, len(user_ids))
+        return BroadcastResult(len(user_ids), inserted, time.perf_counter() - start)
+
+    return pool.run_transaction(work)
@@ -0,0 +1,131 @@
+"""In-process route catalog cache with a separately refreshed seat availability overlay."""
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from search import RouteGraph
+from storage import Storage
+
+
+class RouteCatalog:
+    """
+    Caches the bus_routes rows, which change rarely, for ttl seconds, along
+    with the RouteGraph built from them for journey planning.
+    Per-date seat availability is cached separately for seat_ttl seconds and is
+    dropped whenever a booking or cancellation touches that date, so seat
+    counts are never served stale from this process.
+    """
+
+    def __init__(self, storage: Storage, ttl: float = 300.0, seat_ttl: float = 5.0):
+        self.storage = storage
+        self.ttl = ttl
+        self.seat_ttl = seat_ttl
+        self._lock = threading.Lock()
+        self._routes: Optional[List[Dict[str, Any]]] = None
+        self._routes_loaded_at = 0.0
+        self._graph: Optional[RouteGraph] = None
+        self._seats: Dict[date, Tuple[float, Dict[int, int]]] = {}
+        # One loader per date at a time, and invalidations counted per date (and
+        # for all dates), so a load that overlapped an invalidation is not cached
+        self._seat_loads: Dict[date, threading.Lock] = {}
+        self._seat_versions: Dict[date, int] = {}
+        self._seat_epoch = 0
+        self._counters = {"route_hits": 0, "route_misses": 0,
+                          "seat_hits": 0, "seat_misses": 0, "invalidations": 0}
+
+    def routes(self) -> List[Dict[str, Any]]:
+        """Return the route rows, reloading them once the TTL has passed."""
+        with self._lock:
+            fresh = (self._routes is not None
+                     and time.monotonic() - self._routes_loaded_at < self.ttl)
+            if fresh:
+                self._counters["route_hits"] += 1
+            else:
+                self._counters["route_misses"] += 1
+                self._routes = self.storage.list_routes()
+                self._routes_loaded_at = time.monotonic()
+                self._graph = None
+            routes = self._routes
+        return [dict(r) for r in routes]
+
+    def graph(self) -> RouteGraph:
+        """Return the route graph, rebuilt whenever the route rows are reloaded."""
+        self.routes()
+        with self._lock:
+            if self._graph is None:
+                self._graph = RouteGraph(self._routes or [])
+            return self._graph
+
+    def add_route(self, route: Dict[str, Any]) -> None:
+        """Add a newly created route to the cached rows and graph without a reload."""
+        with self._lock:
+            if self._routes is not None:
+                self._routes.append(route)
+            if self._graph is not None:
+                self._graph.add_route(route)
+
+    def _cached_seats(self, travel_date: date) -> Optional[Dict[int, int]]:
+        cached = self._seats.get(travel_date)
+        if cached and time.monotonic() - cached[0] < self.seat_ttl:
+            self._counters["seat_hits"] += 1
+            return cached[1]
+        return None
+
+    def availability(self, travel_date: date) -> Dict[int, int]:
+        """
+        Return {Route_ID: Available_Seats} for trips on travel_date. The query
+        runs outside the catalog lock, so a slow one only holds up other
+        sessions asking for the same date, which then share its result.
+        """
+        with self._lock:
+            seats = self._cached_seats(travel_date)
+            if seats is not None:
+                return seats
+            loading = self._seat_loads.setdefault(travel_date, threading.Lock())
+        with loading:
+            with self._lock:
+                seats = self._cached_seats(travel_date)
+                if seats is not None:
+                    return seats
+                self._counters["seat_misses"] += 1
+                version = (self._seat_epoch, self._seat_versions.get(travel_date, 0))
+            seats = self.storage.availability(travel_date)
+            with self._lock:
+                if version == (self._seat_epoch, self._seat_versions.get(travel_date, 0)):
+                    self._seats[travel_date] = (time.monotonic(), seats)
+            return seats
+
+    def routes_with_availability(self, travel_date: date) -> List[Dict[str, Any]]:
+        """Return the route rows with Available_Seats filled in for travel_date."""
+        routes = self.routes()
+        seats = self.availability(travel_date)
+        for r in routes:
+            r['Available_Seats'] = seats.get(r['Route_ID'], r['Seat_Capacity'])
+        return routes
+
+    def invalidate_routes(self) -> None:
+        """Drop the cached route rows, e.g. after a route is created."""
+        with self._lock:
+            self._routes = None
+            self._graph = None
+            self._counters["invalidations"] += 1
+
+    def invalidate_seats(self, travel_date: Optional[date] = None) -> None:
+        """Drop cached availability for one date, or for every date."""
+        with self._lock:
+            if travel_date is None:
+                self._seats.clear()
+                self._seat_epoch += 1
+            else:
+                self._seats.pop(travel_date, None)
+                self._seat_versions[travel_date] = self._seat_versions.get(travel_date, 0) + 1
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and what is currently cached."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["cached_routes"] = len(self._routes) if self._routes is not None else 0
+            stats["cached_dates"] = len(self._seats)
+            return stats
@@ -0,0 +1,67 @@
+"""Database and storage settings, read from BUS_* environment variables."""
+import os
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class DatabaseConfig:
+    """Connection settings for the bus_mgmt database."""
+    host: str = "localhost"
+    port: int = 3306
+    user: str = "root"
+    password: str = ""
+    database: str = "bus_mgmt"
+    pool_size: int = 8
+    pool_timeout: float = 5.0
+    health_check_interval: float = 30.0
+    profile: bool = True
+    slow_query_ms: float = 200.0
+    backend: str = "mysql"
+    sqlite_path: str = "bus_mgmt.db"
+    # Read replicas as "host[:port],host[:port]"; empty for none
+    replicas: str = ""
+    max_replica_lag: float = 5.0
+    lag_check_interval: float = 2.0
+    read_your_writes: float = 10.0
+
+
+# Environment variable for each DatabaseConfig field
+ENV_VARS = {
+    "host": "BUS_DB_HOST",
+    "port": "BUS_DB_PORT",
+    "user": "BUS_DB_USER",
+    "password": "BUS_DB_PASSWORD",
+    "database": "BUS_DB_NAME",
+    "pool_size": "BUS_DB_POOL_SIZE",
+    "pool_timeout": "BUS_DB_POOL_TIMEOUT",
+    "health_check_interval": "BUS_DB_HEALTH_CHECK_INTERVAL",
+    "profile": "BUS_DB_PROFILE",
+    "slow_query_ms": "BUS_SLOW_QUERY_MS",
+    "backend": "BUS_STORAGE",
+    "sqlite_path": "BUS_SQLITE_PATH",
+    "replicas": "BUS_DB_REPLICAS",
+    "max_replica_lag": "BUS_DB_MAX_REPLICA_LAG",
+    "lag_check_interval": "BUS_DB_LAG_CHECK_INTERVAL",
+    "read_your_writes": "BUS_DB_READ_YOUR_WRITES",
+}
+
+
+def load_database_config(overrides: Optional[Dict[str, Any]] = None) -> DatabaseConfig:
+    """
+    Build the database settings.
+    Values come from the defaults, then BUS_DB_* environment variables,
+    then the given overrides (e.g. the [mysql] section of st.secrets).
+    """
+    values: Dict[str, Any] = {}
+    for f in fields(DatabaseConfig):
+        raw = os.environ.get(ENV_VARS[f.name])
+        if overrides and f.name in overrides:
+            raw = overrides[f.name]
+        if raw is None:
+            continue
+        if f.type is bool and isinstance(raw, str):
+            values[f.name] = raw.strip().lower() in ("1", "true", "yes", "on")
+        else:
+            values[f.name] = f.type(raw) if isinstance(f.type, type) else raw
+    return DatabaseConfig(**values)
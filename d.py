@@ -1,528 +1,848 @@
 import streamlit as st
-import mysql.connector
 from mysql.connector import Error
 import hashlib
-from typing import Optional, List, Dict, Any
-from datetime import datetime, date
+import math
+import os
+import time
+import uuid
+from typing import Optional, List, Dict, Any, Callable, TypeVar
+from datetime import datetime, date, timedelta
 
-def get_database_connection():
+from db import ConnectionPool, bind_session, load_database_config
+import analytics
+from archiver import (NOTIFICATION_RETENTION_DAYS, TICKET_RETENTION_DAYS,
+                      UNREAD_RETENTION_DAYS, table_sizes)
+from auth import LoginResult, SlidingWindowLimiter, hash_password, login
+from booking import GroupPassenger, IdempotencyConflict, book_group
+from broadcast import broadcast_notification
+from catalog import RouteCatalog
+from exporter import EXPORT_DIR, FORMATS
+from importer import import_file, parse_distance, parse_duration, read_rows
+from holds import HOLD_TTL, HoldSweeper
+from inventory import generate_trips
+from jobs import JobRunner, list_jobs
+from outbox import dead_letters, outbox_stats, requeue_dead
+from pricing import DEFAULT_RULES, PRICING_DAYS, FareQuotes, reprice
+from profiler import start_metrics_server
+from seats import MAX_SEATS
+from storage import Storage, StorageError, create_storage
+
+@st.cache_resource
+def open_storage() -> Storage:
+    """Open the configured storage backend once per Streamlit server process."""
     try:
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="9448522402",
-            database="bus_mgmt"
-        )
-    except Error as e:
-        st.error(f"Error connecting to the database: {e}")
+        # Optional [mysql] section in .streamlit/secrets.toml
+        overrides = dict(st.secrets["mysql"])
+    except Exception:
+        overrides = {}
+    return create_storage(load_database_config(overrides))
+
+def get_storage() -> Storage:
+    """
+    The shared storage backend, with this browser session's queries
+    attributed to it so that reads after its own writes skip the replicas.
+    """
+    bind_session(st.session_state.setdefault('routing_session', uuid.uuid4().hex))
+    return open_storage()
+
+def get_connection_pool() -> Optional[ConnectionPool]:
+    """The MySQL connection pool, or None when another storage backend is configured."""
+    return get_storage().pool
+
+def has_mysql() -> bool:
+    """Whether the MySQL-only features (jobs, imports, analytics, ...) are available."""
+    return get_storage().pool is not None
+
+@st.cache_resource
+def get_route_catalog() -> RouteCatalog:
+    """Create the shared route catalog cache once per Streamlit server process."""
+    return RouteCatalog(get_storage())
+
+@st.cache_resource
+def get_fare_quotes() -> FareQuotes:
+    """Create the shared fare quote cache once per Streamlit server process."""
+    return FareQuotes(get_storage())
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Start the background job runner once per Streamlit server process."""
+    catalog = get_route_catalog()
+    quotes = get_fare_quotes()
+
+    def on_finish(job_type: str, params: Dict[str, Any]) -> None:
+        catalog.invalidate_seats()
+        if job_type == "reprice_fares":
+            quotes.invalidate()
+
+    runner = JobRunner(get_connection_pool(), on_finish=on_finish)
+    runner.resume_queued()
+    return runner
+
+@st.cache_resource
+def get_hold_sweeper() -> HoldSweeper:
+    """Start the seat hold expiry sweeper once per Streamlit server process."""
+    catalog = get_route_catalog()
+    return HoldSweeper(get_storage(),
+                       on_release=lambda route_id, travel_date: catalog.invalidate_seats(travel_date)).start()
+
+@st.cache_resource
+def get_login_limiter() -> SlidingWindowLimiter:
+    """Failed login counters shared by all sessions of this server process."""
+    return SlidingWindowLimiter()
+
+@st.cache_resource
+def start_metrics_endpoint() -> Optional[int]:
+    """Serve the query metrics for Prometheus when BUS_METRICS_PORT is set."""
+    port = os.environ.get("BUS_METRICS_PORT")
+    profiler = get_connection_pool().profiler if has_mysql() else None
+    if not port or profiler is None:
         return None
+    start_metrics_server(profiler, int(port))
+    return int(port)
+
+def client_address() -> Optional[str]:
+    """The browser's address, preferring the proxy's X-Forwarded-For header."""
+    forwarded = st.context.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return getattr(st.context, "ip_address", None)
+
+def db_connection():
+    """Borrow a pooled connection: ``with db_connection() as conn: ...``"""
+    return get_connection_pool().connection()
+
+T = TypeVar("T")
+
+# Seconds a session-cached query result is reused. This session's own changes
+# invalidate it straight away; the TTL bounds how long changes made by other
+# sessions go unseen.
+SESSION_CACHE_TTL = 30.0
+
+def session_cached(namespace: str, key: tuple, loader: Callable[[], T]) -> T:
+    """Return loader()'s result, memoized in this session under (namespace, key)."""
+    cache = st.session_state.setdefault('_query_cache', {}).setdefault(namespace, {})
+    hit = cache.get(key)
+    if hit and time.monotonic() - hit[0] < SESSION_CACHE_TTL:
+        return hit[1]
+    value = loader()
+    cache[key] = (time.monotonic(), value)
+    return value
+
+def invalidate_session_cache(*namespaces: str) -> None:
+    """Drop this session's cached results for the given namespaces."""
+    cache = st.session_state.get('_query_cache', {})
+    for namespace in namespaces:
+        cache.pop(namespace, None)
+
+def session_cached_rows(namespace: str) -> List[Dict[str, Any]]:
+    """Every row currently cached under a namespace, for patching in place."""
+    cache = st.session_state.get('_query_cache', {}).get(namespace, {})
+    return [row for _, value in cache.values() if isinstance(value, list) for row in value]
+
+# Page sizes for the paginated list views
+TICKET_PAGE_SIZE = 50
+NOTIFICATION_PAGE_SIZE = 25
+COMPLAINT_PAGE_SIZE = 50
+
+COMPLAINT_STATUSES = ['Pending', 'In Progress', 'Resolved']
+# Hours an open complaint may wait before it counts as over the SLA
+COMPLAINT_SLA_HOURS = int(os.environ.get("BUS_COMPLAINT_SLA_HOURS", "48"))
 
 # Existing functions remain the same...
 # Add new functions for complaints and tickets
 
-def create_bus_route(route_name: str, source: str, destination: str, 
-                    distance: str, duration: str, fare: str) -> bool:
+def create_bus_route(route_name: str, source: str, destination: str,
+                    distance: str, duration: str, fare: str, seats: int = 30) -> bool:
     """Create a new bus route in the database."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
     try:
-        cursor = conn.cursor()
         # Convert fare to float for decimal handling
         fare_decimal = float(fare)
-        
-        cursor.callproc('CreateBusRoute', (
-            route_name, source, destination, distance, duration, fare_decimal
-        ))
-        
-        conn.commit()
+        distance_km = parse_distance(distance)
+        duration_hours = round(parse_duration(duration), 2)
+
+        route = {
+            'RouteName': route_name, 'Source': source,
+            'Destination': destination, 'Distance': distance, 'Duration': duration,
+            'Distance_Km': distance_km, 'Duration_Hours': duration_hours,
+            'Fare': fare_decimal, 'Seat_Capacity': seats
+        }
+        route['Route_ID'] = get_storage().create_route(route)
+
+        # Add the new edge to the cached catalog and route graph in place
+        get_route_catalog().add_route(route)
         st.success("Bus route created successfully!")
         return True
-        
-    except Error as e:
+
+    except ValueError as e:
+        st.error(f"Invalid route details: {e}")
+        return False
+
+    except StorageError as e:
         st.error(f"Error creating bus route: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
 
 def get_users() -> List[Dict[str, Any]]:
     """Retrieve all users from the database."""
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT User_ID, Username, email, Role
-            FROM users
-            ORDER BY Username
-        """)
-        users = cursor.fetchall()
-        return users
-            
-    except Error as e:
+        return session_cached("users", (), get_storage().list_users)
+
+    except StorageError as e:
         st.error(f"Error retrieving users: {e}")
         return []
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
 
 def create_notification(user_id: int, message: str) -> bool:
     """Create a new notification for a specific user."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
     try:
-        cursor = conn.cursor()
-        cursor.callproc('CreateNotification', (user_id, message))
-        conn.commit()
+        get_storage().create_notification(user_id, message)
+        invalidate_session_cache("notifications")
         st.success("Notification sent successfully!")
         return True
-        
-    except Error as e:
+
+    except StorageError as e:
         st.error(f"Error creating notification: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-def get_notifications(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+
+def send_broadcast(message: str, target: str, role: Optional[str] = None,
+                   route_id: Optional[int] = None, travel_date: Optional[date] = None) -> bool:
+    """Send a notification to every user in a broadcast target."""
+    progress_bar = st.progress(0.0, text="Sending notifications...")
+
+    def report(done: int, total: int) -> None:
+        progress_bar.progress(done / total, text=f"Sent {done} of {total}")
+
+    try:
+        result = broadcast_notification(
+            get_connection_pool(), message, target, role, route_id, travel_date,
+            progress=report
+        )
+        progress_bar.empty()
+        invalidate_session_cache("notifications")
+        if result.recipients == 0:
+            st.warning("No matching recipients found")
+            return False
+        st.success(f"Notification sent to {result.inserted} users "
+                   f"in {result.seconds:.2f}s ({result.rows_per_sec:.0f} rows/sec)")
+        return True
+
+    except Error as e:
+        progress_bar.empty()
+        st.error(f"Error sending notifications: {e}")
+        return False
+
+def submit_job(job_type: str, params: Dict[str, Any]) -> Optional[int]:
+    """Start a background job and return its Job_ID."""
+    try:
+        job_id = get_job_runner().submit(
+            job_type, params, st.session_state['user_data']['Username']
+        )
+        st.success(f"Started job #{job_id}. Follow its progress on the Jobs page.")
+        return job_id
+
+    except Error as e:
+        st.error(f"Error starting job: {e}")
+        return None
+
+def get_table_sizes() -> List[Dict[str, Any]]:
+    """Approximate size of the hot and archive tables."""
+    try:
+        return table_sizes(get_connection_pool())
+
+    except Error as e:
+        st.error(f"Error retrieving table sizes: {e}")
+        return []
+
+def get_jobs() -> List[Dict[str, Any]]:
+    """Retrieve the most recent background jobs."""
+    try:
+        return list_jobs(get_connection_pool())
+
+    except Error as e:
+        st.error(f"Error retrieving jobs: {e}")
+        return []
+
+def display_outbox() -> None:
+    """Delivery queue depth per channel, and the dead letters with a retry button."""
+    try:
+        stats = outbox_stats(get_connection_pool())
+        dead = dead_letters(get_connection_pool())
+
+    except Error as e:
+        st.error(f"Error retrieving the delivery outbox: {e}")
+        return
+
+    if stats:
+        st.dataframe(stats, hide_index=True, use_container_width=True)
+    else:
+        st.info("No deliveries queued yet")
+    if dead:
+        st.write("### Dead Letters")
+        st.dataframe(dead, hide_index=True, use_container_width=True)
+        if st.button("Retry Dead Deliveries"):
+            try:
+                st.success(f"Requeued {requeue_dead(get_connection_pool())} deliveries")
+            except Error as e:
+                st.error(f"Error requeueing deliveries: {e}")
+
+@st.fragment(run_every="2s")
+def display_jobs_table() -> None:
+    """Helper function to display background jobs, refreshed every few seconds"""
+    jobs = get_jobs()
+    if jobs:
+        job_data = []
+        for j in jobs:
+            total = j['Progress_Total']
+            job_data.append({
+                "ID": j['Job_ID'],
+                "Type": j['Job_Type'],
+                "Status": j['Status'],
+                "Progress": f"{j['Progress_Done']}/{total}" if total else j['Progress_Done'] or "-",
+                "Started By": j['Created_By'],
+                "Created": j['Created_At'],
+                "Finished": j['Finished_At'],
+                "Result": j['Error'] or j['Result'],
+            })
+        st.dataframe(job_data, hide_index=True, use_container_width=True)
+    else:
+        st.info("No jobs found")
+
+def get_notifications(user_id: Optional[int] = None, after: Optional[tuple] = None,
+                      limit: int = NOTIFICATION_PAGE_SIZE,
+                      archived: bool = False) -> List[Dict[str, Any]]:
     """
-    Retrieve notifications from the database.
+    Retrieve one page of notifications from the database, newest first.
     If user_id is provided, returns notifications for that user only.
+    For the next page pass the (Created_At, Notification_ID) of the last one shown as after.
     """
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
+    if user_id:
+        return get_user_notifications(user_id, after, limit, archived)
+
     try:
-        cursor = conn.cursor(dictionary=True)
-        if user_id:
-            # Get notifications for specific user
-            cursor.execute("""
-                SELECT n.Notification_ID, n.Message, n.Created_At,
-                       u.Username as Recipient
-                FROM notifications n
-                JOIN users u ON n.User_ID = u.User_ID
-                WHERE n.User_ID = %s
-                ORDER BY n.Created_At DESC
-            """, (user_id,))
-        else:
-            # Admin view - get all notifications
-            cursor.execute("""
-                SELECT n.Notification_ID, n.Message, n.Created_At,
-                       u.Username as Recipient
-                FROM notifications n
-                JOIN users u ON n.User_ID = u.User_ID
-                ORDER BY n.Created_At DESC
-            """)
-        notifications = cursor.fetchall()
-        return notifications
-            
-    except Error as e:
+        return session_cached("notifications", ("all", after, limit, archived),
+                              lambda: get_storage().notifications(after, limit, archived))
+
+    except StorageError as e:
         st.error(f"Error retrieving notifications: {e}")
         return []
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
 
-def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
-    """Get user details by username"""
-    conn = get_database_connection()
-    if not conn:
-        return None
-    
+def count_unread_notifications(user_id: int) -> int:
+    """Count a user's unread notifications."""
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT User_ID, Username, email, Role
-            FROM users
-            WHERE Username = %s
-        """, (username,))
-        return cursor.fetchone()
-            
-    except Error as e:
-        st.error(f"Error retrieving user: {e}")
-        return None
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+        return session_cached("notifications", ("unread", user_id),
+                              lambda: get_storage().count_unread(user_id))
 
-def create_notification(user_id: int, message: str) -> bool:
-    """Create a new notification for a specific user."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
+    except StorageError as e:
+        st.error(f"Error counting notifications: {e}")
+        return 0
+
+def mark_notifications_read(notification_ids: List[int]) -> bool:
+    """Mark notifications as read."""
     try:
-        cursor = conn.cursor()
-        cursor.callproc('CreateNotification', (user_id, message))
-        conn.commit()
-        st.success("Notification sent successfully!")
+        get_storage().mark_notifications_read(notification_ids)
+
+        # Patch the cached pages instead of reloading them
+        marked = set(notification_ids)
+        for row in session_cached_rows("notifications"):
+            if row['Notification_ID'] in marked:
+                row['is_read'] = True
+        cache = st.session_state.get('_query_cache', {}).get("notifications", {})
+        for key in [k for k in cache if k[0] == "unread"]:
+            del cache[key]
         return True
-        
-    except Error as e:
-        st.error(f"Error creating notification: {e}")
+
+    except StorageError as e:
+        st.error(f"Error updating notification: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
 
-def display_notifications_table(notifications: List[Dict[str, Any]]) -> None:
+def get_user_by_username(username: str) -> Optional[Dict[str, Any]]:
+    """Get user details by username"""
+    try:
+        return get_storage().get_user(username)
+
+    except StorageError as e:
+        st.error(f"Error retrieving user: {e}")
+        return None
+
+def display_notifications_table(notifications: List[Dict[str, Any]],
+                                allow_mark_read: bool = False) -> None:
     """Helper function to display notifications in a formatted table"""
     if notifications:
         st.write("### Notifications")
-        for n in notifications:
-            with st.expander(f"Notification from {n['Created_At'].strftime('%Y-%m-%d %H:%M')}"):
-                st.write(f"**To:** {n['Recipient']}")
-                st.write(n['Message'])
+        event = st.dataframe(
+            [{
+                "Date": n['Created_At'],
+                "To": n['Recipient'],
+                "Message": n['Message'],
+                "Read": bool(n['is_read']),
+            } for n in notifications],
+            hide_index=True, use_container_width=True, key="notification_table",
+            on_select="rerun" if allow_mark_read else "ignore",
+            selection_mode="multi-row",
+        )
+        if allow_mark_read:
+            selected = [notifications[i]['Notification_ID'] for i in event.selection.rows
+                        if not notifications[i]['is_read']]
+            if st.button("Mark Selected as Read", disabled=not selected):
+                if mark_notifications_read(selected):
+                    st.rerun(scope="fragment")
     else:
         st.info("No notifications found")
 
-def get_user_notifications(user_id: int) -> List[Dict[str, Any]]:
-    """Retrieve notifications for a specific user."""
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
+@st.fragment
+def display_notification_feed(user_id: Optional[int] = None) -> None:
+    """Helper function to display notifications one page at a time"""
+    if user_id:
+        st.write(f"**Unread:** {count_unread_notifications(user_id)}")
+
+    # Old notifications are only read from the archive when asked for
+    archived = st.toggle("Show archived", key=f"notifications_archived_{user_id}")
+    cursors = keyset_cursors('notification_pages', (user_id, archived))
+    # Fetch one extra row to know whether there is a next page
+    notifications = get_notifications(user_id, cursors[-1] if cursors else None,
+                                      NOTIFICATION_PAGE_SIZE + 1, archived)
+    has_next = len(notifications) > NOTIFICATION_PAGE_SIZE
+    notifications = notifications[:NOTIFICATION_PAGE_SIZE]
+
+    display_notifications_table(notifications,
+                                allow_mark_read=user_id is not None and not archived)
+    if notifications:
+        last = notifications[-1]
+        page_buttons(cursors, (last['Created_At'], last['Notification_ID']) if has_next else None,
+                     "notifications")
+
+def get_user_notifications(user_id: int, after: Optional[tuple] = None,
+                           limit: int = NOTIFICATION_PAGE_SIZE,
+                           archived: bool = False) -> List[Dict[str, Any]]:
+    """Retrieve one page of notifications for a specific user, newest first."""
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('GetUserNotifications', (user_id,))
-        
-        notifications = []
-        for result in cursor.stored_results():
-            notifications = result.fetchall()
-        
-        return notifications
-            
-    except Error as e:
+        return session_cached(
+            "notifications", ("user", user_id, after, limit, archived),
+            lambda: get_storage().user_notifications(user_id, after, limit, archived)
+        )
+
+    except StorageError as e:
         st.error(f"Error retrieving user notifications: {e}")
         return []
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
 
-            
-def display_bus_routes() -> List[Dict[str, Any]]:
-    """Retrieve all bus routes from the database."""
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
+
+def display_bus_routes(travel_date: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieve all bus routes from the cached route catalog.
+    Available_Seats is the availability on travel_date (today by default).
+    """
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT Route_ID, RouteName, Source, Destination, 
-                   Distance, Duration, Fare, Available_Seats
-            FROM bus_routes
-            ORDER BY Route_ID
-        """)
-        routes = cursor.fetchall()
-        return routes
-            
-    except Error as e:
+        return get_route_catalog().routes_with_availability(travel_date or date.today())
+
+    except StorageError as e:
         st.error(f"Error retrieving bus routes: {e}")
         return []
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def check_admin_login(username: str, password: str) -> tuple[bool, Optional[dict]]:
-    """Verify administrator login credentials and return user data if successful."""
-    conn = get_database_connection()
-    if not conn:
-        return False, None
-    
+
+def find_routes(source: str, destination: str, travel_date: date, num_seats: int = 1,
+                sort_by: str = "fare") -> Dict[str, Any]:
+    """
+    Search for journeys between two cities, matching misspelt or partial names.
+    Returns the matched city names, direct routes with seats on travel_date,
+    and one-change connections ranked by fare or duration.
+    """
     try:
-        cursor = conn.cursor(dictionary=True)
-        # Hash the password using SHA-256
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        
-        # Check admin credentials
-        cursor.execute("""
-            SELECT Admin_ID, Username, Role
-            FROM Administrators
-            WHERE Username = %s AND Password = %s
-        """, (username, hashed_password))
-        
-        admin_data = cursor.fetchone()
-        
-        if admin_data:
-            return True, admin_data
-        return False, None
-        
-    except Error as e:
-        st.error(f"Error during admin login: {e}")
-        return False, None
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+        catalog = get_route_catalog()
+        graph = catalog.graph()
+        sources, destinations = graph.match_city(source), graph.match_city(destination)
+
+        seats = catalog.availability(travel_date)
+        direct = []
+        for r in get_storage().search_routes(sources, destinations):
+            r['Available_Seats'] = seats.get(r['Route_ID'], r['Seat_Capacity'])
+            if r['Available_Seats'] >= num_seats:
+                direct.append(r)
 
+        connections = []
+        if sources and destinations:
+            journeys = graph.journeys_between(sources, destinations, sort_by, seats, num_seats)
+            connections = [j for j in journeys if len(j.legs) > 1]
 
+        return {"sources": sources, "destinations": destinations,
+                "direct": direct, "connections": connections}
 
+    except StorageError as e:
+        st.error(f"Error searching routes: {e}")
+        return {"sources": [], "destinations": [], "direct": [], "connections": []}
+
+def check_admin_login(username: str, password: str) -> LoginResult:
+    """Verify administrator login credentials."""
+    try:
+        return login(get_storage(), "admin", username, password,
+                     client_address(), get_login_limiter())
+
+    except StorageError as e:
+        st.error(f"Error during admin login: {e}")
+        return LoginResult()
 
 def register_new_operator(username: str, password: str, first_name: str, last_name: str, email: str) -> bool:
     """Register a new bus operator in the system."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
     try:
-        cursor = conn.cursor(dictionary=True)
-        # Hash the password using SHA-256
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        
-        cursor.callproc('RegisterOperator', (
-            username, hashed_password, first_name, last_name, email
-        ))
-        
-        result = None
-        for result_cursor in cursor.stored_results():
-            result = result_cursor.fetchone()
-        
-        conn.commit()
-        
+        hashed_password = hash_password(password)
+
+        result = get_storage().register_operator(username, hashed_password,
+                                                 first_name, last_name, email)
+
         if result and result['result'] == 'SUCCESS':
             st.success("Operator registered successfully!")
             return True
         elif result and result['result'] == 'DUPLICATE':
             st.error("Username or email already exists")
             return False
-            
+
         return False
-        
-    except Error as e:
+
+    except StorageError as e:
         st.error(f"Error registering operator: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def check_operator_login(username: str, password: str) -> tuple[bool, Optional[dict]]:
-    """Verify operator login credentials and return user data if successful."""
-    conn = get_database_connection()
-    if not conn:
-        return False, None
-    
+
+def check_operator_login(username: str, password: str) -> LoginResult:
+    """Verify operator login credentials."""
     try:
-        cursor = conn.cursor(dictionary=True)
-        # Hash the password using SHA-256
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        
-        cursor.callproc('CheckOperatorLogin', (username, hashed_password))
-        
-        result = None
-        for result_cursor in cursor.stored_results():
-            result = result_cursor.fetchone()
-        
-        if result and result['result'] == 'SUCCESS':
-            # Get operator details
-            cursor.execute("""
-                SELECT Operator_ID, Username, First_Name, Last_Name, Email, Status
-                FROM Operators WHERE Username = %s
-            """, (username,))
-            operator_data = cursor.fetchone()
-            return True, operator_data
-            
-        return False, None
-        
-    except Error as e:
+        return login(get_storage(), "operator", username, password,
+                     client_address(), get_login_limiter())
+
+    except StorageError as e:
         st.error(f"Error during login: {e}")
-        return False, None
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+        return LoginResult()
 
 def create_complaint(operator_id: int, subject: str, message: str) -> bool:
     """Create a new complaint in the database."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
     try:
-        cursor = conn.cursor()
-        cursor.callproc('CreateComplaint', (operator_id, subject, message))
-        conn.commit()
+        get_storage().create_complaint(operator_id, subject, message)
+        invalidate_session_cache("complaints")
         st.success("Complaint submitted successfully")
         return True
-        
-    except Error as e:
+
+    except StorageError as e:
         st.error(f"Error submitting complaint: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def get_complaints() -> List[Dict[str, Any]]:
-    """Retrieve all complaints from the database."""
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
+
+def get_complaints(status: Optional[str] = None, operator_id: Optional[int] = None,
+                   from_date: Optional[date] = None, to_date: Optional[date] = None,
+                   after: Optional[tuple] = None,
+                   limit: int = COMPLAINT_PAGE_SIZE) -> tuple[List[Dict[str, Any]], int]:
+    """
+    Get one page of the complaint queue, oldest first, and the total matching count.
+    For the next page pass the (Created_At, Complaint_ID) of the last complaint shown as after.
+    """
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('GetComplaintList')
-        
-        complaints = []
-        for result in cursor.stored_results():
-            complaints = result.fetchall()
-        
-        return complaints
-            
-    except Error as e:
+        return session_cached(
+            "complaints", ("page", status, operator_id, from_date, to_date, after, limit),
+            lambda: get_storage().complaints(status, operator_id, from_date, to_date, after, limit)
+        )
+
+    except StorageError as e:
         st.error(f"Error retrieving complaints: {e}")
+        return [], 0
+
+def get_complaint_stats() -> Dict[str, Dict[str, Any]]:
+    """Complaint counts per status, with how many are past the SLA."""
+    try:
+        rows = session_cached("complaints", ("stats", COMPLAINT_SLA_HOURS),
+                              lambda: get_storage().complaint_stats(COMPLAINT_SLA_HOURS))
+        return {row['Status']: row for row in rows}
+
+    except StorageError as e:
+        st.error(f"Error retrieving complaint counts: {e}")
+        return {}
+
+def get_operators() -> List[Dict[str, Any]]:
+    """Retrieve the ID and username of every operator."""
+    try:
+        return session_cached("operators", (), get_storage().list_operators)
+
+    except StorageError as e:
+        st.error(f"Error retrieving operators: {e}")
         return []
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def update_complaint_status(complaint_id: int, status: str) -> bool:
-    """Update the status of a complaint."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
+
+def update_complaints_status(complaint_ids: List[int], status: str) -> bool:
+    """Move several complaints to a status with a single UPDATE."""
     try:
-        cursor = conn.cursor()
-        cursor.callproc('UpdateComplaintStatus', (complaint_id, status))
-        conn.commit()
-        st.success(f"Complaint status updated to {status}")
+        changed = get_storage().update_complaints_status(complaint_ids, status)
+        # Pages filtered by status and the counters are both affected
+        invalidate_session_cache("complaints")
+        st.success(f"{changed} complaint(s) moved to {status}")
         return True
-        
-    except Error as e:
+
+    except StorageError as e:
         st.error(f"Error updating complaint status: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def book_ticket(route_id: int, passenger_name: str, passenger_email: str, 
-                passenger_phone: str, booking_date: date, num_seats: int) -> bool:
-    """Book a new ticket."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
+
+def booking_key(*request) -> str:
+    """
+    Idempotency key for a booking form submission: the same request submitted
+    twice (a double-click, or a retry after a failed commit) gets the same
+    key, so it is only booked once. The nonce changes after each successful
+    booking, so booking the same request again later is a new booking.
+    """
+    if 'booking_nonce' not in st.session_state:
+        st.session_state['booking_nonce'] = uuid.uuid4().hex
+    digest = hashlib.sha256(repr(request).encode()).hexdigest()
+    return f"ui-{st.session_state['booking_nonce']}-{digest[:32]}"
+
+def quote_fare(route: Dict[str, Any], travel_date: date, num_seats: int) -> float:
+    """The per-seat fare booking num_seats on a route would be charged now."""
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('BookTicket', (
-            route_id, passenger_name, passenger_email,
-            passenger_phone, booking_date, num_seats
-        ))
-        
-        result = None
-        for result_cursor in cursor.stored_results():
-            result = result_cursor.fetchone()
-        
-        conn.commit()
-        
+        return get_fare_quotes().quote(route, travel_date, num_seats, route['Available_Seats'])
+
+    except StorageError as e:
+        st.error(f"Error quoting fare: {e}")
+        return float(route['Fare'])
+
+def reprice_fares(start: date, days: int) -> None:
+    """Recompute the fare matrix: as a background job on MySQL, inline on SQLite."""
+    if has_mysql():
+        submit_job("reprice_fares", {"start": start, "days": days})
+        return
+    try:
+        with st.spinner("Repricing..."):
+            result = reprice(get_storage(), start, days)
+        get_fare_quotes().invalidate()
+        st.success(f"Priced {result['routes']} routes for {result['days']} days "
+                   f"in {result['seconds']}s")
+
+    except StorageError as e:
+        st.error(f"Error repricing fares: {e}")
+
+def place_hold(route_id: int, booking_date: date, num_seats: int) -> Optional[Dict[str, Any]]:
+    """Hold seats while the passenger's details are entered."""
+    try:
+        result = get_storage().hold_seats(route_id, booking_date, num_seats,
+                                          st.session_state['user_data']['Username'], HOLD_TTL)
+        get_route_catalog().invalidate_seats(booking_date)
+
         if result and result['result'] == 'SUCCESS':
-            st.success("Ticket booked successfully!")
-            return True
+            return result
         elif result and result['result'] == 'INSUFFICIENT_SEATS':
             st.error("Not enough seats available")
-            return False
-            
+
+        return None
+
+    except StorageError as e:
+        st.error(f"Error holding seats: {e}")
+        return None
+
+def confirm_booking(hold: Dict[str, Any], passenger_name: str,
+                    passenger_email: str, passenger_phone: str) -> bool:
+    """Book the held seats for a passenger. Returns True once the hold is used up."""
+    try:
+        result = get_storage().confirm_hold(hold['Hold_ID'], passenger_name,
+                                            passenger_email, passenger_phone)
+
+        if result and result['result'] == 'SUCCESS':
+            get_route_catalog().invalidate_seats(hold['Travel_Date'])
+            invalidate_session_cache("tickets")
+            st.success(f"Ticket #{result['Ticket_ID']} booked successfully! "
+                       f"Seats: {result['Seat_Numbers']}, total fare ₹{result['Total_Fare']}")
+            return True
+        elif result and result['result'] == 'HOLD_EXPIRED':
+            st.error("The hold on these seats has expired. Please choose seats again.")
+            return True
+
         return False
-        
-    except Error as e:
+
+    except StorageError as e:
         st.error(f"Error booking ticket: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+
+def release_seats(hold: Dict[str, Any]) -> None:
+    """Give held seats back."""
+    try:
+        get_storage().release_hold(hold['Hold_ID'])
+        get_route_catalog().invalidate_seats(hold['Travel_Date'])
+
+    except StorageError as e:
+        st.error(f"Error releasing seats: {e}")
+
+def book_group_tickets(passengers: List[GroupPassenger]) -> bool:
+    """Book a group of passengers, all or none."""
+    try:
+        result = book_group(get_connection_pool(), passengers,
+                            booking_key(*passengers),
+                            st.session_state['user_data']['Username'])
+        for travel_date in {p.travel_date for p in passengers}:
+            get_route_catalog().invalidate_seats(travel_date)
+        invalidate_session_cache("tickets")
+
+        if result['result'] == 'SUCCESS':
+            # The next submission of this form is a new booking, even of the same group
+            st.session_state.pop('booking_nonce', None)
+            verb = "was already booked" if result['Replayed'] else "booked"
+            st.success(f"Group #{result['Group_ID']} {verb}: {len(result['Tickets'])} tickets, "
+                       f"total fare ₹{result['Total_Fare']}")
+            st.dataframe(result['Tickets'], hide_index=True, use_container_width=True)
+            return True
+        elif result['result'] == 'INSUFFICIENT_SEATS':
+            st.error("Not enough seats for the whole group; nothing was booked")
+            st.dataframe(result['Short_Trips'], hide_index=True, use_container_width=True)
+            return False
+
+        st.error(f"Unknown routes: {result['Route_IDs']}")
+        return False
+
+    except (Error, IdempotencyConflict) as e:
+        st.error(f"Error booking group: {e}")
+        return False
 
 def cancel_ticket(ticket_id: int) -> bool:
     """Cancel a ticket."""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('CancelTicket', (ticket_id,))
-        
-        result = None
-        for result_cursor in cursor.stored_results():
-            result = result_cursor.fetchone()
-        
-        conn.commit()
-        
+        result = get_storage().cancel_ticket(ticket_id)
+
         if result and result['result'] == 'SUCCESS':
+            get_route_catalog().invalidate_seats(result['Booking_Date'])
+            invalidate_session_cache("tickets")
             st.success("Ticket cancelled successfully!")
             return True
         elif result and result['result'] == 'ALREADY_CANCELLED':
             st.error("Ticket is already cancelled")
             return False
-            
+
         return False
-        
-    except Error as e:
+
+    except StorageError as e:
         st.error(f"Error cancelling ticket: {e}")
         return False
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def get_route_tickets(route_id: int) -> List[Dict[str, Any]]:
-    """Get all tickets for a specific route."""
-    conn = get_database_connection()
-    if not conn:
-        return []
-    
+
+def import_uploaded_file(kind: str, uploaded_file) -> None:
+    """Bulk import routes or trips from an uploaded CSV or Parquet file."""
+    file_format = "parquet" if uploaded_file.name.lower().endswith(".parquet") else "csv"
+    status = st.empty()
+
+    def report(rows_read: int) -> None:
+        status.write(f"Processed {rows_read} rows...")
+
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('GetRouteTickets', (route_id,))
-        
-        tickets = []
-        for result in cursor.stored_results():
-            tickets = result.fetchall()
-        
-        return tickets
-            
+        result = import_file(get_connection_pool(), kind,
+                             read_rows(uploaded_file, file_format), progress=report)
+        get_route_catalog().invalidate_routes()
+        get_route_catalog().invalidate_seats()
+        status.empty()
+
+    except (Error, ValueError, RuntimeError) as e:
+        status.empty()
+        st.error(f"Error importing {kind}: {e}")
+        return
+
+    st.success(f"Imported {result.inserted} of {result.rows_read} rows in "
+               f"{result.seconds:.2f}s ({result.rows_per_sec:.0f} rows/sec)")
+    if result.error_count:
+        st.warning(f"{result.error_count} rows were rejected")
+        st.dataframe([{"Row": row, "Error": message} for row, message in result.errors],
+                     hide_index=True, use_container_width=True)
+
+def get_route_analytics(start_date: date, end_date: date):
+    """Load the daily route rollup for a range of travel dates, or None on error."""
+    try:
+        return analytics.load_daily_stats(get_connection_pool(), start_date, end_date)
+
     except Error as e:
+        st.error(f"Error retrieving analytics: {e}")
+        return None
+
+def display_analytics(start_date: date, end_date: date) -> None:
+    """Helper function to display revenue and occupancy for a date range"""
+    df = get_route_analytics(start_date, end_date)
+    if df is None:
+        return
+    if df.empty:
+        st.info("No bookings for these travel dates")
+        return
+
+    names = {r['Route_ID']: r['RouteName'] for r in display_bus_routes()}
+    summary = analytics.totals(df)
+    cols = st.columns(4)
+    cols[0].metric("Net Revenue", f"₹{summary['net_revenue']:,.2f}")
+    cols[1].metric("Seats Sold", summary['seats_sold'])
+    cols[2].metric("Load Factor", f"{summary['load_factor']:.0%}")
+    cols[3].metric("Cancellation Rate", f"{summary['cancellation_rate']:.1%}")
+
+    st.write("### Net Revenue by Day")
+    st.line_chart(analytics.daily_series(df).rename(columns=names))
+
+    routes = analytics.route_summary(df)
+    routes.insert(1, "Route", routes["Route_ID"].map(names))
+    st.write("### Load Factor by Route")
+    st.bar_chart(routes.set_index("Route")["Load_Factor"])
+
+    st.write("### Route Performance")
+    st.dataframe(
+        routes.drop(columns=["Capacity"]),
+        hide_index=True, use_container_width=True,
+        column_config={
+            "Net_Revenue": st.column_config.NumberColumn("Net Revenue", format="₹%.2f"),
+            "Load_Factor": st.column_config.ProgressColumn("Load Factor", min_value=0, max_value=1),
+            "Cancellation_Rate": st.column_config.NumberColumn("Cancellation Rate", format="%.3f"),
+        }
+    )
+
+def display_performance() -> None:
+    """Query timings per statement and per calling function, and the slow query log."""
+    profiler = get_connection_pool().profiler
+    if profiler is None:
+        st.info("Query profiling is off (BUS_DB_PROFILE=0)")
+        return
+
+    st.caption(f"Since {datetime.fromtimestamp(profiler.started_at):%Y-%m-%d %H:%M:%S}; "
+               f"percentiles cover the last few minutes")
+    st.subheader("Statements")
+    st.dataframe(profiler.statements(), use_container_width=True, hide_index=True)
+    st.subheader("Calling Functions")
+    st.dataframe(profiler.callers(), use_container_width=True, hide_index=True)
+
+    st.subheader(f"Slow Queries (over {1000 * profiler.slow_seconds:.0f} ms)")
+    slow = list(reversed(profiler.slow_log))
+    if not slow:
+        st.write("No slow queries recorded")
+    for entry in slow:
+        with st.expander(f"{entry['at']}  {entry['ms']} ms  {entry['caller']}"):
+            st.code(entry['statement'], language="sql")
+            if entry['plan']:
+                st.dataframe(entry['plan'], use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download Prometheus Metrics", profiler.prometheus(),
+                           file_name="metrics.txt", mime="text/plain")
+    with col2:
+        if st.button("Reset Statistics"):
+            profiler.reset()
+            st.rerun()
+
+def create_trips(start_date: date, days: int) -> int:
+    """Generate trips for every route over the given dates."""
+    try:
+        created = generate_trips(get_connection_pool(), start_date, days)
+        get_route_catalog().invalidate_seats()
+        st.success(f"Created {created} new trips")
+        return created
+
+    except Error as e:
+        st.error(f"Error generating trips: {e}")
+        return 0
+
+def get_route_tickets(route_id: int, status: Optional[str] = None,
+                      from_date: Optional[date] = None, to_date: Optional[date] = None,
+                      after: Optional[tuple] = None, limit: int = TICKET_PAGE_SIZE,
+                      archived: bool = False) -> tuple[List[Dict[str, Any]], int]:
+    """
+    Get one page of tickets for a route, newest first, and the total matching count.
+    For the next page pass the (Created_At, Ticket_ID) of the last ticket shown as after.
+    """
+    try:
+        return session_cached(
+            "tickets", (route_id, status, from_date, to_date, after, limit, archived),
+            lambda: get_storage().route_tickets(route_id, status, from_date, to_date,
+                                                after, limit, archived)
+        )
+
+    except StorageError as e:
         st.error(f"Error retrieving tickets: {e}")
-        return []
-        
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+        return [], 0
+
 def display_bus_routes_table(routes):
     """Helper function to display bus routes in a formatted table"""
     if routes:
@@ -541,76 +861,208 @@ def display_bus_routes_table(routes):
             })
         st.table(route_data)
 
-def display_complaints_table(complaints):
-    """Helper function to display complaints in a formatted table"""
+@st.fragment
+def display_complaint_stats() -> None:
+    """Helper function to display the queue's counters per status and against the SLA"""
+    stats = get_complaint_stats()
+    cols = st.columns(len(COMPLAINT_STATUSES) + 1)
+    for col, status in zip(cols, COMPLAINT_STATUSES):
+        col.metric(status, stats[status]['Total'] if status in stats else 0)
+
+    open_rows = [stats[status] for status in COMPLAINT_STATUSES[:-1] if status in stats]
+    cols[-1].metric(f"Open Over {COMPLAINT_SLA_HOURS}h",
+                    sum(int(row['Over_SLA'] or 0) for row in open_rows))
+    oldest = min((row['Oldest_Created_At'] for row in open_rows), default=None)
+    if oldest:
+        age = datetime.now() - oldest
+        st.caption(f"Oldest open complaint filed {oldest:%Y-%m-%d %H:%M} "
+                   f"({age.days}d {age.seconds // 3600}h ago)")
+
+def display_complaints_table(complaints, allow_update: bool = False):
+    """Helper function to display complaints in a table, with the selected one's details"""
+    event = st.dataframe(
+        [{
+            "ID": c['Complaint_ID'],
+            "Subject": c['Subject'],
+            "Operator": c['Operator_Name'],
+            "Status": c['Status'],
+            "Date": c['Created_At'],
+        } for c in complaints],
+        hide_index=True, use_container_width=True, key="complaint_table",
+        on_select="rerun", selection_mode="multi-row" if allow_update else "single-row",
+    )
+    if not event.selection.rows:
+        st.caption("Select complaints to see their details"
+                   if allow_update else "Select a complaint to see its details")
+        return
+
+    selected = [complaints[i] for i in event.selection.rows]
+    c = selected[0]
+    st.write(f"#### Complaint #{c['Complaint_ID']} - {c['Subject']}")
+    st.write(f"**Operator:** {c['Operator_Name']} | **Status:** {c['Status']} | "
+             f"**Date:** {c['Created_At'].strftime('%Y-%m-%d %H:%M')}")
+    st.write(c['Message'])
+    if len(selected) > 1:
+        st.caption(f"and {len(selected) - 1} more selected")
+
+    if allow_update:
+        new_status = st.selectbox("Move Selected To", COMPLAINT_STATUSES,
+                                  index=COMPLAINT_STATUSES.index(c['Status']),
+                                  key="complaint_new_status")
+        ids = [row['Complaint_ID'] for row in selected if row['Status'] != new_status]
+        if st.button(f"Update {len(ids)} Complaint(s)", disabled=not ids):
+            if update_complaints_status(ids, new_status):
+                st.rerun(scope="fragment")
+
+@st.fragment
+def display_complaint_queue(operator_id: Optional[int] = None) -> None:
+    """
+    Helper function to display the complaint queue one page at a time.
+    With operator_id, only that operator's complaints are shown, read-only.
+    """
+    allow_update = operator_id is None
+    if allow_update:
+        display_complaint_stats()
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        status = st.selectbox("Status", ["All"] + COMPLAINT_STATUSES, key="complaint_status")
+    with col2:
+        if allow_update:
+            operators = {o['Username']: o['Operator_ID'] for o in get_operators()}
+            operator = st.selectbox("Operator", ["All"] + list(operators), key="complaint_operator")
+            operator_id = operators.get(operator)
+    with col3:
+        from_date = st.date_input("Filed From", value=None, key="complaint_from")
+    with col4:
+        to_date = st.date_input("Filed To", value=None, key="complaint_to")
+
+    status = None if status == "All" else status
+    cursors = keyset_cursors('complaint_pages', (status, operator_id, from_date, to_date))
+    complaints, total = get_complaints(status, operator_id, from_date, to_date,
+                                       cursors[-1] if cursors else None)
     if complaints:
-        st.write("### Complaints List")
-        for c in complaints:
-            with st.expander(f"Complaint #{c['Complaint_ID']} - {c['Subject']}"):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.write(f"**Operator:** {c['Operator_Name']}")
-                with col2:
-                    st.write(f"**Status:** {c['Status']}")
-                with col3:
-                    st.write(f"**Date:** {c['Created_At'].strftime('%Y-%m-%d %H:%M')}")
-                
-                st.write("**Message:**")
-                st.write(c['Message'])
-                
-                # Add status update option for admin
-                if st.session_state.get('user_type') == 'admin':
-                    new_status = st.selectbox(
-                        "Update Status",
-                        ['Pending', 'In Progress', 'Resolved'],
-                        key=f"status_{c['Complaint_ID']}",
-                        index=['Pending', 'In Progress', 'Resolved'].index(c['Status'])
-                    )
-                    if new_status != c['Status']:
-                        if st.button("Update Status", key=f"update_{c['Complaint_ID']}"):
-                            update_complaint_status(c['Complaint_ID'], new_status)
-                            st.rerun()
+        page = len(cursors) + 1
+        page_count = max(1, math.ceil(total / COMPLAINT_PAGE_SIZE))
+        st.write(f"### Complaints ({total} complaints, page {page} of {page_count})")
+        display_complaints_table(complaints, allow_update)
+        last = complaints[-1]
+        page_buttons(cursors,
+                     (last['Created_At'], last['Complaint_ID']) if page < page_count else None,
+                     "complaints")
+    else:
+        st.info("No complaints found")
 
+def keyset_cursors(state_key: str, filters: tuple) -> list:
+    """
+    Return the session's stack of keyset cursors for a paginated list view.
+    The last cursor is where the current page starts; the stack is reset
+    whenever the filters change.
+    """
+    pages = st.session_state.get(state_key)
+    if not pages or pages['filters'] != filters:
+        pages = {'filters': filters, 'cursors': []}
+        st.session_state[state_key] = pages
+    return pages['cursors']
+
+def page_buttons(cursors: list, next_cursor: Optional[tuple], key: str) -> None:
+    """Render Previous/Next buttons for a keyset-paginated list view inside a fragment."""
+    col1, col2 = st.columns(2)
+    with col1:
+        if cursors and st.button("Previous Page", key=f"{key}_prev"):
+            cursors.pop()
+            st.rerun(scope="fragment")
+    with col2:
+        if next_cursor and st.button("Next Page", key=f"{key}_next"):
+            cursors.append(next_cursor)
+            st.rerun(scope="fragment")
+
+@st.fragment
 def display_route_tickets(route_id):
-    """Helper function to display tickets for a route"""
-    tickets = get_route_tickets(route_id)
+    """Helper function to display tickets for a route, one page at a time"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        status = st.selectbox("Status", ["All", "Booked", "Cancelled"],
+                              key=f"ticket_status_{route_id}")
+    with col2:
+        from_date = st.date_input("Travel Date From", value=None, key=f"ticket_from_{route_id}")
+    with col3:
+        to_date = st.date_input("Travel Date To", value=None, key=f"ticket_to_{route_id}")
+    archived = st.toggle("Archived tickets (past the retention period)",
+                         key=f"ticket_archived_{route_id}")
+
+    cursors = keyset_cursors('ticket_pages', (route_id, status, from_date, to_date, archived))
+
+    tickets, total = get_route_tickets(
+        route_id,
+        None if status == "All" else status,
+        from_date,
+        to_date,
+        cursors[-1] if cursors else None,
+        archived=archived
+    )
     if tickets:
-        st.write("### Ticket List")
-        for t in tickets:
-            with st.expander(f"Ticket #{t['Ticket_ID']} - {t['Passenger_Name']}"):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.write(f"**Booking Date:** {t['Booking_Date']}")
-                with col2:
-                    st.write(f"**Seats:** {t['Number_Of_Seats']}")
-                with col3:
-                    st.write(f"**Status:** {t['Status']}")
-                
-                st.write(f"**Email:** {t['Passenger_Email']}")
-                st.write(f"**Phone:** {t['Passenger_Phone']}")
-                st.write(f"**Total Fare:** ₹{t['Total_Fare']}")
-                
-                if t['Status'] == 'Booked':
-                    if st.button("Cancel Ticket", key=f"cancel_{t['Ticket_ID']}"):
-                        if cancel_ticket(t['Ticket_ID']):
-                            st.rerun()
+        page = len(cursors) + 1
+        page_count = max(1, math.ceil(total / TICKET_PAGE_SIZE))
+        st.write(f"### Ticket List ({total} tickets, page {page} of {page_count})")
+        event = st.dataframe(
+            [{
+                "Ticket": t['Ticket_ID'],
+                "Passenger": t['Passenger_Name'],
+                "Travel Date": t['Booking_Date'],
+                "Seats": t['Number_Of_Seats'],
+                "Seat No.": t.get('Seat_Numbers'),
+                "Status": t['Status'],
+                "Email": t['Passenger_Email'],
+                "Phone": t['Passenger_Phone'],
+                "Total Fare": float(t['Total_Fare']),
+            } for t in tickets],
+            hide_index=True, use_container_width=True, key=f"ticket_table_{route_id}",
+            on_select="rerun", selection_mode="multi-row",
+            column_config={"Total Fare": st.column_config.NumberColumn(format="₹%.2f")},
+        )
+        selected = [tickets[i]['Ticket_ID'] for i in event.selection.rows
+                    if tickets[i]['Status'] == 'Booked' and not archived]
+        if st.button("Cancel Selected Tickets", disabled=not selected,
+                     key=f"cancel_selected_{route_id}"):
+            cancelled = [ticket_id for ticket_id in selected if cancel_ticket(ticket_id)]
+            if cancelled:
+                st.rerun(scope="fragment")
+
+        last = tickets[-1]
+        page_buttons(cursors, (last['Created_At'], last['Ticket_ID']) if page < page_count else None,
+                     f"tickets_{route_id}")
+    else:
+        st.info("No tickets found")
 
 def admin_portal():
+    get_hold_sweeper()
+    start_metrics_endpoint()
     st.title("Bus Ticket Administration Portal")
     st.write(f"Welcome, {st.session_state['user_data']['Username']}")
     
-    menu = st.sidebar.selectbox(
-        "Menu",
-        ["Create Bus Route", "Display Bus Routes",
-         "Create Notification", "Display Notifications",
-         "View Complaints"]
-    )
+    menu_options = ["Create Bus Route", "Display Bus Routes", "Fares",
+                    "Create Notification", "Display Notifications", "View Complaints"]
+    if has_mysql():
+        menu_options += ["Generate Trips", "Import Routes", "Export", "Jobs",
+                         "Analytics", "Performance"]
+    menu = st.sidebar.selectbox("Menu", menu_options)
     
     if st.sidebar.button("Logout"):
         for key in st.session_state.keys():
             del st.session_state[key]
         st.rerun()
 
+    if has_mysql():
+        with st.sidebar.expander("Connection Pool"):
+            st.json(get_connection_pool().stats())
+    with st.sidebar.expander("Route Cache"):
+        st.json(get_route_catalog().stats())
+    with st.sidebar.expander("Fare Quotes"):
+        st.json(get_fare_quotes().stats())
+    with st.sidebar.expander("Login Throttling"):
+        st.json(get_login_limiter().stats())
+
     if menu == "Create Bus Route":
         st.header("Create New Bus Route")
         with st.form("route_form"):
@@ -620,16 +1072,18 @@ def admin_portal():
             distance = st.text_input("Distance (km)")
             duration = st.text_input("Duration (hours)")
             fare = st.number_input("Fare (₹)", min_value=0.0, step=0.5)
+            seats = st.number_input("Seats per Bus", min_value=1, max_value=MAX_SEATS, value=30)
             
             if st.form_submit_button("Create Route"):
                 if all([route_name, source, destination, distance, duration, str(fare)]):
-                    create_bus_route(route_name, source, destination, distance, duration, str(fare))
+                    create_bus_route(route_name, source, destination, distance, duration, str(fare), int(seats))
                 else:
                     st.error("All fields are required")
     
     elif menu == "Display Bus Routes":
         st.header("All Bus Routes")
-        routes = display_bus_routes()
+        travel_date = st.date_input("Show Availability On", key="admin_travel_date")
+        routes = display_bus_routes(travel_date)
         display_bus_routes_table(routes)
         
         # Display tickets for each route
@@ -643,47 +1097,224 @@ def admin_portal():
             selected_route_id = next(r['Route_ID'] for r in routes if r['RouteName'] == selected_route)
             display_route_tickets(selected_route_id)
 
+    elif menu == "Fares":
+        st.header("Demand-Based Fares")
+        st.write("Fares follow days to departure, weekends and how full the bus is. "
+                 "Reprice daily so upcoming dates move into their new tiers.")
+        with st.form("reprice_form"):
+            start = st.date_input("From", value=date.today())
+            days = st.number_input("Days", min_value=1, max_value=365, value=PRICING_DAYS)
+            if st.form_submit_button("Reprice Fares"):
+                reprice_fares(start, int(days))
+
+        travel_date = st.date_input("Show Fares On", key="fares_travel_date")
+        try:
+            fares = get_storage().fares(travel_date)
+        except StorageError as e:
+            st.error(f"Error retrieving fares: {e}")
+            fares = []
+        if fares:
+            names = {r['Route_ID']: r['RouteName'] for r in display_bus_routes(travel_date)}
+            st.dataframe([{"Route": names.get(f['Route_ID'], f['Route_ID']),
+                           "Seats Taken From": f"{float(f['Min_Load']):.0%}",
+                           "Fare": float(f['Fare']), "Group Fare": float(f['Group_Fare']),
+                           "Group From": f['Group_Min_Seats']} for f in fares],
+                         column_config={"Fare": st.column_config.NumberColumn(format="₹%.2f"),
+                                        "Group Fare": st.column_config.NumberColumn(format="₹%.2f")},
+                         hide_index=True, use_container_width=True)
+        else:
+            st.info("This date has not been priced; bookings pay the base fare")
+
     elif menu == "Create Notification":
         st.header("Create New Notification")
-        users = get_users()
-        
-        with st.form("notification_form"):
-            user_options = {f"{user['Username']} (ID: {user['User_ID']})": user['User_ID'] 
-                          for user in users}
+        # Broadcasts are bulk inserts on the MySQL pool
+        send_to = st.radio("Send To", ["Single User", "All Users", "Role", "Route Passengers"]
+                           if has_mysql() else ["Single User"], horizontal=True)
+
+        if send_to == "Single User":
+            users = get_users()
             
-            if user_options:
-                selected_user = st.selectbox("Select User", options=list(user_options.keys()))
-                message = st.text_area("Notification Message")
+            with st.form("notification_form"):
+                user_options = {f"{user['Username']} (ID: {user['User_ID']})": user['User_ID'] 
+                              for user in users}
                 
-                if st.form_submit_button("Create Notification"):
-                    if message:
-                        user_id = user_options[selected_user]
-                        create_notification(user_id, message)
-                    else:
+                if user_options:
+                    selected_user = st.selectbox("Select User", options=list(user_options.keys()))
+                    message = st.text_area("Notification Message")
+                    
+                    if st.form_submit_button("Create Notification"):
+                        if message:
+                            user_id = user_options[selected_user]
+                            create_notification(user_id, message)
+                        else:
+                            st.error("Please enter a message")
+                else:
+                    st.error("No users found in the system")
+                    st.form_submit_button("Create Notification", disabled=True)
+        else:
+            with st.form("broadcast_form"):
+                role = route_id = travel_date = None
+                if send_to == "Role":
+                    role = st.selectbox("Role", ['user', 'operator', 'conductor'])
+                elif send_to == "Route Passengers":
+                    routes = display_bus_routes()
+                    route_options = {r['RouteName']: r['Route_ID'] for r in routes}
+                    selected_route = st.selectbox("Route", options=list(route_options.keys()))
+                    route_id = route_options.get(selected_route)
+                    travel_date = st.date_input("Travel Date")
+                message = st.text_area("Notification Message")
+                in_background = st.checkbox("Run as background job")
+
+                if st.form_submit_button("Send Broadcast"):
+                    if not message:
                         st.error("Please enter a message")
-            else:
-                st.error("No users found in the system")
-                st.form_submit_button("Create Notification", disabled=True)
+                    elif send_to == "Route Passengers" and route_id is None:
+                        st.error("No routes found in the system")
+                    else:
+                        target = {"All Users": "all", "Role": "role",
+                                  "Route Passengers": "passengers"}[send_to]
+                        if in_background:
+                            submit_job("broadcast_notification", {
+                                "message": message, "target": target, "role": role,
+                                "route_id": route_id, "travel_date": travel_date
+                            })
+                        else:
+                            send_broadcast(message, target, role, route_id, travel_date)
 
     elif menu == "Display Notifications":
         st.header("All Notifications")
-        notifications = get_notifications()
-        display_notifications_table(notifications)
+        if has_mysql():
+            with st.expander("Email Delivery"):
+                st.caption("Notifications are emailed by the outbox worker: python outbox.py run")
+                display_outbox()
+        display_notification_feed()
         
     elif menu == "View Complaints":
         st.header("Operator Complaints")
-        complaints = get_complaints()
-        display_complaints_table(complaints)
+        display_complaint_queue()
+
+    elif menu == "Generate Trips":
+        st.header("Generate Trips")
+        st.write("Create seat inventory for every route ahead of time. "
+                 "Trips are also created automatically on their first booking.")
+        with st.form("trips_form"):
+            start_date = st.date_input("Start Date")
+            days = st.number_input("Number of Days", min_value=1, max_value=366, value=30)
+            
+            if st.form_submit_button("Generate Trips"):
+                create_trips(start_date, int(days))
+
+    elif menu == "Import Routes":
+        st.header("Bulk Import")
+        kind = st.radio("Import", ["routes", "trips"], horizontal=True,
+                        format_func=lambda k: k.capitalize())
+        if kind == "routes":
+            st.write("Columns: RouteName, Source, Destination, Distance, Duration, Fare, "
+                     "Seat_Capacity (optional)")
+        else:
+            st.write("Columns: Route_ID or RouteName, Travel_Date (YYYY-MM-DD), "
+                     "Capacity (optional)")
+        uploaded_file = st.file_uploader("CSV or Parquet file", type=["csv", "parquet"])
+        if uploaded_file and st.button("Import"):
+            import_uploaded_file(kind, uploaded_file)
+
+    elif menu == "Export":
+        st.header("Export Tickets")
+        kind = st.radio("Export", ["manifest", "tickets"], horizontal=True,
+                        format_func=lambda k: "Passenger Manifest" if k == "manifest" else "All Tickets")
+        with st.form("export_form"):
+            params: Dict[str, Any] = {"kind": kind}
+            if kind == "manifest":
+                routes = display_bus_routes()
+                route_options = {r['RouteName']: r['Route_ID'] for r in routes}
+                selected_route = st.selectbox("Route", options=list(route_options.keys()))
+                params["route_id"] = route_options.get(selected_route)
+                params["travel_date"] = st.date_input("Travel Date")
+            else:
+                params["created_on"] = st.date_input("Booked On (leave empty for all)", value=None)
+                status = st.selectbox("Status", ["All", "Booked", "Cancelled"])
+                params["status"] = None if status == "All" else status
+                params["archived"] = st.checkbox("Include archived tickets", value=True)
+            params["format"] = st.selectbox("Format", FORMATS)
+
+            if st.form_submit_button("Start Export"):
+                if kind == "manifest" and params["route_id"] is None:
+                    st.error("No routes found in the system")
+                else:
+                    submit_job("export", params)
+
+        st.write("### Exported Files")
+        files = sorted(os.listdir(EXPORT_DIR), reverse=True) if os.path.isdir(EXPORT_DIR) else []
+        if files:
+            # st.download_button holds the whole file in memory, so only the
+            # file asked for is read, and only when its download is requested
+            name = st.selectbox("File", files, format_func=lambda n: (
+                f"{n} ({os.path.getsize(os.path.join(EXPORT_DIR, n)) / 1048576:.1f} MB)"))
+            if st.button("Prepare Download"):
+                with open(os.path.join(EXPORT_DIR, name), "rb") as f:
+                    st.download_button(f"Download {name}", f, file_name=name)
+        else:
+            st.info("No exports yet")
+
+    elif menu == "Jobs":
+        st.header("Background Jobs")
+        with st.expander("Archive Old Records"):
+            st.write(f"Move tickets {TICKET_RETENTION_DAYS} days past their travel date, "
+                     f"notifications read over {NOTIFICATION_RETENTION_DAYS} days ago and "
+                     f"unread ones over {UNREAD_RETENTION_DAYS} days old to the archive "
+                     f"tables. Archived records stay readable with the Archived toggles.")
+            st.dataframe(get_table_sizes(), hide_index=True, use_container_width=True)
+            if st.button("Archive Now"):
+                submit_job("archive", {})
+
+        with st.expander("Withdraw Route"):
+            st.write("Cancel every booked ticket on a route in the background.")
+            with st.form("withdraw_route_form"):
+                routes = display_bus_routes()
+                route_options = {r['RouteName']: r['Route_ID'] for r in routes}
+                selected_route = st.selectbox("Route", options=list(route_options.keys()))
+                only_date = st.date_input("Only Travel Date (optional)", value=None)
+
+                if st.form_submit_button("Cancel Tickets"):
+                    if selected_route:
+                        submit_job("cancel_route_tickets", {
+                            "route_id": route_options[selected_route],
+                            "travel_date": only_date
+                        })
+                    else:
+                        st.error("No routes found in the system")
+
+        display_jobs_table()
+
+    elif menu == "Analytics":
+        st.header("Revenue and Occupancy")
+        today = date.today()
+        date_range = st.date_input("Travel Dates", value=(today - timedelta(days=30), today))
+        if len(date_range) == 2:
+            display_analytics(*date_range)
+
+        with st.expander("Rebuild Statistics"):
+            st.write("Recompute the daily statistics from the tickets table, "
+                     "e.g. after importing historical bookings.")
+            if len(date_range) == 2 and st.button("Rebuild for Selected Dates"):
+                submit_job("rebuild_route_stats",
+                           {"start": date_range[0], "end": date_range[1]})
+
+    elif menu == "Performance":
+        st.header("Database Performance")
+        display_performance()
         
 
 def operator_portal():
+    get_hold_sweeper()
     st.title("Bus Operator Portal")
     st.write(f"Welcome, {st.session_state['user_data']['Username']}")
     
-    menu = st.sidebar.selectbox(
-        "Menu",
-        ["View Routes", "View Notifications", "Submit Complaint", "Book Tickets"]
-    )
+    menu_options = ["View Routes", "Search Routes", "View Notifications", "Submit Complaint",
+                    "My Complaints", "Book Tickets"]
+    if has_mysql():
+        menu_options.append("Group Booking")
+    menu = st.sidebar.selectbox("Menu", menu_options)
     
     if st.sidebar.button("Logout"):
         for key in st.session_state.keys():
@@ -692,14 +1323,47 @@ def operator_portal():
     
     if menu == "View Routes":
         st.header("All Bus Routes")
-        routes = display_bus_routes()
+        travel_date = st.date_input("Show Availability On", key="operator_travel_date")
+        routes = display_bus_routes(travel_date)
         display_bus_routes_table(routes)
         
-    elif menu == "View Notifications":
-        st.header("Notifications")
-        notifications = get_notifications()
-        display_notifications_table(notifications)
-        
+    elif menu == "Search Routes":
+        st.header("Search Routes")
+        col1, col2 = st.columns(2)
+        with col1:
+            source = st.text_input("From")
+            travel_date = st.date_input("Travel Date", key="search_travel_date")
+        with col2:
+            destination = st.text_input("To")
+            num_seats = st.number_input("Seats", min_value=1, max_value=MAX_SEATS, value=1)
+        sort_by = st.radio("Sort By", ["fare", "duration"], horizontal=True,
+                           format_func=str.capitalize)
+
+        if source and destination:
+            results = find_routes(source, destination, travel_date, int(num_seats), sort_by)
+            if not results["sources"] or not results["destinations"]:
+                st.warning("No matching cities found")
+            else:
+                st.write(f"Showing {', '.join(results['sources'])} to "
+                         f"{', '.join(results['destinations'])}")
+                st.write("### Direct Routes")
+                if results["direct"]:
+                    display_bus_routes_table(results["direct"])
+                else:
+                    st.info("No direct routes with enough seats")
+
+                st.write("### Connecting Journeys")
+                if results["connections"]:
+                    st.dataframe([{
+                        "Via": j.via,
+                        "First Leg": j.legs[0]['RouteName'],
+                        "Second Leg": j.legs[1]['RouteName'],
+                        "Total Fare": f"₹{j.fare:.2f}",
+                        "Total Hours": round(j.duration, 2),
+                    } for j in results["connections"]], hide_index=True, use_container_width=True)
+                else:
+                    st.info("No connecting journeys found")
+
     elif menu == "Submit Complaint":
         st.header("Submit New Complaint")
         with st.form("complaint_form"):
@@ -713,12 +1377,42 @@ def operator_portal():
                 else:
                     st.error("Please fill in all fields")
                     
+    elif menu == "My Complaints":
+        st.header("My Complaints")
+        display_complaint_queue(st.session_state['user_data']['Operator_ID'])
+
     elif menu == "Book Tickets":
         st.header("Book Bus Tickets")
-        routes = display_bus_routes()
+        # Chosen outside the form so availability refreshes when the date changes
+        booking_date = st.date_input("Travel Date")
+        routes = display_bus_routes(booking_date)
         
-        if routes:
+        hold = st.session_state.get('hold')
+        if hold:
+            st.write(f"Holding seats {hold['Seat_Numbers']} on {hold['RouteName']} "
+                     f"for {hold['Travel_Date']} until {hold['Expires_At']:%H:%M:%S}")
             with st.form("booking_form"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    passenger_name = st.text_input("Passenger Name")
+                    passenger_email = st.text_input("Email")
+                with col2:
+                    passenger_phone = st.text_input("Phone")
+                    st.write(f"Total Fare: ₹{hold['Total_Fare']}")
+
+                if st.form_submit_button("Confirm Booking"):
+                    if all([passenger_name, passenger_email, passenger_phone]):
+                        if confirm_booking(hold, passenger_name, passenger_email, passenger_phone):
+                            del st.session_state['hold']
+                    else:
+                        st.error("Please fill in all passenger details")
+            if st.button("Release Seats"):
+                release_seats(hold)
+                del st.session_state['hold']
+                st.rerun()
+
+        elif routes:
+            with st.form("hold_form"):
                 # Route selection
                 route_options = {f"{r['RouteName']} ({r['Source']} to {r['Destination']})": r['Route_ID'] 
                                for r in routes if r['Available_Seats'] > 0}
@@ -733,39 +1427,29 @@ def operator_portal():
                     selected_route_id = route_options[selected_route]
                     route_details = next(r for r in routes if r['Route_ID'] == selected_route_id)
                     
-                    st.write(f"Available Seats: {route_details['Available_Seats']}")
-                    st.write(f"Fare per seat: ₹{route_details['Fare']}")
+                    st.write(f"Available Seats on {booking_date}: {route_details['Available_Seats']}")
+                    fare = quote_fare(route_details, booking_date, 1)
+                    group_fare = quote_fare(route_details, booking_date, DEFAULT_RULES.group_min_seats)
+                    st.write(f"Fare per seat: ₹{fare:.2f}")
+                    if group_fare < fare:
+                        st.caption(f"₹{group_fare:.2f} per seat when booking "
+                                   f"{DEFAULT_RULES.group_min_seats} or more seats")
+                    num_seats = st.number_input("Number of Seats", 
+                                              min_value=1, 
+                                              max_value=route_details['Available_Seats'])
+                    st.caption(f"Seats are held for {HOLD_TTL // 60} minutes while you enter "
+                               f"the passenger details.")
                     
-                    # Passenger details
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        passenger_name = st.text_input("Passenger Name")
-                        passenger_email = st.text_input("Email")
-                    with col2:
-                        passenger_phone = st.text_input("Phone")
-                        num_seats = st.number_input("Number of Seats", 
-                                                  min_value=1, 
-                                                  max_value=route_details['Available_Seats'])
-                    
-                    booking_date = st.date_input("Travel Date")
-                    total_fare = float(route_details['Fare']) * num_seats
-                    st.write(f"Total Fare: ₹{total_fare}")
-                    
-                    if st.form_submit_button("Book Ticket"):
-                        if all([passenger_name, passenger_email, passenger_phone]):
-                            book_ticket(
-                                selected_route_id,
-                                passenger_name,
-                                passenger_email,
-                                passenger_phone,
-                                booking_date,
-                                num_seats
-                            )
-                        else:
-                            st.error("Please fill in all passenger details")
+                    if st.form_submit_button("Hold Seats"):
+                        hold = place_hold(selected_route_id, booking_date, int(num_seats))
+                        if hold:
+                            hold.update(Travel_Date=booking_date,
+                                        RouteName=route_details['RouteName'])
+                            st.session_state['hold'] = hold
+                            st.rerun()
                 else:
                     st.error("No routes available for booking")
-                    st.form_submit_button("Book Ticket", disabled=True)
+                    st.form_submit_button("Hold Seats", disabled=True)
         
         # Show booked tickets
         st.header("Manage Bookings")
@@ -777,6 +1461,33 @@ def operator_portal():
             )
             selected_route_id = next(r['Route_ID'] for r in routes if r['RouteName'] == selected_route)
             display_route_tickets(selected_route_id)
+
+    elif menu == "Group Booking":
+        st.header("Group Booking")
+        st.write("One seat per passenger. The group is booked only if every passenger gets a seat.")
+        routes = display_bus_routes()
+        route_options = {r['RouteName']: r['Route_ID'] for r in routes}
+        passengers = st.data_editor(
+            [{"Route": None, "Travel Date": None, "Name": "", "Email": "", "Phone": ""}],
+            num_rows="dynamic", use_container_width=True, key="group_editor",
+            column_config={
+                "Route": st.column_config.SelectboxColumn(options=list(route_options), required=True),
+                "Travel Date": st.column_config.DateColumn(min_value=date.today(), required=True),
+            }
+        )
+        rows = [p for p in passengers if any(p.values())]
+        if st.button("Book Group", disabled=not rows):
+            if all(p["Route"] and p["Travel Date"] and p["Name"] and p["Email"] and p["Phone"]
+                   for p in rows):
+                book_group_tickets([
+                    GroupPassenger(route_options[p["Route"]],
+                                   date.fromisoformat(str(p["Travel Date"])[:10]),
+                                   p["Name"].strip(), p["Email"].strip(), p["Phone"].strip())
+                    for p in rows
+                ])
+            else:
+                st.error("Please fill in every passenger's details")
+
     elif menu == "View Notifications":
         st.header("My Notifications")
         # Get operator's user record
@@ -785,8 +1496,7 @@ def operator_portal():
         
         if user_data:
             # Show only notifications for this operator
-            notifications = get_notifications(user_data['User_ID'])
-            display_notifications_table(notifications)
+            display_notification_feed(user_data['User_ID'])
         else:
             st.error("Unable to retrieve notifications. Please contact administrator.")
     
@@ -803,23 +1513,27 @@ def login_page():
         
         if submit:
             if login_type == "Administrator":
-                success, user_data = check_admin_login(username, password)
-                if success:
+                result = check_admin_login(username, password)
+                if result.ok:
                     st.session_state['logged_in'] = True
                     st.session_state['user_type'] = 'admin'
-                    st.session_state['user_data'] = user_data
+                    st.session_state['user_data'] = result.user
                     st.success(f"Welcome, Administrator {username}!")
                     st.rerun()
+                elif result.retry_after:
+                    st.error(f"Too many failed attempts. Try again in {math.ceil(result.retry_after)} seconds.")
                 else:
                     st.error("Invalid administrator credentials")
             else:
-                success, user_data = check_operator_login(username, password)
-                if success:
+                result = check_operator_login(username, password)
+                if result.ok:
                     st.session_state['logged_in'] = True
                     st.session_state['user_type'] = 'operator'
-                    st.session_state['user_data'] = user_data
+                    st.session_state['user_data'] = result.user
                     st.success(f"Welcome, Bus Operator {username}!")
                     st.rerun()
+                elif result.retry_after:
+                    st.error(f"Too many failed attempts. Try again in {math.ceil(result.retry_after)} seconds.")
                 else:
                     st.error("Invalid operator credentials")
 
@@ -9,7 +9,7 @@ CREATE TABLE users (
     User_ID INT PRIMARY KEY AUTO_INCREMENT,
     Username VARCHAR(50) NOT NULL UNIQUE,
     email VARCHAR(100) NOT NULL UNIQUE,
-    password VARCHAR(100) NOT NULL,
+    password VARCHAR(255) NOT NULL,
     Role ENUM('user', 'operator', 'conductor') NOT NULL,
     Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -22,8 +22,11 @@ CREATE TABLE bus_routes (
     Destination VARCHAR(100) NOT NULL,
     Distance VARCHAR(50) NOT NULL,
     Duration VARCHAR(50) NOT NULL,
+    Distance_Km DECIMAL(8,2),
+    Duration_Hours DECIMAL(6,2),
     Fare DECIMAL(10,2) NOT NULL,
-    Available_Seats INT DEFAULT 30
+    Seat_Capacity INT NOT NULL DEFAULT 30,
+    CHECK (Seat_Capacity BETWEEN 1 AND 64)
 );
 
 -- Administrators table
@@ -38,7 +41,7 @@ CREATE TABLE Administrators (
 CREATE TABLE Operators (
     Operator_ID INT PRIMARY KEY AUTO_INCREMENT,
     Username VARCHAR(50) NOT NULL UNIQUE,
-    Password VARCHAR(100) NOT NULL,
+    Password VARCHAR(255) NOT NULL,
     First_Name VARCHAR(50) NOT NULL,
     Last_Name VARCHAR(50) NOT NULL,
     Email VARCHAR(100) NOT NULL UNIQUE,
@@ -55,6 +58,26 @@ CREATE TABLE notifications (
     FOREIGN KEY (User_ID) REFERENCES users(User_ID)
 );
 
+-- Delivery outbox: one row per notification and channel, written in the
+-- same transaction as the notification (by the trg_notification_outbox
+-- trigger) and delivered by outbox.py workers. A worker claims due rows with
+-- SKIP LOCKED and pushes Next_Attempt_At past its lease, so a crashed worker's
+-- rows are retried; failures back off until Max attempts, then go 'Dead'.
+CREATE TABLE notification_outbox (
+    Outbox_ID BIGINT PRIMARY KEY AUTO_INCREMENT,
+    Notification_ID INT NOT NULL,
+    Channel VARCHAR(20) NOT NULL,
+    Recipient VARCHAR(100) NOT NULL,
+    Status ENUM('Pending', 'Sent', 'Dead') NOT NULL DEFAULT 'Pending',
+    Attempts INT NOT NULL DEFAULT 0,
+    Next_Attempt_At TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    Last_Error VARCHAR(500),
+    Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    Sent_At TIMESTAMP NULL,
+    KEY idx_outbox_due (Status, Next_Attempt_At, Outbox_ID),
+    FOREIGN KEY (Notification_ID) REFERENCES notifications(Notification_ID) ON DELETE CASCADE
+);
+
 -- Complaints table
 CREATE TABLE complaints (
     Complaint_ID INT PRIMARY KEY AUTO_INCREMENT,
@@ -66,6 +89,20 @@ CREATE TABLE complaints (
     FOREIGN KEY (Operator_ID) REFERENCES Operators(Operator_ID)
 );
 
+-- Group bookings made by travel agents: every passenger gets a ticket
+-- carrying the Group_ID. The client's idempotency key is unique, so a
+-- retried group is found with one index lookup instead of booking again.
+CREATE TABLE booking_groups (
+    Group_ID INT PRIMARY KEY AUTO_INCREMENT,
+    Idempotency_Key VARCHAR(100) NOT NULL,
+    Request_Hash CHAR(64) NOT NULL,
+    Booked_By VARCHAR(100),
+    Passengers INT NOT NULL DEFAULT 0,
+    Total_Fare DECIMAL(12,2) NOT NULL DEFAULT 0,
+    Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_group_idempotency_key (Idempotency_Key)
+);
+
 -- Tickets table
 CREATE TABLE tickets (
     Ticket_ID INT PRIMARY KEY AUTO_INCREMENT,
@@ -76,11 +113,167 @@ CREATE TABLE tickets (
     Booking_Date DATE NOT NULL,
     Number_Of_Seats INT NOT NULL,
     Total_Fare DECIMAL(10,2) NOT NULL,
+    Seat_Numbers VARCHAR(200),
+    Seat_Mask BIGINT UNSIGNED NOT NULL DEFAULT 0,
     Status ENUM('Booked', 'Cancelled') DEFAULT 'Booked',
+    Group_ID INT,
+    Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (Route_ID) REFERENCES bus_routes(Route_ID),
+    FOREIGN KEY (Group_ID) REFERENCES booking_groups(Group_ID)
+);
+
+-- Daily per-route rollup of tickets by travel date, maintained by
+-- BookTicket/CancelTicket so reports never scan the tickets table
+CREATE TABLE route_daily_stats (
+    Route_ID INT NOT NULL,
+    Stat_Date DATE NOT NULL,
+    Capacity INT NOT NULL DEFAULT 0,
+    Bookings INT NOT NULL DEFAULT 0,
+    Seats_Booked INT NOT NULL DEFAULT 0,
+    Revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Cancellations INT NOT NULL DEFAULT 0,
+    Seats_Cancelled INT NOT NULL DEFAULT 0,
+    Refunds DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (Route_ID, Stat_Date),
+    KEY idx_stats_date (Stat_Date),
+    FOREIGN KEY (Route_ID) REFERENCES bus_routes(Route_ID)
+);
+
+-- Jobs table: background jobs started from the admin portal
+CREATE TABLE jobs (
+    Job_ID INT PRIMARY KEY AUTO_INCREMENT,
+    Job_Type VARCHAR(50) NOT NULL,
+    Params TEXT,
+    Status ENUM('Queued', 'Running', 'Done', 'Failed') NOT NULL DEFAULT 'Queued',
+    Progress_Done INT NOT NULL DEFAULT 0,
+    Progress_Total INT,
+    Result TEXT,
+    Error TEXT,
+    Created_By VARCHAR(50),
     Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    Started_At TIMESTAMP NULL,
+    Finished_At TIMESTAMP NULL,
+    -- Refreshed while a runner is working on the job; see jobs.py
+    Heartbeat_At TIMESTAMP NULL,
+    KEY idx_job_status (Status, Created_At)
+);
+
+-- Trips table: seat inventory for one route on one travel date.
+-- Seat_Map is a bitmap with bit i set when seat i+1 is taken, either by a
+-- ticket or by an unexpired hold; Held_Seats counts the held ones.
+CREATE TABLE trips (
+    Trip_ID INT PRIMARY KEY AUTO_INCREMENT,
+    Route_ID INT NOT NULL,
+    Travel_Date DATE NOT NULL,
+    Capacity INT NOT NULL,
+    Available_Seats INT NOT NULL,
+    Seat_Map BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    Held_Seats INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_trip_route_date (Route_ID, Travel_Date),
+    KEY idx_trip_date (Travel_Date, Route_ID, Available_Seats),
+    FOREIGN KEY (Route_ID) REFERENCES bus_routes(Route_ID)
+);
+
+-- Seat holds: seats set aside on a trip until Expires_At while the passenger
+-- completes the booking. A hold ends Confirmed (with its ticket), Released,
+-- or Expired by the sweeper, which finds due holds through idx_hold_expiry.
+CREATE TABLE seat_holds (
+    Hold_ID INT PRIMARY KEY AUTO_INCREMENT,
+    Trip_ID INT NOT NULL,
+    Route_ID INT NOT NULL,
+    Travel_Date DATE NOT NULL,
+    Number_Of_Seats INT NOT NULL,
+    Seat_Numbers VARCHAR(200) NOT NULL,
+    Seat_Mask BIGINT UNSIGNED NOT NULL,
+    Held_By VARCHAR(100),
+    Status ENUM('Held', 'Confirmed', 'Released', 'Expired') NOT NULL DEFAULT 'Held',
+    Ticket_ID INT,
+    Total_Fare DECIMAL(10,2) NOT NULL DEFAULT 0,
+    Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    Expires_At TIMESTAMP NOT NULL,
+    KEY idx_hold_expiry (Status, Expires_At),
+    FOREIGN KEY (Trip_ID) REFERENCES trips(Trip_ID)
+);
+
+-- Fare matrix written by the pricing engine (pricing.py): the per-seat fare
+-- of a route on a travel date once the trip is at least Min_Load full, and
+-- the discounted per-seat fare for bookings of Group_Min_Seats or more.
+-- Dates without rows are charged bus_routes.Fare.
+CREATE TABLE route_fares (
+    Route_ID INT NOT NULL,
+    Travel_Date DATE NOT NULL,
+    Min_Load DECIMAL(4,3) NOT NULL,
+    Fare DECIMAL(10,2) NOT NULL,
+    Group_Fare DECIMAL(10,2) NOT NULL,
+    Group_Min_Seats INT NOT NULL,
+    PRIMARY KEY (Route_ID, Travel_Date, Min_Load),
+    KEY idx_fare_date (Travel_Date),
     FOREIGN KEY (Route_ID) REFERENCES bus_routes(Route_ID)
 );
 
+-- Idempotency keys for bookings made through the HTTP API: the key is
+-- inserted in the same transaction as the ticket, so a retried request
+-- replays the stored response instead of booking twice
+CREATE TABLE idempotency_keys (
+    Idempotency_Key VARCHAR(100) PRIMARY KEY,
+    Request_Hash CHAR(64) NOT NULL,
+    Ticket_ID INT,
+    Response TEXT,
+    Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_idempotency_created (Created_At)
+);
+
+-- Cold storage for tickets and notifications past their retention period,
+-- moved out of the hot tables in bounded batches by archiver.py. Same
+-- columns plus Archived_At, compressed pages, and only the indexes the
+-- archive reads use. Rows keep their ids: AUTO_INCREMENT is persisted
+-- (MySQL 8.0+), so hot ids are never reused for an archived row.
+CREATE TABLE tickets_archive (
+    Ticket_ID INT PRIMARY KEY,
+    Route_ID INT NOT NULL,
+    Passenger_Name VARCHAR(100) NOT NULL,
+    Passenger_Email VARCHAR(100) NOT NULL,
+    Passenger_Phone VARCHAR(20) NOT NULL,
+    Booking_Date DATE NOT NULL,
+    Number_Of_Seats INT NOT NULL,
+    Total_Fare DECIMAL(10,2) NOT NULL,
+    Seat_Numbers VARCHAR(200),
+    Seat_Mask BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    Status ENUM('Booked', 'Cancelled'),
+    Group_ID INT,
+    Created_At TIMESTAMP NULL,
+    Archived_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_archive_ticket_route_created (Route_ID, Created_At, Ticket_ID),
+    KEY idx_archive_ticket_date (Booking_Date),
+    KEY idx_archive_ticket_created (Created_At)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE notifications_archive (
+    Notification_ID INT PRIMARY KEY,
+    User_ID INT NOT NULL,
+    Message TEXT NOT NULL,
+    is_read BOOLEAN,
+    Created_At TIMESTAMP NULL,
+    Archived_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_archive_notification_date (Created_At, Notification_ID),
+    KEY idx_archive_notification_user_date (User_ID, Created_At, Notification_ID)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+-- The Sent and Dead delivery history of archived notifications, moved with
+-- them (the notification_outbox rows would otherwise go by ON DELETE CASCADE)
+CREATE TABLE notification_outbox_archive (
+    Outbox_ID BIGINT PRIMARY KEY,
+    Notification_ID INT NOT NULL,
+    Channel VARCHAR(20) NOT NULL,
+    Recipient VARCHAR(100) NOT NULL,
+    Status ENUM('Pending', 'Sent', 'Dead') NOT NULL,
+    Attempts INT NOT NULL,
+    Last_Error VARCHAR(500),
+    Created_At TIMESTAMP NULL,
+    Sent_At TIMESTAMP NULL,
+    Archived_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_archive_outbox_notification (Notification_ID)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
 
 -- Stored Procedures
 
@@ -97,13 +290,59 @@ BEGIN
 END //
 DELIMITER ;
 
--- Procedure to get all complaints
+-- Procedure to get one page of the complaint queue, oldest first.
+-- Keyset pagination: pass the Created_At and Complaint_ID of the last row of
+-- the previous page (NULL for the first page). Status, operator and date
+-- filters are optional (NULL = any); a status or operator filter reads
+-- idx_complaint_status or idx_complaint_operator. Returns the page, then the
+-- total matching count.
 DELIMITER //
-CREATE PROCEDURE GetComplaintList()
+CREATE PROCEDURE GetComplaintList(
+    IN p_Status VARCHAR(20),
+    IN p_Operator_ID INT,
+    IN p_From_Date DATE,
+    IN p_To_Date DATE,
+    IN p_After_Created_At TIMESTAMP,
+    IN p_After_Complaint_ID INT,
+    IN p_Limit INT
+)
 BEGIN
-    SELECT c.*, o.Username as Operator_Name 
+    SELECT c.Complaint_ID, c.Operator_ID, c.Subject, c.Message, c.Status, c.Created_At,
+           o.Username as Operator_Name
     FROM complaints c
-    JOIN Operators o ON c.Operator_ID = o.Operator_ID;
+    JOIN Operators o ON c.Operator_ID = o.Operator_ID
+    WHERE (p_Status IS NULL OR c.Status = p_Status)
+    AND (p_Operator_ID IS NULL OR c.Operator_ID = p_Operator_ID)
+    AND (p_From_Date IS NULL OR c.Created_At >= p_From_Date)
+    AND (p_To_Date IS NULL OR c.Created_At < p_To_Date + INTERVAL 1 DAY)
+    AND (p_After_Created_At IS NULL
+         OR c.Created_At > p_After_Created_At
+         OR (c.Created_At = p_After_Created_At AND c.Complaint_ID > p_After_Complaint_ID))
+    ORDER BY c.Created_At, c.Complaint_ID
+    LIMIT p_Limit;
+
+    SELECT COUNT(*) as Total
+    FROM complaints
+    WHERE (p_Status IS NULL OR Status = p_Status)
+    AND (p_Operator_ID IS NULL OR Operator_ID = p_Operator_ID)
+    AND (p_From_Date IS NULL OR Created_At >= p_From_Date)
+    AND (p_To_Date IS NULL OR Created_At < p_To_Date + INTERVAL 1 DAY);
+END //
+DELIMITER ;
+
+-- Procedure to count complaints per status, with how many have waited longer
+-- than the SLA and the oldest one. Answered from idx_complaint_status alone.
+DELIMITER //
+CREATE PROCEDURE GetComplaintQueueStats(
+    IN p_SLA_Hours INT
+)
+BEGIN
+    SELECT Status,
+           COUNT(*) as Total,
+           SUM(Created_At < NOW() - INTERVAL p_SLA_Hours HOUR) as Over_SLA,
+           MIN(Created_At) as Oldest_Created_At
+    FROM complaints
+    GROUP BY Status;
 END //
 DELIMITER ;
 
@@ -120,7 +359,148 @@ BEGIN
 END //
 DELIMITER ;
 
--- Procedure to book a ticket
+-- Procedure to take seats on a trip
+-- Seats come from the trip for (route, travel date), which is created on its
+-- first use if it was not generated in advance. The trip row is locked with
+-- SELECT ... FOR UPDATE until the caller commits, so concurrent bookings for
+-- the same trip queue up while other dates and routes proceed in parallel.
+-- The lowest numbered free seats are marked taken; p_Seat_Mask is 0 when there
+-- are not enough of them. p_Taken is how many seats were already taken, which
+-- sets the fare tier.
+DELIMITER //
+CREATE PROCEDURE TakeSeats(
+    IN p_Route_ID INT,
+    IN p_Travel_Date DATE,
+    IN p_Number_Of_Seats INT,
+    OUT p_Trip_ID INT,
+    OUT p_Capacity INT,
+    OUT p_Taken INT,
+    OUT p_Seat_Mask BIGINT UNSIGNED,
+    OUT p_Seat_Numbers VARCHAR(200)
+)
+BEGIN
+    DECLARE v_seat_map BIGINT UNSIGNED;
+    DECLARE v_found INT DEFAULT 0;
+    DECLARE v_i INT DEFAULT 0;
+    
+    SET p_Seat_Mask = 0;
+    SET p_Seat_Numbers = NULL;
+    
+    INSERT INTO trips (Route_ID, Travel_Date, Capacity, Available_Seats, Seat_Map)
+    SELECT Route_ID, p_Travel_Date, Seat_Capacity, Seat_Capacity, 0
+    FROM bus_routes WHERE Route_ID = p_Route_ID
+    ON DUPLICATE KEY UPDATE Trip_ID = Trip_ID;
+    
+    SELECT Trip_ID, Capacity, Seat_Map INTO p_Trip_ID, p_Capacity, v_seat_map
+    FROM trips
+    WHERE Route_ID = p_Route_ID AND Travel_Date = p_Travel_Date
+    FOR UPDATE;
+    
+    SET p_Taken = BIT_COUNT(v_seat_map);
+    
+    WHILE v_i < p_Capacity AND v_found < p_Number_Of_Seats DO
+        IF (v_seat_map >> v_i) & 1 = 0 THEN
+            SET p_Seat_Mask = p_Seat_Mask | (1 << v_i);
+            SET p_Seat_Numbers = CONCAT_WS(',', p_Seat_Numbers, v_i + 1);
+            SET v_found = v_found + 1;
+        END IF;
+        SET v_i = v_i + 1;
+    END WHILE;
+    
+    IF p_Number_Of_Seats > 0 AND v_found = p_Number_Of_Seats THEN
+        UPDATE trips 
+        SET Seat_Map = Seat_Map | p_Seat_Mask,
+            Available_Seats = Available_Seats - p_Number_Of_Seats
+        WHERE Trip_ID = p_Trip_ID;
+    ELSE
+        SET p_Seat_Mask = 0;
+        SET p_Seat_Numbers = NULL;
+    END IF;
+END //
+DELIMITER ;
+
+-- Procedure to price seats on a trip from the fare matrix: the tier for the
+-- seats already taken (one primary key lookup), the group fare for large
+-- bookings, or the route's base fare when the date has not been priced.
+-- pricing.quote_fare computes the same in Python for the booking form.
+DELIMITER //
+CREATE PROCEDURE QuoteFare(
+    IN p_Route_ID INT,
+    IN p_Travel_Date DATE,
+    IN p_Number_Of_Seats INT,
+    IN p_Capacity INT,
+    IN p_Taken INT,
+    OUT p_Total_Fare DECIMAL(10,2)
+)
+BEGIN
+    DECLARE v_fare DECIMAL(10,2) DEFAULT NULL;
+    DECLARE v_group_fare DECIMAL(10,2);
+    DECLARE v_group_min INT;
+    -- An unpriced date leaves v_fare NULL
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_fare = NULL;
+    
+    SELECT Fare, Group_Fare, Group_Min_Seats INTO v_fare, v_group_fare, v_group_min
+    FROM route_fares
+    WHERE Route_ID = p_Route_ID AND Travel_Date = p_Travel_Date
+    AND Min_Load * p_Capacity <= p_Taken
+    ORDER BY Min_Load DESC
+    LIMIT 1;
+    
+    IF v_fare IS NULL THEN
+        SELECT Fare INTO v_fare FROM bus_routes WHERE Route_ID = p_Route_ID;
+    ELSEIF p_Number_Of_Seats >= v_group_min THEN
+        SET v_fare = v_group_fare;
+    END IF;
+    
+    SET p_Total_Fare = v_fare * p_Number_Of_Seats;
+END //
+DELIMITER ;
+
+-- Procedure to issue a ticket for seats already taken on a trip at a quoted
+-- fare, and count it in the daily rollup. Returns the new Ticket_ID.
+DELIMITER //
+CREATE PROCEDURE IssueTicket(
+    IN p_Route_ID INT,
+    IN p_Passenger_Name VARCHAR(100),
+    IN p_Passenger_Email VARCHAR(100),
+    IN p_Passenger_Phone VARCHAR(20),
+    IN p_Booking_Date DATE,
+    IN p_Number_Of_Seats INT,
+    IN p_Capacity INT,
+    IN p_Seat_Mask BIGINT UNSIGNED,
+    IN p_Seat_Numbers VARCHAR(200),
+    IN p_Total_Fare DECIMAL(10,2),
+    OUT p_Ticket_ID INT
+)
+BEGIN
+    DECLARE v_total_fare DECIMAL(10,2) DEFAULT p_Total_Fare;
+    
+    -- Create ticket
+    INSERT INTO tickets (
+        Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
+        Booking_Date, Number_Of_Seats, Total_Fare, Seat_Numbers, Seat_Mask
+    ) VALUES (
+        p_Route_ID, p_Passenger_Name, p_Passenger_Email, p_Passenger_Phone,
+        p_Booking_Date, p_Number_Of_Seats, v_total_fare, p_Seat_Numbers, p_Seat_Mask
+    );
+    
+    SET p_Ticket_ID = LAST_INSERT_ID();
+    
+    -- Update the daily rollup
+    INSERT INTO route_daily_stats (
+        Route_ID, Stat_Date, Capacity, Bookings, Seats_Booked, Revenue
+    ) VALUES (
+        p_Route_ID, p_Booking_Date, p_Capacity, 1, p_Number_Of_Seats, v_total_fare
+    )
+    ON DUPLICATE KEY UPDATE
+        Capacity = p_Capacity,
+        Bookings = Bookings + 1,
+        Seats_Booked = Seats_Booked + p_Number_Of_Seats,
+        Revenue = Revenue + v_total_fare;
+END //
+DELIMITER ;
+
+-- Procedure to book a ticket straight away, without a hold
 DELIMITER //
 CREATE PROCEDURE BookTicket(
     IN p_Route_ID INT,
@@ -131,81 +511,351 @@ CREATE PROCEDURE BookTicket(
     IN p_Number_Of_Seats INT
 )
 BEGIN
-    DECLARE v_available_seats INT;
-    DECLARE v_fare DECIMAL(10,2);
+    DECLARE v_trip_id INT;
+    DECLARE v_capacity INT;
+    DECLARE v_taken INT;
+    DECLARE v_seat_mask BIGINT UNSIGNED;
+    DECLARE v_seat_numbers VARCHAR(200);
+    DECLARE v_total_fare DECIMAL(10,2);
+    DECLARE v_ticket_id INT;
+    
+    CALL TakeSeats(p_Route_ID, p_Booking_Date, p_Number_Of_Seats,
+                   v_trip_id, v_capacity, v_taken, v_seat_mask, v_seat_numbers);
+    
+    IF v_seat_mask <> 0 THEN
+        CALL QuoteFare(p_Route_ID, p_Booking_Date, p_Number_Of_Seats,
+                       v_capacity, v_taken, v_total_fare);
+        CALL IssueTicket(p_Route_ID, p_Passenger_Name, p_Passenger_Email, p_Passenger_Phone,
+                         p_Booking_Date, p_Number_Of_Seats, v_capacity,
+                         v_seat_mask, v_seat_numbers, v_total_fare, v_ticket_id);
+        
+        SELECT 'SUCCESS' as result, v_ticket_id as Ticket_ID,
+               v_seat_numbers as Seat_Numbers, v_total_fare as Total_Fare;
+    ELSE
+        SELECT 'INSUFFICIENT_SEATS' as result;
+    END IF;
+END //
+DELIMITER ;
+
+-- Procedure to hold seats for p_TTL_Seconds. Expiry uses the database clock,
+-- so every app process agrees on when a hold lapses. The fare is quoted when
+-- the seats are held and charged on confirmation.
+DELIMITER //
+CREATE PROCEDURE HoldSeats(
+    IN p_Route_ID INT,
+    IN p_Travel_Date DATE,
+    IN p_Number_Of_Seats INT,
+    IN p_Held_By VARCHAR(100),
+    IN p_TTL_Seconds INT
+)
+BEGIN
+    DECLARE v_trip_id INT;
+    DECLARE v_capacity INT;
+    DECLARE v_taken INT;
+    DECLARE v_seat_mask BIGINT UNSIGNED;
+    DECLARE v_seat_numbers VARCHAR(200);
     DECLARE v_total_fare DECIMAL(10,2);
     
-    -- Get available seats and fare
-    SELECT Available_Seats, Fare INTO v_available_seats, v_fare
-    FROM bus_routes WHERE Route_ID = p_Route_ID;
+    CALL TakeSeats(p_Route_ID, p_Travel_Date, p_Number_Of_Seats,
+                   v_trip_id, v_capacity, v_taken, v_seat_mask, v_seat_numbers);
     
-    IF v_available_seats >= p_Number_Of_Seats THEN
-        -- Calculate total fare
-        SET v_total_fare = v_fare * p_Number_Of_Seats;
+    IF v_seat_mask <> 0 THEN
+        CALL QuoteFare(p_Route_ID, p_Travel_Date, p_Number_Of_Seats,
+                       v_capacity, v_taken, v_total_fare);
         
-        -- Create ticket
-        INSERT INTO tickets (
-            Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
-            Booking_Date, Number_Of_Seats, Total_Fare
+        UPDATE trips SET Held_Seats = Held_Seats + p_Number_Of_Seats
+        WHERE Trip_ID = v_trip_id;
+        
+        INSERT INTO seat_holds (
+            Trip_ID, Route_ID, Travel_Date, Number_Of_Seats, Seat_Numbers,
+            Seat_Mask, Held_By, Total_Fare, Expires_At
         ) VALUES (
-            p_Route_ID, p_Passenger_Name, p_Passenger_Email, p_Passenger_Phone,
-            p_Booking_Date, p_Number_Of_Seats, v_total_fare
+            v_trip_id, p_Route_ID, p_Travel_Date, p_Number_Of_Seats, v_seat_numbers,
+            v_seat_mask, p_Held_By, v_total_fare,
+            CURRENT_TIMESTAMP + INTERVAL p_TTL_Seconds SECOND
         );
         
-        -- Update available seats
-        UPDATE bus_routes 
-        SET Available_Seats = Available_Seats - p_Number_Of_Seats
-        WHERE Route_ID = p_Route_ID;
-        
-        SELECT 'SUCCESS' as result;
+        SELECT 'SUCCESS' as result, Hold_ID, Seat_Numbers, Total_Fare, Expires_At
+        FROM seat_holds WHERE Hold_ID = LAST_INSERT_ID();
     ELSE
         SELECT 'INSUFFICIENT_SEATS' as result;
     END IF;
 END //
 DELIMITER ;
 
+-- Procedure to turn an unexpired hold into a ticket for its seats.
+-- The status flip is a conditional UPDATE, so a hold is confirmed at most
+-- once and never after the sweeper has expired it; confirming an already
+-- confirmed hold returns its ticket again.
+DELIMITER //
+CREATE PROCEDURE ConfirmHold(
+    IN p_Hold_ID INT,
+    IN p_Passenger_Name VARCHAR(100),
+    IN p_Passenger_Email VARCHAR(100),
+    IN p_Passenger_Phone VARCHAR(20)
+)
+BEGIN
+    DECLARE v_trip_id INT;
+    DECLARE v_route_id INT;
+    DECLARE v_travel_date DATE;
+    DECLARE v_seats INT;
+    DECLARE v_seat_mask BIGINT UNSIGNED;
+    DECLARE v_seat_numbers VARCHAR(200);
+    DECLARE v_total_fare DECIMAL(10,2);
+    DECLARE v_capacity INT;
+    DECLARE v_ticket_id INT;
+    
+    UPDATE seat_holds SET Status = 'Confirmed'
+    WHERE Hold_ID = p_Hold_ID AND Status = 'Held' AND Expires_At > CURRENT_TIMESTAMP;
+    
+    IF ROW_COUNT() = 1 THEN
+        SELECT Trip_ID, Route_ID, Travel_Date, Number_Of_Seats, Seat_Mask, Seat_Numbers,
+               Total_Fare
+        INTO v_trip_id, v_route_id, v_travel_date, v_seats, v_seat_mask, v_seat_numbers,
+             v_total_fare
+        FROM seat_holds WHERE Hold_ID = p_Hold_ID;
+        
+        SELECT Capacity INTO v_capacity FROM trips WHERE Trip_ID = v_trip_id FOR UPDATE;
+        UPDATE trips SET Held_Seats = Held_Seats - v_seats WHERE Trip_ID = v_trip_id;
+        
+        CALL IssueTicket(v_route_id, p_Passenger_Name, p_Passenger_Email, p_Passenger_Phone,
+                         v_travel_date, v_seats, v_capacity,
+                         v_seat_mask, v_seat_numbers, v_total_fare, v_ticket_id);
+        
+        UPDATE seat_holds SET Ticket_ID = v_ticket_id WHERE Hold_ID = p_Hold_ID;
+        
+        SELECT 'SUCCESS' as result, v_ticket_id as Ticket_ID, v_seat_numbers as Seat_Numbers,
+               v_route_id as Route_ID, v_travel_date as Booking_Date,
+               v_total_fare as Total_Fare;
+    ELSE
+        SELECT CASE WHEN Status = 'Confirmed' THEN 'SUCCESS' ELSE 'HOLD_EXPIRED' END as result,
+               Ticket_ID, Seat_Numbers, Route_ID, Travel_Date as Booking_Date, Total_Fare
+        FROM seat_holds WHERE Hold_ID = p_Hold_ID;
+    END IF;
+END //
+DELIMITER ;
+
+-- Procedure to end a hold and give its seats back to the trip.
+-- p_Status is 'Released' when the passenger gives up, or 'Expired' from the
+-- sweeper, which only ends holds that are past Expires_At.
+DELIMITER //
+CREATE PROCEDURE ReleaseHold(
+    IN p_Hold_ID INT,
+    IN p_Status VARCHAR(10)
+)
+BEGIN
+    DECLARE v_trip_id INT;
+    DECLARE v_route_id INT;
+    DECLARE v_travel_date DATE;
+    DECLARE v_seats INT;
+    DECLARE v_seat_mask BIGINT UNSIGNED;
+    
+    UPDATE seat_holds SET Status = p_Status
+    WHERE Hold_ID = p_Hold_ID AND Status = 'Held'
+    AND (p_Status = 'Released' OR Expires_At <= CURRENT_TIMESTAMP);
+    
+    IF ROW_COUNT() = 1 THEN
+        SELECT Trip_ID, Route_ID, Travel_Date, Number_Of_Seats, Seat_Mask
+        INTO v_trip_id, v_route_id, v_travel_date, v_seats, v_seat_mask
+        FROM seat_holds WHERE Hold_ID = p_Hold_ID;
+        
+        UPDATE trips
+        SET Seat_Map = Seat_Map & ~v_seat_mask,
+            Available_Seats = Available_Seats + v_seats,
+            Held_Seats = Held_Seats - v_seats
+        WHERE Trip_ID = v_trip_id;
+        
+        SELECT 'SUCCESS' as result, v_route_id as Route_ID, v_travel_date as Travel_Date;
+    ELSE
+        SELECT 'NOT_HELD' as result;
+    END IF;
+END //
+DELIMITER ;
+
 -- Procedure to cancel ticket
+-- The status flip is a conditional UPDATE, so a ticket cancelled twice at the
+-- same time only releases its seats once.
 DELIMITER //
 CREATE PROCEDURE CancelTicket(
     IN p_Ticket_ID INT
 )
 BEGIN
     DECLARE v_route_id INT;
+    DECLARE v_booking_date DATE;
+    DECLARE v_seat_mask BIGINT UNSIGNED;
     DECLARE v_seats INT;
-    DECLARE v_current_status VARCHAR(20);
+    DECLARE v_total_fare DECIMAL(10,2);
     
-    -- Get ticket details
-    SELECT Route_ID, Number_Of_Seats, Status 
-    INTO v_route_id, v_seats, v_current_status
-    FROM tickets WHERE Ticket_ID = p_Ticket_ID;
+    -- Update ticket status
+    UPDATE tickets 
+    SET Status = 'Cancelled' 
+    WHERE Ticket_ID = p_Ticket_ID
+    AND Status = 'Booked';
     
-    IF v_current_status = 'Booked' THEN
-        -- Update ticket status
-        UPDATE tickets 
-        SET Status = 'Cancelled' 
-        WHERE Ticket_ID = p_Ticket_ID;
+    IF ROW_COUNT() = 1 THEN
+        -- Get ticket details
+        SELECT Route_ID, Booking_Date, Seat_Mask, Number_Of_Seats, Total_Fare
+        INTO v_route_id, v_booking_date, v_seat_mask, v_seats, v_total_fare
+        FROM tickets WHERE Ticket_ID = p_Ticket_ID;
         
-        -- Return seats to available pool
-        UPDATE bus_routes 
-        SET Available_Seats = Available_Seats + v_seats
-        WHERE Route_ID = v_route_id;
+        -- Return seats to the trip
+        UPDATE trips 
+        SET Seat_Map = Seat_Map & ~v_seat_mask,
+            Available_Seats = Available_Seats + BIT_COUNT(v_seat_mask)
+        WHERE Route_ID = v_route_id AND Travel_Date = v_booking_date;
         
-        SELECT 'SUCCESS' as result;
+        -- Update the daily rollup
+        INSERT INTO route_daily_stats (
+            Route_ID, Stat_Date, Cancellations, Seats_Cancelled, Refunds
+        ) VALUES (
+            v_route_id, v_booking_date, 1, v_seats, v_total_fare
+        )
+        ON DUPLICATE KEY UPDATE
+            Cancellations = Cancellations + 1,
+            Seats_Cancelled = Seats_Cancelled + v_seats,
+            Refunds = Refunds + v_total_fare;
+        
+        SELECT 'SUCCESS' as result, v_route_id as Route_ID,
+               v_booking_date as Booking_Date;
     ELSE
         SELECT 'ALREADY_CANCELLED' as result;
     END IF;
 END //
 DELIMITER ;
 
--- Procedure to get tickets for a route
+-- Procedure to recompute the daily rollup from tickets for a range of travel
+-- dates, e.g. to backfill history or repair drift
+DELIMITER //
+CREATE PROCEDURE RebuildRouteDailyStats(
+    IN p_From_Date DATE,
+    IN p_To_Date DATE
+)
+BEGIN
+    DELETE FROM route_daily_stats
+    WHERE Stat_Date BETWEEN p_From_Date AND p_To_Date;
+    
+    INSERT INTO route_daily_stats (
+        Route_ID, Stat_Date, Capacity, Bookings, Seats_Booked, Revenue,
+        Cancellations, Seats_Cancelled, Refunds
+    )
+    SELECT t.Route_ID, t.Booking_Date,
+           COALESCE(MAX(tr.Capacity), MAX(r.Seat_Capacity)),
+           COUNT(*),
+           SUM(t.Number_Of_Seats),
+           SUM(t.Total_Fare),
+           SUM(t.Status = 'Cancelled'),
+           SUM(CASE WHEN t.Status = 'Cancelled' THEN t.Number_Of_Seats ELSE 0 END),
+           SUM(CASE WHEN t.Status = 'Cancelled' THEN t.Total_Fare ELSE 0 END)
+    FROM (
+        -- Archived tickets still count towards their travel date
+        SELECT Route_ID, Booking_Date, Number_Of_Seats, Total_Fare, Status
+        FROM tickets
+        WHERE Booking_Date BETWEEN p_From_Date AND p_To_Date
+        UNION ALL
+        SELECT Route_ID, Booking_Date, Number_Of_Seats, Total_Fare, Status
+        FROM tickets_archive
+        WHERE Booking_Date BETWEEN p_From_Date AND p_To_Date
+    ) t
+    JOIN bus_routes r ON r.Route_ID = t.Route_ID
+    LEFT JOIN trips tr ON tr.Route_ID = t.Route_ID AND tr.Travel_Date = t.Booking_Date
+    GROUP BY t.Route_ID, t.Booking_Date;
+    
+    SELECT ROW_COUNT() as Rows_Written;
+END //
+DELIMITER ;
+
+-- Procedure to create trips for every route over a range of dates
+DELIMITER //
+CREATE PROCEDURE GenerateTrips(
+    IN p_Start_Date DATE,
+    IN p_Days INT
+)
+BEGIN
+    DECLARE v_i INT DEFAULT 0;
+    DECLARE v_created INT DEFAULT 0;
+    
+    WHILE v_i < p_Days DO
+        INSERT INTO trips (Route_ID, Travel_Date, Capacity, Available_Seats, Seat_Map)
+        SELECT Route_ID, p_Start_Date + INTERVAL v_i DAY, Seat_Capacity, Seat_Capacity, 0
+        FROM bus_routes
+        ON DUPLICATE KEY UPDATE Trip_ID = Trip_ID;
+        
+        SET v_created = v_created + ROW_COUNT();
+        SET v_i = v_i + 1;
+    END WHILE;
+    
+    SELECT v_created as Trips_Created;
+END //
+DELIMITER ;
+
+-- Procedure to get one page of tickets for a route, newest first.
+-- Keyset pagination: pass the Created_At and Ticket_ID of the last row of the
+-- previous page (NULL for the first page). Status and travel date filters are
+-- optional (NULL = any). Returns the page, then the total matching count.
 DELIMITER //
 CREATE PROCEDURE GetRouteTickets(
-    IN p_Route_ID INT
+    IN p_Route_ID INT,
+    IN p_Status VARCHAR(20),
+    IN p_From_Date DATE,
+    IN p_To_Date DATE,
+    IN p_After_Created_At TIMESTAMP,
+    IN p_After_Ticket_ID INT,
+    IN p_Limit INT
+)
+BEGIN
+    SELECT Ticket_ID, Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
+           Booking_Date, Number_Of_Seats, Total_Fare, Seat_Numbers, Status, Created_At
+    FROM tickets 
+    WHERE Route_ID = p_Route_ID
+    AND (p_Status IS NULL OR Status = p_Status)
+    AND (p_From_Date IS NULL OR Booking_Date >= p_From_Date)
+    AND (p_To_Date IS NULL OR Booking_Date <= p_To_Date)
+    AND (p_After_Created_At IS NULL
+         OR Created_At < p_After_Created_At
+         OR (Created_At = p_After_Created_At AND Ticket_ID < p_After_Ticket_ID))
+    ORDER BY Created_At DESC, Ticket_ID DESC
+    LIMIT p_Limit;
+    
+    SELECT COUNT(*) as Total
+    FROM tickets
+    WHERE Route_ID = p_Route_ID
+    AND (p_Status IS NULL OR Status = p_Status)
+    AND (p_From_Date IS NULL OR Booking_Date >= p_From_Date)
+    AND (p_To_Date IS NULL OR Booking_Date <= p_To_Date);
+END //
+DELIMITER ;
+
+-- GetRouteTickets on the archived tickets
+DELIMITER //
+CREATE PROCEDURE GetArchivedRouteTickets(
+    IN p_Route_ID INT,
+    IN p_Status VARCHAR(20),
+    IN p_From_Date DATE,
+    IN p_To_Date DATE,
+    IN p_After_Created_At TIMESTAMP,
+    IN p_After_Ticket_ID INT,
+    IN p_Limit INT
 )
 BEGIN
-    SELECT * FROM tickets 
+    SELECT Ticket_ID, Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
+           Booking_Date, Number_Of_Seats, Total_Fare, Seat_Numbers, Status, Created_At
+    FROM tickets_archive
+    WHERE Route_ID = p_Route_ID
+    AND (p_Status IS NULL OR Status = p_Status)
+    AND (p_From_Date IS NULL OR Booking_Date >= p_From_Date)
+    AND (p_To_Date IS NULL OR Booking_Date <= p_To_Date)
+    AND (p_After_Created_At IS NULL
+         OR Created_At < p_After_Created_At
+         OR (Created_At = p_After_Created_At AND Ticket_ID < p_After_Ticket_ID))
+    ORDER BY Created_At DESC, Ticket_ID DESC
+    LIMIT p_Limit;
+
+    SELECT COUNT(*) as Total
+    FROM tickets_archive
     WHERE Route_ID = p_Route_ID
-    ORDER BY Created_At DESC;
+    AND (p_Status IS NULL OR Status = p_Status)
+    AND (p_From_Date IS NULL OR Booking_Date >= p_From_Date)
+    AND (p_To_Date IS NULL OR Booking_Date <= p_To_Date);
 END //
 DELIMITER ;
 
@@ -223,6 +873,23 @@ BEGIN
 END //
 DELIMITER ;
 
+-- Queue every new notification for email delivery in the inserting
+-- transaction, whether it comes from CreateNotification or a broadcast.
+-- Bulk loads of made-up data (benchmark/generate.py) set
+-- @skip_notification_outbox in their session so nothing is queued for them.
+DELIMITER //
+CREATE TRIGGER trg_notification_outbox
+AFTER INSERT ON notifications
+FOR EACH ROW
+BEGIN
+    IF @skip_notification_outbox IS NULL THEN
+        INSERT INTO notification_outbox (Notification_ID, Channel, Recipient)
+        SELECT NEW.Notification_ID, 'email', email
+        FROM users WHERE User_ID = NEW.User_ID;
+    END IF;
+END //
+DELIMITER ;
+
 -- New procedure to mark notifications as read
 DELIMITER //
 CREATE PROCEDURE MarkNotificationAsRead(
@@ -235,17 +902,51 @@ BEGIN
 END //
 DELIMITER ;
 
--- Procedure to get user notifications
+-- Procedure to get one page of a user's notifications, newest first.
+-- Keyset pagination on (Created_At, Notification_ID): pass the last row of the
+-- previous page, or NULLs for the first page.
 DELIMITER //
 CREATE PROCEDURE GetUserNotifications(
-    IN p_User_ID INT
+    IN p_User_ID INT,
+    IN p_After_Created_At TIMESTAMP,
+    IN p_After_Notification_ID INT,
+    IN p_Limit INT
 )
 BEGIN
-    SELECT n.*, u.Username as Recipient
+    SELECT n.Notification_ID, n.User_ID, n.Message, n.is_read, n.Created_At,
+           u.Username as Recipient
     FROM notifications n
     JOIN users u ON n.User_ID = u.User_ID
     WHERE n.User_ID = p_User_ID
-    ORDER BY n.Created_At DESC;
+    AND (p_After_Created_At IS NULL
+         OR n.Created_At < p_After_Created_At
+         OR (n.Created_At = p_After_Created_At
+             AND n.Notification_ID < p_After_Notification_ID))
+    ORDER BY n.Created_At DESC, n.Notification_ID DESC
+    LIMIT p_Limit;
+END //
+DELIMITER ;
+
+-- GetUserNotifications on the archived notifications
+DELIMITER //
+CREATE PROCEDURE GetArchivedUserNotifications(
+    IN p_User_ID INT,
+    IN p_After_Created_At TIMESTAMP,
+    IN p_After_Notification_ID INT,
+    IN p_Limit INT
+)
+BEGIN
+    SELECT n.Notification_ID, n.User_ID, n.Message, n.is_read, n.Created_At,
+           u.Username as Recipient
+    FROM notifications_archive n
+    JOIN users u ON n.User_ID = u.User_ID
+    WHERE n.User_ID = p_User_ID
+    AND (p_After_Created_At IS NULL
+         OR n.Created_At < p_After_Created_At
+         OR (n.Created_At = p_After_Created_At
+             AND n.Notification_ID < p_After_Notification_ID))
+    ORDER BY n.Created_At DESC, n.Notification_ID DESC
+    LIMIT p_Limit;
 END //
 DELIMITER ;
 
@@ -278,46 +979,35 @@ BEGIN
 END //
 DELIMITER ;
 
--- Procedure to check operator login
-DELIMITER //
-CREATE PROCEDURE CheckOperatorLogin(
-    IN p_Username VARCHAR(50),
-    IN p_Password VARCHAR(256)
-)
-BEGIN
-    DECLARE user_exists INT;
-    
-    SELECT COUNT(*) INTO user_exists
-    FROM Operators 
-    WHERE Username = p_Username 
-    AND Password = p_Password
-    AND Status = 'Active';
-    
-    IF user_exists = 1 THEN
-        SELECT 'SUCCESS' as result;
-    ELSE
-        SELECT 'FAILURE' as result;
-    END IF;
-END //
-DELIMITER ;
-
 -- Create indices
 CREATE INDEX idx_operator_username ON Operators(Username);
 CREATE INDEX idx_operator_email ON Operators(Email);
 CREATE INDEX idx_route_name ON bus_routes(RouteName);
 CREATE INDEX idx_source_dest ON bus_routes(Source, Destination);
 CREATE INDEX idx_notification_user ON notifications(User_ID, is_read);
-CREATE INDEX idx_notification_date ON notifications(Created_At);
+CREATE INDEX idx_notification_date ON notifications(Created_At, Notification_ID);
+CREATE INDEX idx_notification_user_date ON notifications(User_ID, Created_At, Notification_ID);
+CREATE INDEX idx_ticket_route_created ON tickets(Route_ID, Created_At, Ticket_ID);
+CREATE INDEX idx_ticket_route_date ON tickets(Route_ID, Booking_Date, Status);
+CREATE INDEX idx_ticket_created ON tickets(Created_At);
+CREATE INDEX idx_ticket_group ON tickets(Group_ID);
+CREATE INDEX idx_ticket_booking_date ON tickets(Booking_Date, Ticket_ID);
+CREATE INDEX idx_user_role ON users(Role);
+CREATE INDEX idx_complaint_status ON complaints(Status, Created_At, Complaint_ID);
+CREATE INDEX idx_complaint_operator ON complaints(Operator_ID, Created_At, Complaint_ID);
+CREATE INDEX idx_complaint_created ON complaints(Created_At, Complaint_ID);
 
 -- Insert initial data
+-- The seeded admin and operator passwords are legacy SHA-256 digests of "123";
+-- they are rehashed with the current KDF on first login.
 INSERT INTO Administrators (Username, Password, Role) 
 VALUES ('admin', 'a665a45920422f9d417e4867efdc4fb8a04a1f3fff1fa07e998e86f7f7a27ae3', 'administrator');
 
 INSERT INTO users (Username, email, password, Role)
 VALUES 
-    ('testuser1', 'test1@example.com', 'testpass123', 'user'),
-    ('operator1', 'operator1@example.com', 'testpass123', 'operator'),
-    ('conductor1', 'conductor1@example.com', 'testpass123', 'conductor');
+    ('testuser1', 'test1@example.com', 'scrypt$16384$8$1$RnP/fsrGE5igmEel2Ajsiw$jZoqlop3MlWHoXL1augf8B2n+Z3ADcKPfQ3UXkuV2sA', 'user'),
+    ('operator1', 'operator1@example.com', 'scrypt$16384$8$1$KW3MHIFsFYi3+/9d1nczDg$PIox2GSyaVARJ7iOmbIlGWPP0h9wxHFGjoSEtuAc8BM', 'operator'),
+    ('conductor1', 'conductor1@example.com', 'scrypt$16384$8$1$DiMJt5LNTqN/E7Zos70N7A$sSPkUOF2IZ0oh7wUh34i9KgbdGtfT6HWlPrHEL7mzVw', 'conductor');
 
 INSERT INTO Operators (Username, Password, First_Name, Last_Name, Email, Status)
 VALUES (
@@ -329,11 +1019,12 @@ VALUES (
     'Active'
 );
 
-INSERT INTO bus_routes (RouteName, Source, Destination, Distance, Duration, Fare, Available_Seats)
+INSERT INTO bus_routes (RouteName, Source, Destination, Distance, Duration,
+                        Distance_Km, Duration_Hours, Fare, Seat_Capacity)
 VALUES 
-    ('Express-1', 'Bangalore', 'Mysore', '150 km', '3.5 hours', 450.00, 30),
-    ('Express-2', 'Bangalore', 'Hassan', '180 km', '4 hours', 500.00, 30),
-    ('Super-1', 'Mysore', 'Mangalore', '250 km', '6 hours', 750.00, 30);
+    ('Express-1', 'Bangalore', 'Mysore', '150 km', '3.5 hours', 150, 3.5, 450.00, 30),
+    ('Express-2', 'Bangalore', 'Hassan', '180 km', '4 hours', 180, 4, 500.00, 30),
+    ('Super-1', 'Mysore', 'Mangalore', '250 km', '6 hours', 250, 6, 750.00, 30);
 
 INSERT INTO notifications (User_ID, Message)
 SELECT User_ID, 'Welcome to the Bus Management System!' 
@@ -351,7 +1042,10 @@ CREATE PROCEDURE CreateBusRoute(
     IN p_Destination VARCHAR(100),
     IN p_Distance VARCHAR(50),
     IN p_Duration VARCHAR(50),
-    IN p_Fare DECIMAL(10,2)
+    IN p_Fare DECIMAL(10,2),
+    IN p_Seat_Capacity INT,
+    IN p_Distance_Km DECIMAL(8,2),
+    IN p_Duration_Hours DECIMAL(6,2)
 )
 BEGIN
     INSERT INTO bus_routes (
@@ -360,16 +1054,22 @@ BEGIN
         Destination,
         Distance,
         Duration,
+        Distance_Km,
+        Duration_Hours,
         Fare,
-        Available_Seats
+        Seat_Capacity
     ) VALUES (
         p_RouteName,
         p_Source,
         p_Destination,
         p_Distance,
         p_Duration,
+        p_Distance_Km,
+        p_Duration_Hours,
         p_Fare,
-        30  -- Default number of available seats
+        COALESCE(p_Seat_Capacity, 30)  -- Default number of seats per bus
     );
+    
+    SELECT LAST_INSERT_ID() as Route_ID;
 END //
 DELIMITER ;
\ No newline at end of file
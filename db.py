@@ -0,0 +1,476 @@
+"""
+The shared MySQL connection pool; the settings it reads are in config.py.
+
+With BUS_DB_REPLICAS set, create_pool returns a ReplicatedPool: writes and
+transactions go to the primary as before, and read_connection() spreads
+reads over the replicas that are within BUS_DB_MAX_REPLICA_LAG seconds of
+it. A session that has just committed a write reads from the primary for
+BUS_DB_READ_YOUR_WRITES seconds, so it always sees its own bookings.
+"""
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
+
+from config import DatabaseConfig, load_database_config
+from profiler import InstrumentedConnection, QueryProfiler, calling_function
+
+T = TypeVar("T")
+
+# Errors after which the whole transaction can safely be run again
+RETRYABLE_ERRNOS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+
+# The app session the current thread or task is querying for; see bind_session
+_session: ContextVar[Optional[str]] = ContextVar("bus_db_session", default=None)
+
+
+def bind_session(key: Optional[str]) -> None:
+    """Attribute this thread's (or task's) queries to an app session, for read-your-writes."""
+    _session.set(key)
+
+
+def parse_replicas(value: str, default_port: int = 3306) -> List[Tuple[str, int]]:
+    """[(host, port)] from "host[:port],host[:port]"."""
+    replicas = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        host, _, port = item.partition(":")
+        replicas.append((host, int(port) if port else default_port))
+    return replicas
+
+
+@dataclass
+class PoolMetrics:
+    """Counters describing how the pool has been used."""
+    checkouts: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    exhaustions: int = 0
+    timeouts: int = 0
+    connections_opened: int = 0
+    reconnects: int = 0
+    discarded: int = 0
+    transaction_retries: int = 0
+
+
+class ConnectionPool:
+    """
+    A fixed-size pool of MySQL connections shared by all sessions of the app.
+    Connections are opened lazily, pinged before reuse once they have been idle
+    for health_check_interval seconds, and rolled back when returned.
+    With a profiler attached, the connections handed out are instrumented.
+    """
+
+    def __init__(self, config: DatabaseConfig):
+        self.config = config
+        self.metrics = PoolMetrics()
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._in_use = 0
+        self.profiler: Optional[QueryProfiler] = None
+
+    def _connect(self):
+        conn = mysql.connector.connect(
+            host=self.config.host,
+            port=self.config.port,
+            user=self.config.user,
+            password=self.config.password,
+            database=self.config.database,
+            autocommit=False
+        )
+        with self._lock:
+            self.metrics.connections_opened += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.metrics.discarded += 1
+
+    def _check_health(self, conn, last_used: float):
+        """Ping a connection that has sat idle too long, reconnecting if it dropped."""
+        if time.monotonic() - last_used < self.config.health_check_interval:
+            return conn
+        try:
+            conn.ping(reconnect=False)
+        except Error:
+            with self._lock:
+                self.metrics.reconnects += 1
+            conn.reconnect(attempts=2, delay=0)
+        return conn
+
+    def _acquire(self):
+        start = time.perf_counter()
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._size < self.config.pool_size
+                if can_open:
+                    self._size += 1
+                else:
+                    self.metrics.exhaustions += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Error:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+                last_used = time.monotonic()
+            else:
+                try:
+                    conn, last_used = self._idle.get(timeout=self.config.pool_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.metrics.timeouts += 1
+                    raise PoolError(
+                        f"No database connection became free within {self.config.pool_timeout}s"
+                    )
+
+        try:
+            conn = self._check_health(conn, last_used)
+        except Error:
+            self._discard(conn)
+            raise
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self.metrics.checkouts += 1
+            self.metrics.total_wait += wait
+            self.metrics.max_wait = max(self.metrics.max_wait, wait)
+        return conn
+
+    def _release(self, conn, broken: bool) -> None:
+        with self._lock:
+            self._in_use -= 1
+        if broken:
+            self._discard(conn)
+            return
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+        except Error:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self, instrument: bool = True) -> Iterator[Any]:
+        """Borrow a connection for the duration of a ``with`` block."""
+        profiler = self.profiler if instrument else None
+        start = time.perf_counter()
+        conn = self._acquire()
+        broken = False
+        try:
+            if profiler:
+                caller = calling_function()
+                profiler.record_wait(caller, time.perf_counter() - start)
+                yield InstrumentedConnection(conn, profiler, caller)
+            else:
+                yield conn
+        except (InterfaceError, OperationalError):
+            broken = True
+            raise
+        finally:
+            self._release(conn, broken)
+
+    def read_connection(self) -> Iterator[Any]:
+        """Borrow a connection for read-only queries; on a plain pool, any connection."""
+        return self.connection()
+
+    def run_transaction(self, work: Callable[[Any], T],
+                        attempts: int = 4, backoff: float = 0.02) -> T:
+        """
+        Run work(conn) inside an explicit transaction and commit it.
+        On a deadlock or lock wait timeout the transaction is rolled back and
+        retried with jittered exponential backoff, up to the given attempts.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                with self.connection() as conn:
+                    conn.start_transaction()
+                    result = work(conn)
+                    conn.commit()
+                    return result
+            except Error as e:
+                if e.errno not in RETRYABLE_ERRNOS or attempt == attempts:
+                    raise
+            with self._lock:
+                self.metrics.transaction_retries += 1
+            time.sleep(backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+        raise ValueError("attempts must be at least 1")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the pool metrics."""
+        with self._lock:
+            m = self.metrics
+            return {
+                "pool_size": self.config.pool_size,
+                "open": self._size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": m.checkouts,
+                "avg_wait_ms": round(1000 * m.total_wait / m.checkouts, 3) if m.checkouts else 0.0,
+                "max_wait_ms": round(1000 * m.max_wait, 3),
+                "exhaustions": m.exhaustions,
+                "timeouts": m.timeouts,
+                "connections_opened": m.connections_opened,
+                "reconnects": m.reconnects,
+                "discarded": m.discarded,
+                "transaction_retries": m.transaction_retries,
+            }
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+class _TargetStats:
+    """Borrows, errors and recent latencies of the connections to one server."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.errors = 0
+        self.total = 0.0
+        self.latencies: Deque[float] = deque(maxlen=2000)
+
+    def observe(self, seconds: float, read: bool, failed: bool) -> None:
+        if read:
+            self.reads += 1
+        else:
+            self.writes += 1
+        self.errors += failed
+        self.total += seconds
+        self.latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = self.reads + self.writes
+
+        def ms(q: float) -> Optional[float]:
+            return round(1000 * latencies[int(q * (len(latencies) - 1))], 3) if latencies else None
+
+        return {"reads": self.reads, "writes": self.writes, "errors": self.errors,
+                "avg_ms": round(1000 * self.total / count, 3) if count else 0.0,
+                "p50_ms": ms(0.5), "p99_ms": ms(0.99)}
+
+
+class _CommitTracking:
+    """Connection wrapper that reports each commit, i.e. each write, to the pool."""
+
+    def __init__(self, conn, on_commit: Callable[[], None]):
+        self._conn = conn
+        self._on_commit = on_commit
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        self._conn.commit()
+        self._on_commit()
+
+
+class Replica:
+    """A read replica: its own pool and the outcome of the latest lag check."""
+
+    def __init__(self, name: str, pool: ConnectionPool):
+        self.name = name
+        self.pool = pool
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = "not checked yet"
+        self.checked_at = 0.0
+
+    def usable(self, max_lag: float, stale_after: float) -> bool:
+        return (self.error is None and self.lag is not None and self.lag <= max_lag
+                and time.monotonic() - self.checked_at <= stale_after)
+
+
+class ReplicatedPool(ConnectionPool):
+    """
+    The primary's pool, with read replicas behind read_connection().
+    connection() and run_transaction() always use the primary; a commit on
+    it makes the current session (see bind_session) read from the primary
+    for read_your_writes seconds. Replicas are lag-checked on a background
+    thread and skipped while they are unreachable, not replicating, or more
+    than max_replica_lag seconds behind; reads then fall back to the primary.
+    """
+
+    def __init__(self, config: DatabaseConfig, replicas: List[Tuple[str, int]]):
+        super().__init__(config)
+        self.replicas = [Replica(f"{host}:{port}",
+                                 ConnectionPool(replace(config, host=host, port=port)))
+                         for host, port in replicas]
+        self._targets: Dict[str, _TargetStats] = {"primary": _TargetStats()}
+        self._targets.update({r.name: _TargetStats() for r in self.replicas})
+        self._routing = {"replica_reads": 0, "sticky_reads": 0, "fallback_reads": 0}
+        self._writes: Dict[str, float] = {}
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._checker = threading.Thread(target=self._check_lag, name="replica-lag", daemon=True)
+        self._checker.start()
+
+    def _lag(self, replica: Replica) -> Optional[float]:
+        """Seconds the replica's SQL thread is behind, or None when it is not replicating."""
+        with replica.pool.connection(instrument=False) as conn:
+            with conn.cursor(dictionary=True) as cursor:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except Error:
+                    # MySQL before 8.0.22 and MariaDB before 10.5
+                    cursor.execute("SHOW SLAVE STATUS")
+                status = cursor.fetchone()
+                cursor.fetchall()
+        if status is None:
+            return None
+        # MariaDB keeps the Seconds_Behind_Master name under SHOW REPLICA STATUS
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+
+    def _check_lag(self) -> None:
+        while not self._stop.is_set():
+            for replica in self.replicas:
+                try:
+                    lag = self._lag(replica)
+                    error = None if lag is not None else "not replicating"
+                except Exception as e:
+                    # Anything unexpected only takes this replica out of rotation;
+                    # the checker must keep running or no replica is read again
+                    lag, error = None, f"{type(e).__name__}: {e}"
+                with self._lock:
+                    replica.lag, replica.error = lag, error
+                    replica.checked_at = time.monotonic()
+            self._stop.wait(self.config.lag_check_interval)
+
+    def _note_write(self) -> None:
+        session = _session.get()
+        if session is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._writes[session] = now
+            if len(self._writes) > 10000:
+                self._writes = {s: t for s, t in self._writes.items()
+                                if now - t < self.config.read_your_writes}
+
+    def _pick(self) -> Optional[Replica]:
+        """The replica for the next read, or None to read from the primary."""
+        session = _session.get()
+        with self._lock:
+            written = self._writes.get(session) if session is not None else None
+            if written is not None and time.monotonic() - written < self.config.read_your_writes:
+                self._routing["sticky_reads"] += 1
+                return None
+            usable = [r for r in self.replicas
+                      if r.usable(self.config.max_replica_lag, 3 * self.config.lag_check_interval)]
+            if not usable:
+                self._routing["fallback_reads"] += 1
+                return None
+            self._routing["replica_reads"] += 1
+            return usable[next(self._turn) % len(usable)]
+
+    def _observe(self, target: str, seconds: float, read: bool, failed: bool) -> None:
+        with self._lock:
+            self._targets[target].observe(seconds, read, failed)
+
+    @contextmanager
+    def connection(self, instrument: bool = True) -> Iterator[Any]:
+        start = time.perf_counter()
+        failed = False
+        try:
+            with super().connection(instrument) as conn:
+                yield _CommitTracking(conn, self._note_write)
+        except Error:
+            failed = True
+            raise
+        finally:
+            self._observe("primary", time.perf_counter() - start, False, failed)
+
+    @contextmanager
+    def read_connection(self) -> Iterator[Any]:
+        """Borrow a connection to a replica that is caught up, else to the primary."""
+        replica = self._pick()
+        start = time.perf_counter()
+        failed = False
+        with ExitStack() as stack:
+            target = "primary"
+            conn = None
+            if replica is not None:
+                try:
+                    conn = stack.enter_context(replica.pool.connection())
+                    target = replica.name
+                except Error as e:
+                    # Skip the replica until its next successful lag check
+                    with self._lock:
+                        replica.error = str(e)
+                        self._routing["fallback_reads"] += 1
+                    self._observe(replica.name, time.perf_counter() - start, True, True)
+                    start = time.perf_counter()
+            if conn is None:
+                conn = stack.enter_context(super().connection())
+            try:
+                yield conn
+            except Error:
+                failed = True
+                raise
+            finally:
+                self._observe(target, time.perf_counter() - start, True, failed)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            stats["routing"] = dict(self._routing)
+            stats["targets"] = {name: t.snapshot() for name, t in self._targets.items()}
+            stats["replicas"] = [{"name": r.name, "lag": r.lag, "error": r.error,
+                                  "usable": r.usable(self.config.max_replica_lag,
+                                                     3 * self.config.lag_check_interval)}
+                                 for r in self.replicas]
+        for replica, entry in zip(self.replicas, stats["replicas"]):
+            entry["pool"] = replica.pool.stats()
+        return stats
+
+    def close(self) -> None:
+        self._stop.set()
+        for replica in self.replicas:
+            replica.pool.close()
+        super().close()
+
+
+def create_pool(config: Optional[DatabaseConfig] = None) -> ConnectionPool:
+    """
+    Create a connection pool, reading the settings from the environment by
+    default; a ReplicatedPool when read replicas are configured.
+    """
+    config = config or load_database_config()
+    replicas = parse_replicas(config.replicas, config.port)
+    pool = ReplicatedPool(config, replicas) if replicas else ConnectionPool(config)
+    if pool.config.profile:
+        pool.profiler = QueryProfiler(pool, pool.config.slow_query_ms)
+        for replica in getattr(pool, "replicas", []):
+            replica.pool.profiler = pool.profiler
+    return pool
+
@@ -0,0 +1,224 @@
+"""
+Streaming export of tickets and passenger manifests to CSV, JSON Lines or Parquet.
+
+Rows are read through an unbuffered cursor with fetchmany() and written one
+chunk at a time, so memory use stays flat however large the tickets table is.
+
+    python exporter.py tickets --created-on 2026-10-18 --format csv -o tickets.csv
+    python exporter.py manifest --route 3 --date 2026-10-20 --format parquet -o manifest.parquet
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+from typing import IO, Any, Callable, Iterator, List, Optional, Tuple
+
+from db import ConnectionPool, create_pool
+from jobs import job_type
+
+FORMATS = ("csv", "jsonl", "parquet")
+EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+# Where exports started from the admin portal are written
+EXPORT_DIR = os.environ.get("BUS_EXPORT_DIR", "exports")
+
+TICKET_COLUMNS = [
+    "Ticket_ID", "Route_ID", "Passenger_Name", "Passenger_Email", "Passenger_Phone",
+    "Booking_Date", "Number_Of_Seats", "Seat_Numbers", "Total_Fare", "Status", "Created_At",
+]
+
+MANIFEST_COLUMNS = [
+    "Ticket_ID", "Passenger_Name", "Passenger_Email", "Passenger_Phone",
+    "Number_Of_Seats", "Seat_Numbers",
+]
+
+
+def _ticket_queries(created_on: Optional[date], status: Optional[str],
+                    archived: bool = True) -> List[Tuple[str, tuple]]:
+    """
+    All tickets, or those created on one day (the daily accounting dump).
+    With archived, the tickets moved to tickets_archive come first, from a
+    query of their own: a UNION with an ORDER BY would be materialized and
+    sorted by the server before the first row could be streamed.
+    """
+    where = "(%s IS NULL OR Status = %s)"
+    args: tuple = (status, status)
+    if created_on:
+        # A range on Created_At so idx_ticket_created (idx_archive_ticket_created) can be used
+        where += " AND Created_At >= %s AND Created_At < %s ORDER BY Created_At, Ticket_ID"
+        args += (created_on, created_on + timedelta(days=1))
+    else:
+        where += " ORDER BY Ticket_ID"
+    tables = ("tickets_archive", "tickets") if archived else ("tickets",)
+    return [(f"SELECT {', '.join(TICKET_COLUMNS)} FROM {table} WHERE {where}", args)
+            for table in tables]
+
+
+def _manifest_query(route_id: int, travel_date: date) -> Tuple[str, tuple]:
+    """Booked passengers of one route on one travel date."""
+    sql = f"""
+        SELECT {', '.join(MANIFEST_COLUMNS)} FROM tickets
+        WHERE Route_ID = %s AND Booking_Date = %s AND Status = 'Booked'
+        ORDER BY Ticket_ID
+    """
+    return sql, (route_id, travel_date)
+
+
+def stream_rows(conn, sql: str, args: tuple, chunk_size: int) -> Iterator[List[tuple]]:
+    """Yield result rows chunk_size at a time from an unbuffered cursor."""
+    with conn.cursor(buffered=False) as cursor:
+        cursor.execute(sql, args)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def _write_csv(chunks: Iterator[List[tuple]], columns: List[str], out: IO[str]) -> Iterator[int]:
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+        yield count
+
+
+def _write_jsonl(chunks: Iterator[List[tuple]], columns: List[str], out: IO[str]) -> Iterator[int]:
+    count = 0
+    for rows in chunks:
+        out.write("".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows))
+        count += len(rows)
+        yield count
+
+
+def _parquet_schema(columns: List[str]):
+    import pyarrow as pa
+    types = {
+        "Ticket_ID": pa.int32(), "Route_ID": pa.int32(), "Number_Of_Seats": pa.int32(),
+        "Booking_Date": pa.date32(), "Total_Fare": pa.decimal128(10, 2),
+        "Created_At": pa.timestamp("s"),
+    }
+    return pa.schema([(c, types.get(c, pa.string())) for c in columns])
+
+
+def _write_parquet(chunks: Iterator[List[tuple]], columns: List[str], out: Any) -> Iterator[int]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs the pyarrow package")
+    schema = _parquet_schema(columns)
+    count = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for rows in chunks:
+            arrays = [pa.array(list(col), type=schema.field(i).type)
+                      for i, col in enumerate(zip(*rows))]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(rows)
+            yield count
+
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def export(pool: ConnectionPool, kind: str, file_format: str, path: str,
+           route_id: Optional[int] = None, travel_date: Optional[date] = None,
+           created_on: Optional[date] = None, status: Optional[str] = None,
+           chunk_size: int = 10000,
+           progress: Optional[Callable[[int], None]] = None,
+           archived: bool = True) -> int:
+    """
+    Export 'tickets' or a 'manifest' to path. Returns the number of rows written.
+    Tickets include the archived ones unless archived is False.
+    progress(rows_written) is called after every chunk.
+    """
+    if file_format not in WRITERS:
+        raise ValueError(f"Unsupported format {file_format!r}; expected one of {FORMATS}")
+    if kind == "tickets":
+        queries = _ticket_queries(created_on, status, archived)
+        columns = TICKET_COLUMNS
+    elif kind == "manifest":
+        if route_id is None or travel_date is None:
+            raise ValueError("A manifest needs a route and a travel date")
+        queries = [_manifest_query(route_id, travel_date)]
+        columns = MANIFEST_COLUMNS
+    else:
+        raise ValueError(f"Unknown export {kind!r}; expected 'tickets' or 'manifest'")
+
+    if file_format == "parquet":
+        out = open(path, "wb")
+    else:
+        out = open(path, "w", newline="", encoding="utf-8")
+
+    count = 0
+    with pool.connection() as conn, out:
+        # One query after the other on the same connection, each fully read before the next
+        chunks = itertools.chain.from_iterable(stream_rows(conn, sql, args, chunk_size)
+                                               for sql, args in queries)
+        for count in WRITERS[file_format](chunks, columns, out):
+            if progress:
+                progress(count)
+    return count
+
+
+def export_filename(kind: str, file_format: str, route_id: Optional[int] = None,
+                    travel_date: Optional[date] = None, created_on: Optional[date] = None) -> str:
+    """Build a descriptive file name for an export."""
+    parts = [kind]
+    if route_id is not None:
+        parts.append(f"route{route_id}")
+    for day in (travel_date, created_on):
+        if day:
+            parts.append(day.isoformat())
+    parts.append(time.strftime("%Y%m%d-%H%M%S"))
+    return "_".join(parts) + EXTENSIONS[file_format]
+
+
+@job_type("export")
+def _export_job(pool, params, progress):
+    travel_date = date.fromisoformat(params['travel_date']) if params.get('travel_date') else None
+    created_on = date.fromisoformat(params['created_on']) if params.get('created_on') else None
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, export_filename(
+        params['kind'], params['format'], params.get('route_id'), travel_date, created_on
+    ))
+    rows = export(pool, params['kind'], params['format'], path, params.get('route_id'),
+                  travel_date, created_on, params.get('status'),
+                  progress=lambda done: progress(done, 0),
+                  archived=params.get('archived', True))
+    return {"path": path, "rows": rows}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export tickets or a passenger manifest.")
+    parser.add_argument("kind", choices=["tickets", "manifest"])
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--route", type=int, help="route for a manifest")
+    parser.add_argument("--date", type=date.fromisoformat, help="travel date for a manifest")
+    parser.add_argument("--created-on", type=date.fromisoformat,
+                        help="only tickets created on this day")
+    parser.add_argument("--status", choices=["Booked", "Cancelled"])
+    parser.add_argument("--no-archived", dest="archived", action="store_false",
+                        help="leave out tickets moved to tickets_archive")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    pool = create_pool()
+    start = time.perf_counter()
+    rows = export(pool, args.kind, args.format, args.output, args.route, args.date,
+                  args.created_on, args.status, args.chunk_size, archived=args.archived)
+    elapsed = time.perf_counter() - start
+    pool.close()
+    print(f"Wrote {rows} rows to {args.output} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
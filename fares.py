@@ -0,0 +1,36 @@
+"""Picking a trip's per-seat fare from its route_fares rows, as QuoteFare does."""
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence
+
+
+def quote_fare(tiers: Sequence[Dict[str, Any]], base_fare: Any, capacity: int,
+               taken: int, num_seats: int) -> float:
+    """
+    Per-seat fare from one trip's route_fares rows (ascending Min_Load), as
+    QuoteFare picks it: the highest tier reached by the seats already taken,
+    the group fare for num_seats >= Group_Min_Seats, or base_fare when unpriced.
+    """
+    chosen = None
+    for tier in tiers:
+        # Min_Load has three decimals; compare in integers like DECIMAL does
+        if round(float(tier['Min_Load']) * 1000) * capacity <= taken * 1000:
+            chosen = tier
+    if chosen is None:
+        return float(base_fare)
+    if num_seats >= chosen['Group_Min_Seats']:
+        return float(chosen['Group_Fare'])
+    return float(chosen['Fare'])
+
+
+def trip_fares(trips: Dict[tuple, Dict[str, Any]], seats: Dict[tuple, int],
+               base_fares: Dict[int, Any], rows: Sequence[Dict[str, Any]]) -> Dict[tuple, float]:
+    """
+    Per-seat fare for each locked (Route_ID, Travel_Date) trip, booking the
+    given number of seats on it, from the route_fares rows of those trips.
+    """
+    tiers: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        tiers[(row['Route_ID'], row['Travel_Date'])].append(row)
+    return {key: quote_fare(tiers[key], base_fares[key[0]], trip['Capacity'],
+                            bin(int(trip['Seat_Map'])).count("1"), seats[key])
+            for key, trip in trips.items()}
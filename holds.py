@@ -0,0 +1,128 @@
+"""
+Temporary seat holds.
+
+Holding seats takes them off the trip straight away, so they are never sold
+twice and displayed availability already excludes them. A hold is confirmed
+into a ticket before it expires, released by the passenger, or expired by a
+sweeper. Every state change is a conditional UPDATE on the hold row, so any
+number of app processes can run sweepers and confirmations at once.
+"""
+import os
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from booking import call_for_result
+from db import ConnectionPool
+from storage.base import Storage, StorageError
+
+# How long seats are held while the passenger completes the booking
+HOLD_TTL = int(os.environ.get("BUS_HOLD_TTL", "300"))
+
+
+def hold_seats(pool: ConnectionPool, route_id: int, travel_date: date, num_seats: int,
+               held_by: Optional[str] = None, ttl: int = HOLD_TTL) -> Optional[Dict[str, Any]]:
+    """
+    Hold seats on a trip for ttl seconds.
+    Returns {'result': 'SUCCESS', 'Hold_ID', 'Seat_Numbers', 'Expires_At'}
+    or {'result': 'INSUFFICIENT_SEATS'}.
+    """
+    args = (route_id, travel_date, num_seats, held_by, ttl)
+    return pool.run_transaction(lambda conn: call_for_result(conn, 'HoldSeats', args))
+
+
+def confirm_hold(pool: ConnectionPool, hold_id: int, passenger_name: str,
+                 passenger_email: str, passenger_phone: str) -> Optional[Dict[str, Any]]:
+    """
+    Turn a hold into a ticket. Returns {'result': 'SUCCESS', 'Ticket_ID', ...},
+    also when the hold was already confirmed, or {'result': 'HOLD_EXPIRED'}.
+    """
+    args = (hold_id, passenger_name, passenger_email, passenger_phone)
+    return pool.run_transaction(lambda conn: call_for_result(conn, 'ConfirmHold', args))
+
+
+def release_hold(pool: ConnectionPool, hold_id: int) -> Optional[Dict[str, Any]]:
+    """Give a hold's seats back before it expires."""
+    return pool.run_transaction(
+        lambda conn: call_for_result(conn, 'ReleaseHold', (hold_id, 'Released'))
+    )
+
+
+def expire_holds(pool: ConnectionPool, batch_size: int = 500) -> List[Tuple[int, date]]:
+    """
+    Expire up to batch_size holds that are past due, oldest first.
+    Each hold is released in its own short transaction so trip rows are never
+    locked for long. Returns the (Route_ID, Travel_Date) of every trip that
+    got seats back.
+    """
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT Hold_ID FROM seat_holds
+            WHERE Status = 'Held' AND Expires_At <= CURRENT_TIMESTAMP
+            ORDER BY Expires_At
+            LIMIT %s
+        """, (batch_size,))
+        hold_ids = [row[0] for row in cursor.fetchall()]
+
+    released = []
+    for hold_id in hold_ids:
+        result = pool.run_transaction(
+            lambda conn: call_for_result(conn, 'ReleaseHold', (hold_id, 'Expired'))
+        )
+        # Another process may have confirmed or expired it first
+        if result and result['result'] == 'SUCCESS':
+            released.append((result['Route_ID'], result['Travel_Date']))
+    return released
+
+
+def seconds_until_next_expiry(pool: ConnectionPool) -> Optional[float]:
+    """Seconds until the earliest active hold expires, or None if nothing is held."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT TIMESTAMPDIFF(MICROSECOND, CURRENT_TIMESTAMP(6), MIN(Expires_At))
+            FROM seat_holds WHERE Status = 'Held'
+        """)
+        (micros,) = cursor.fetchone()
+    return None if micros is None else max(0.0, micros / 1_000_000)
+
+
+class HoldSweeper:
+    """
+    Background thread that expires holds as they fall due.
+    It sleeps until the earliest expiry (at most max_interval seconds, so
+    holds made by other processes are noticed) and calls
+    on_release(route_id, travel_date) for every trip that got seats back.
+    """
+
+    def __init__(self, storage: Storage, max_interval: float = 5.0,
+                 on_release: Optional[Callable[[int, date], None]] = None):
+        self.storage = storage
+        self.max_interval = max_interval
+        self.on_release = on_release
+        self.expired = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="hold-sweeper", daemon=True)
+
+    def start(self) -> "HoldSweeper":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            wait = self.max_interval
+            try:
+                released = self.storage.expire_holds()
+                self.expired += len(released)
+                if self.on_release:
+                    for route_id, travel_date in set(released):
+                        self.on_release(route_id, travel_date)
+                due = self.storage.seconds_until_next_expiry()
+                if due is not None:
+                    wait = max(min(wait, due), 0.05)
+            except StorageError:
+                # The database may be briefly unavailable; try again next round
+                pass
+            self._stop.wait(wait)
+
+    def stop(self) -> None:
+        self._stop.set()
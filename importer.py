@@ -0,0 +1,267 @@
+"""
+Bulk import of bus routes and trips from CSV or Parquet.
+
+Rows are read as a stream, validated, and inserted chunk_size at a time,
+one transaction per chunk. A chunk that the database rejects is retried row
+by row so a single bad row is reported instead of aborting the load.
+
+    python importer.py routes network.csv
+    python importer.py trips schedule.parquet --chunk-size 10000
+"""
+import argparse
+import csv
+import io
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from mysql.connector import Error
+
+from db import ConnectionPool, create_pool
+from seats import MAX_SEATS
+
+# Keep at most this many row errors in memory; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+ROUTE_INSERT = """
+    INSERT INTO bus_routes (RouteName, Source, Destination, Distance, Duration,
+                            Distance_Km, Duration_Hours, Fare, Seat_Capacity)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+TRIP_INSERT = """
+    INSERT INTO trips (Route_ID, Travel_Date, Capacity, Available_Seats, Seat_Map)
+    VALUES (%s, %s, %s, %s, 0)
+    ON DUPLICATE KEY UPDATE Trip_ID = Trip_ID
+"""
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+
+
+def parse_distance(value: Any) -> float:
+    """Parse a distance such as '150 km', '150km' or 150 into kilometres."""
+    text = str(value).strip().lower()
+    match = re.fullmatch(_NUMBER + r"\s*(km|kms|kilometres|kilometers)?", text)
+    if not match:
+        raise ValueError(f"Unrecognised distance {value!r}")
+    return float(match.group(1))
+
+
+def parse_duration(value: Any) -> float:
+    """Parse a duration such as '3.5 hours', '3h 30m', '03:30' or '90 min' into hours."""
+    text = str(value).strip().lower()
+    match = re.fullmatch(r"(\d+):(\d{2})", text)
+    if match:
+        return int(match.group(1)) + int(match.group(2)) / 60
+    match = re.fullmatch(_NUMBER + r"\s*(?:m|min|mins|minutes)", text)
+    if match:
+        return float(match.group(1)) / 60
+    match = re.fullmatch(_NUMBER + r"\s*(?:h|hr|hrs|hour|hours)?(?:\s*(\d+)\s*(?:m|min|mins|minutes))?", text)
+    if match:
+        return float(match.group(1)) + int(match.group(2) or 0) / 60
+    raise ValueError(f"Unrecognised duration {value!r}")
+
+
+@dataclass
+class ImportResult:
+    """Outcome of an import."""
+    rows_read: int = 0
+    inserted: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    error_count: int = 0
+    seconds: float = 0.0
+
+    def add_error(self, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+def _required(row: Dict[str, Any], name: str, max_length: int) -> str:
+    value = row.get(name)
+    text = "" if value is None else str(value).strip()
+    if not text:
+        raise ValueError(f"{name} is required")
+    if len(text) > max_length:
+        raise ValueError(f"{name} is longer than {max_length} characters")
+    return text
+
+
+def _seats(value: Any, default: int) -> int:
+    if value is None or str(value).strip() == "":
+        return default
+    seats = int(value)
+    if not 1 <= seats <= MAX_SEATS:
+        raise ValueError(f"seats must be between 1 and {MAX_SEATS}")
+    return seats
+
+
+def validate_route(row: Dict[str, Any]) -> tuple:
+    """Turn a routes file row into ROUTE_INSERT parameters, or raise ValueError."""
+    distance = _required(row, "distance", 50)
+    duration = _required(row, "duration", 50)
+    try:
+        fare = Decimal(str(row.get("fare")).strip())
+        if not fare.is_finite():
+            raise InvalidOperation
+    except InvalidOperation:
+        raise ValueError(f"Invalid fare {row.get('fare')!r}")
+    if fare < 0:
+        raise ValueError("fare cannot be negative")
+    return (
+        _required(row, "routename", 100),
+        _required(row, "source", 100),
+        _required(row, "destination", 100),
+        distance,
+        duration,
+        parse_distance(distance),
+        round(parse_duration(duration), 2),
+        fare,
+        _seats(row.get("seat_capacity"), 30),
+    )
+
+
+def validate_trip(row: Dict[str, Any], routes: Dict[Any, Tuple[int, int]]) -> tuple:
+    """
+    Turn a trips file row into TRIP_INSERT parameters, or raise ValueError.
+    The route is given by route_id or routename; capacity defaults to the route's.
+    """
+    key = row.get("route_id") or row.get("routename")
+    key = int(key) if str(key).strip().isdigit() else str(key or "").strip()
+    if key not in routes:
+        raise ValueError(f"Unknown route {key!r}")
+    route_id, seat_capacity = routes[key]
+
+    travel_date = row.get("travel_date")
+    if not isinstance(travel_date, date):
+        travel_date = date.fromisoformat(str(travel_date).strip())
+    capacity = _seats(row.get("capacity"), seat_capacity)
+    return (route_id, travel_date, capacity, capacity)
+
+
+def read_rows(source: Any, file_format: str, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows from a CSV or Parquet file (path or binary file object).
+    Column names are lower-cased so headers are matched case-insensitively.
+    """
+    if file_format == "csv":
+        stream = open(source, newline="", encoding="utf-8-sig") if isinstance(source, str) \
+            else io.TextIOWrapper(source, newline="", encoding="utf-8-sig")
+        with stream:
+            for row in csv.DictReader(stream):
+                yield {(k or "").strip().lower(): v for k, v in row.items()}
+    elif file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet import needs the pyarrow package")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+            for row in batch.to_pylist():
+                yield {k.lower(): v for k, v in row.items()}
+    else:
+        raise ValueError(f"Unsupported file format {file_format!r}")
+
+
+def _load_route_keys(pool: ConnectionPool) -> Dict[Any, Tuple[int, int]]:
+    """Map both Route_ID and RouteName to (Route_ID, Seat_Capacity)."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT Route_ID, RouteName, Seat_Capacity FROM bus_routes")
+        routes = {}
+        for route_id, name, seats in cursor.fetchall():
+            routes[route_id] = (route_id, seats)
+            routes.setdefault(name, (route_id, seats))
+        return routes
+
+
+def _insert_chunk(pool: ConnectionPool, sql: str, chunk: List[Tuple[int, tuple]],
+                  result: ImportResult) -> None:
+    """Insert a validated chunk in one transaction, falling back to row by row."""
+    try:
+        with pool.connection() as conn, conn.cursor() as cursor:
+            cursor.executemany(sql, [params for _, params in chunk])
+            conn.commit()
+        result.inserted += len(chunk)
+        return
+    except Error:
+        pass
+
+    with pool.connection() as conn, conn.cursor() as cursor:
+        for row_number, params in chunk:
+            try:
+                cursor.execute(sql, params)
+                conn.commit()
+                result.inserted += 1
+            except Error as e:
+                conn.rollback()
+                result.add_error(row_number, str(e))
+
+
+def import_file(pool: ConnectionPool, kind: str, rows: Iterable[Dict[str, Any]],
+                chunk_size: int = 5000, progress=None) -> ImportResult:
+    """
+    Validate and insert routes or trips from an iterable of rows.
+    progress(rows_read) is called after each chunk.
+    """
+    if kind == "routes":
+        sql, validate = ROUTE_INSERT, validate_route
+    elif kind == "trips":
+        route_keys = _load_route_keys(pool)
+        sql, validate = TRIP_INSERT, lambda row: validate_trip(row, route_keys)
+    else:
+        raise ValueError(f"Unknown import kind {kind!r}; expected 'routes' or 'trips'")
+
+    result = ImportResult()
+    start = time.perf_counter()
+    chunk: List[Tuple[int, tuple]] = []
+    # Row 1 is the header, so data rows start at 2 as in a spreadsheet
+    for row_number, row in enumerate(rows, 2):
+        result.rows_read += 1
+        try:
+            chunk.append((row_number, validate(row)))
+        except (ValueError, TypeError) as e:
+            result.add_error(row_number, str(e))
+        if len(chunk) >= chunk_size:
+            _insert_chunk(pool, sql, chunk, result)
+            chunk = []
+            if progress:
+                progress(result.rows_read)
+    if chunk:
+        _insert_chunk(pool, sql, chunk, result)
+    if progress:
+        progress(result.rows_read)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import bus routes or trips.")
+    parser.add_argument("kind", choices=["routes", "trips"])
+    parser.add_argument("path", help="a .csv or .parquet file")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    file_format = "parquet" if args.path.lower().endswith(".parquet") else "csv"
+    pool = create_pool()
+    result = import_file(pool, args.kind, read_rows(args.path, file_format), args.chunk_size)
+    pool.close()
+
+    print(f"{result.rows_read} rows read, {result.inserted} inserted, "
+          f"{result.error_count} rejected in {result.seconds:.2f}s "
+          f"({result.rows_per_sec:.0f} rows/sec)")
+    for row_number, message in result.errors:
+        print(f"  row {row_number}: {message}", file=sys.stderr)
+    if result.error_count > len(result.errors):
+        print(f"  ... and {result.error_count - len(result.errors)} more", file=sys.stderr)
+    return 1 if result.error_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
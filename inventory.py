@@ -0,0 +1,48 @@
+"""Per-date trip inventory: bulk trip generation and availability lookups."""
+from datetime import date
+from typing import Dict, Optional
+
+from db import ConnectionPool
+from seats import seats_from_mask
+
+
+def generate_trips(pool: ConnectionPool, start_date: date, days: int) -> int:
+    """Create trips for every route from start_date for the given number of days."""
+    def work(conn) -> int:
+        with conn.cursor(dictionary=True) as cursor:
+            cursor.callproc('GenerateTrips', (start_date, days))
+
+            created = 0
+            for result in cursor.stored_results():
+                created = result.fetchone()['Trips_Created']
+            return int(created)
+
+    return pool.run_transaction(work)
+
+
+def get_availability(pool: ConnectionPool, travel_date: date) -> Dict[int, int]:
+    """
+    Return {Route_ID: Available_Seats} for the trips that exist on travel_date.
+    Routes without a trip yet have every seat free; callers fall back to Seat_Capacity.
+    """
+    with pool.read_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT Route_ID, Available_Seats
+            FROM trips
+            WHERE Travel_Date = %s
+        """, (travel_date,))
+        return {route_id: available for route_id, available in cursor.fetchall()}
+
+
+def get_trip(pool: ConnectionPool, route_id: int, travel_date: date) -> Optional[Dict]:
+    """Return the trip for a route and date with its taken seat numbers, if it exists."""
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT Trip_ID, Route_ID, Travel_Date, Capacity, Available_Seats, Seat_Map
+            FROM trips
+            WHERE Route_ID = %s AND Travel_Date = %s
+        """, (route_id, travel_date))
+        trip = cursor.fetchone()
+    if trip:
+        trip['Taken_Seats'] = seats_from_mask(int(trip['Seat_Map']))
+    return trip
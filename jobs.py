@@ -0,0 +1,267 @@
+"""
+In-process background jobs for long-running admin operations.
+
+Jobs are persisted in the jobs table (Queued -> Running -> Done/Failed) and
+executed on a thread pool, so the Streamlit script only submits them and
+polls their status. Job types are plain functions registered with @job_type;
+each receives the pool, its params and a progress(done, total) callback and
+returns a JSON-serialisable result.
+
+A runner refreshes Heartbeat_At on the jobs it is running. A Running job
+whose heartbeat has stopped was interrupted by its process dying, and is
+marked Failed when a runner starts.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from mysql.connector import Error
+
+from booking import cancel_booking
+from archiver import archive_all
+from broadcast import broadcast_notification
+from db import ConnectionPool
+from pricing import PRICING_DAYS, reprice
+from storage.mysql import MySQLStorage
+
+JobHandler = Callable[[ConnectionPool, Dict[str, Any], Callable[[int, int], None]], Any]
+
+JOB_TYPES: Dict[str, JobHandler] = {}
+
+# Minimum seconds between progress writes to the jobs table
+PROGRESS_INTERVAL = 1.0
+
+# Seconds between heartbeats of running jobs
+HEARTBEAT_INTERVAL = 10.0
+# Seconds without a heartbeat after which a Running job counts as interrupted
+HEARTBEAT_TIMEOUT = 60.0
+
+
+def job_type(name: str) -> Callable[[JobHandler], JobHandler]:
+    """Register a function as a job type."""
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_TYPES[name] = handler
+        return handler
+    return register
+
+
+def _as_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+
+@job_type("create_notification")
+def _create_notification(pool, params, progress):
+    def work(conn):
+        with conn.cursor() as cursor:
+            cursor.callproc('CreateNotification', (params['user_id'], params['message']))
+
+    pool.run_transaction(work)
+    progress(1, 1)
+    return {"sent": 1}
+
+
+@job_type("broadcast_notification")
+def _broadcast_notification(pool, params, progress):
+    result = broadcast_notification(
+        pool, params['message'], params['target'], params.get('role'),
+        params.get('route_id'), _as_date(params.get('travel_date')), progress=progress
+    )
+    return {"recipients": result.recipients, "inserted": result.inserted,
+            "seconds": round(result.seconds, 3), "rows_per_sec": round(result.rows_per_sec)}
+
+
+@job_type("cancel_ticket")
+def _cancel_ticket(pool, params, progress):
+    result = cancel_booking(pool, params['ticket_id'])
+    progress(1, 1)
+    return {"result": result['result'] if result else None}
+
+
+@job_type("cancel_route_tickets")
+def _cancel_route_tickets(pool, params, progress):
+    """Cancel every Booked ticket on a route, optionally only for one travel date."""
+    travel_date = _as_date(params.get('travel_date'))
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT Ticket_ID FROM tickets
+            WHERE Route_ID = %s AND Status = 'Booked'
+            AND (%s IS NULL OR Booking_Date = %s)
+        """, (params['route_id'], travel_date, travel_date))
+        ticket_ids = [row[0] for row in cursor.fetchall()]
+
+    cancelled = 0
+    for i, ticket_id in enumerate(ticket_ids, 1):
+        result = cancel_booking(pool, ticket_id)
+        if result and result['result'] == 'SUCCESS':
+            cancelled += 1
+        progress(i, len(ticket_ids))
+    return {"tickets": len(ticket_ids), "cancelled": cancelled}
+
+
+@job_type("archive")
+def _archive(pool, params, progress):
+    """Move tickets and notifications past their retention period to the archive tables."""
+    results = archive_all(pool, _as_date(params.get('today')))
+    progress(1, 1)
+    return {r.table: {"moved": r.moved, "batches": r.batches, "seconds": round(r.seconds, 3)}
+            for r in results}
+
+
+@job_type("reprice_fares")
+def _reprice_fares(pool, params, progress):
+    """Recompute the route_fares matrix, one travel date at a time."""
+    return reprice(MySQLStorage(pool), _as_date(params.get('start')),
+                   params.get('days', PRICING_DAYS), progress=progress)
+
+
+class JobRunner:
+    """Runs submitted jobs on a thread pool and records their state in the jobs table."""
+
+    def __init__(self, pool: ConnectionPool, max_workers: int = 4,
+                 on_finish: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.pool = pool
+        self.on_finish = on_finish
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._running: Set[int] = set()
+        self._stop = threading.Event()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    def submit(self, job_type_name: str, params: Dict[str, Any],
+               created_by: Optional[str] = None) -> int:
+        """Persist a Queued job and schedule it. Returns the Job_ID."""
+        if job_type_name not in JOB_TYPES:
+            raise ValueError(f"Unknown job type {job_type_name!r}")
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO jobs (Job_Type, Params, Created_By)
+                VALUES (%s, %s, %s)
+            """, (job_type_name, json.dumps(params, default=str), created_by))
+            conn.commit()
+            job_id = cursor.lastrowid
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def fail_interrupted(self) -> int:
+        """Mark Running jobs with a stopped heartbeat as Failed. Returns how many there were."""
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs
+                SET Status = 'Failed', Finished_At = CURRENT_TIMESTAMP,
+                    Error = 'Interrupted: the process running the job stopped'
+                WHERE Status = 'Running'
+                AND (Heartbeat_At IS NULL
+                     OR Heartbeat_At < CURRENT_TIMESTAMP - INTERVAL %s SECOND)
+            """, (int(HEARTBEAT_TIMEOUT),))
+            conn.commit()
+            return cursor.rowcount
+
+    def resume_queued(self) -> int:
+        """
+        Schedule Queued jobs left behind by a restart, after failing the
+        interrupted Running ones. Returns how many Queued jobs were found.
+        """
+        self.fail_interrupted()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT Job_ID FROM jobs WHERE Status = 'Queued' ORDER BY Created_At")
+            job_ids = [row[0] for row in cursor.fetchall()]
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+        return len(job_ids)
+
+    def _update(self, job_id: int, sql: str, args: tuple) -> int:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, args + (job_id,))
+            conn.commit()
+            return cursor.rowcount
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                job_ids = tuple(self._running)
+            if not job_ids:
+                continue
+            try:
+                with self.pool.connection() as conn, conn.cursor() as cursor:
+                    cursor.execute(f"""
+                        UPDATE jobs SET Heartbeat_At = CURRENT_TIMESTAMP
+                        WHERE Job_ID IN ({', '.join(['%s'] * len(job_ids))})
+                    """, job_ids)
+                    conn.commit()
+            except Error:
+                # A missed beat is made up by the next one, well within HEARTBEAT_TIMEOUT
+                pass
+
+    def _run(self, job_id: int) -> None:
+        # Claim the job; another process may already have picked it up
+        claimed = self._update(job_id, """
+            UPDATE jobs SET Status = 'Running', Started_At = CURRENT_TIMESTAMP,
+                            Heartbeat_At = CURRENT_TIMESTAMP
+            WHERE Job_ID = %s AND Status = 'Queued'
+        """, ())
+        if not claimed:
+            return
+
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT Job_Type, Params FROM jobs WHERE Job_ID = %s", (job_id,))
+            job_type_name, raw_params = cursor.fetchone()
+        params = json.loads(raw_params) if raw_params else {}
+
+        last_write = [0.0]
+        lock = threading.Lock()
+
+        def progress(done: int, total: int) -> None:
+            # A total of 0 means the job cannot know its size up front
+            with lock:
+                now = time.monotonic()
+                finished = total and done >= total
+                if not finished and now - last_write[0] < PROGRESS_INTERVAL:
+                    return
+                last_write[0] = now
+            self._update(job_id, """
+                UPDATE jobs SET Progress_Done = %s, Progress_Total = %s
+                WHERE Job_ID = %s
+            """, (done, total or None))
+
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            result = JOB_TYPES[job_type_name](self.pool, params, progress)
+            self._update(job_id, """
+                UPDATE jobs SET Status = 'Done', Result = %s, Finished_At = CURRENT_TIMESTAMP
+                WHERE Job_ID = %s
+            """, (json.dumps(result, default=str),))
+        except Exception as e:
+            # Any failure is recorded on the job rather than lost in the thread
+            try:
+                self._update(job_id, """
+                    UPDATE jobs SET Status = 'Failed', Error = %s, Finished_At = CURRENT_TIMESTAMP
+                    WHERE Job_ID = %s
+                """, (f"{type(e).__name__}: {e}",))
+            except Error:
+                pass
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            if self.on_finish:
+                self.on_finish(job_type_name, params)
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+
+def list_jobs(pool: ConnectionPool, limit: int = 50) -> List[Dict[str, Any]]:
+    """Return the most recent jobs, newest first."""
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT Job_ID, Job_Type, Status, Progress_Done, Progress_Total,
+                   Result, Error, Created_By, Created_At, Started_At, Finished_At
+            FROM jobs
+            ORDER BY Job_ID DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
@@ -0,0 +1,107 @@
+"""
+Load test for the HTTP booking API.
+
+Runs a fixed number of concurrent clients against a running api.py for a
+set duration. Each request is a route listing, an availability lookup, or
+(with probability --book-ratio) a one-seat booking with a fresh
+idempotency key, and latency is reported per endpoint.
+
+    python loadtest_api.py --url http://localhost:8080 --clients 50 --seconds 30
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List
+
+import aiohttp
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def client(session: aiohttp.ClientSession, url: str, route_ids: List[int],
+                 args: argparse.Namespace, deadline: float,
+                 latencies: Dict[str, List[float]], statuses: Dict[int, int]) -> None:
+    while time.monotonic() < deadline:
+        travel_date = date.today() + timedelta(days=random.randrange(args.days))
+        roll = random.random()
+        if roll < args.book_ratio:
+            name = "POST /bookings"
+            request = session.post(f"{url}/bookings", json={
+                "route_id": random.choice(route_ids),
+                "passenger_name": "Load Test",
+                "passenger_email": "loadtest@example.com",
+                "passenger_phone": "0000000000",
+                "travel_date": travel_date.isoformat(),
+                "seats": 1,
+            }, headers={"Idempotency-Key": uuid.uuid4().hex})
+        elif roll < args.book_ratio + (1 - args.book_ratio) / 2:
+            name = "GET /availability"
+            request = session.get(f"{url}/availability", params={"date": travel_date.isoformat()})
+        else:
+            name = "GET /routes"
+            request = session.get(f"{url}/routes")
+
+        start = time.perf_counter()
+        async with request as response:
+            await response.read()
+        latencies[name].append(time.perf_counter() - start)
+        statuses[response.status] += 1
+
+
+async def run(args: argparse.Namespace) -> int:
+    url = args.url.rstrip("/")
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        async with session.get(f"{url}/routes") as response:
+            response.raise_for_status()
+            route_ids = [r['Route_ID'] for r in await response.json()]
+        if not route_ids:
+            print("The API has no routes to book", file=sys.stderr)
+            return 1
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        statuses: Dict[int, int] = defaultdict(int)
+        start = time.perf_counter()
+        deadline = time.monotonic() + args.seconds
+        await asyncio.gather(*(
+            client(session, url, route_ids, args, deadline, latencies, statuses)
+            for _ in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - start
+
+    everything = [s for samples in latencies.values() for s in samples]
+    print(f"{len(everything)} requests in {elapsed:.1f}s "
+          f"({len(everything) / elapsed:.0f} req/sec) with {args.clients} clients")
+    print(f"{'endpoint':<20} {'count':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, samples in sorted(latencies.items()) + [("all", everything)]:
+        print(f"{name:<20} {len(samples):>8} {1000 * percentile(samples, 50):>8.1f} "
+              f"{1000 * percentile(samples, 99):>8.1f}")
+    print("status codes:", dict(sorted(statuses.items())))
+    return 1 if any(code >= 500 for code in statuses) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the booking HTTP API.")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--api-key")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--book-ratio", type=float, default=0.2,
+                        help="share of requests that are bookings")
+    parser.add_argument("--days", type=int, default=7, help="spread travel dates over this many days")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+"""
+Notification delivery from the transactional outbox.
+
+Every notification insert also writes a notification_outbox row in the same
+transaction (see trg_notification_outbox in d.sql), so a notification is
+queued for delivery exactly when it commits, and the portal never waits on
+a mail server. Workers, as many as needed and in any number of processes,
+deliver the queue:
+
+    python outbox.py run                # until interrupted
+    python outbox.py stats              # queue depth per channel and status
+    python outbox.py requeue            # retry the dead letters
+
+A worker claims a batch of due rows with SELECT ... FOR UPDATE SKIP LOCKED,
+so workers never wait on each other, and leases them by pushing
+Next_Attempt_At past the send timeout before committing the claim. The batch
+is then sent concurrently on an asyncio loop through the row's channel, and
+the outcomes are written back in one transaction: Sent, retried after an
+exponential backoff, or Dead once the attempts run out. Delivery is at least
+once: a worker that dies mid-batch leaves its rows to be claimed again when
+the lease ends.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import smtplib
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from db import ConnectionPool, create_pool
+
+logger = logging.getLogger("bus.outbox")
+
+# Rows claimed per batch
+OUTBOX_BATCH_SIZE = int(os.environ.get("BUS_OUTBOX_BATCH_SIZE", "100"))
+# Attempts before a delivery is dead-lettered
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("BUS_OUTBOX_MAX_ATTEMPTS", "6"))
+# Where the file channel writes when no SMTP server is configured
+OUTBOX_DIR = os.environ.get("BUS_OUTBOX_DIR", "outbox")
+
+# Retry delays double from RETRY_BASE seconds up to RETRY_MAX, with jitter
+RETRY_BASE = 5.0
+RETRY_MAX = 3600.0
+
+# Seconds an idle worker waits before looking for due rows again
+POLL_INTERVAL = 1.0
+
+# Seconds of sends the per-channel throughput is measured over
+METRICS_WINDOW = 60.0
+
+
+class PermanentDeliveryError(Exception):
+    """A delivery that can never succeed, e.g. a rejected address; it is dead-lettered at once."""
+
+
+@dataclass
+class Delivery:
+    """One claimed outbox row with the notification it delivers."""
+    Outbox_ID: int
+    Notification_ID: int
+    Channel: str
+    Recipient: str
+    Attempts: int
+    Message: str
+    Created_At: datetime
+
+
+class Channel:
+    """
+    A way to deliver notifications. send() returns once the delivery is
+    accepted and raises to fail the attempt; at most concurrency sends of a
+    channel run at once, each cut off after timeout seconds.
+    """
+    concurrency = 10
+    timeout = 30.0
+
+    async def send(self, delivery: Delivery) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class FileChannel(Channel):
+    """
+    Stand-in for a real channel in development and tests: appends each
+    delivery as a JSON line to <directory>/<name>.jsonl. fail_rate makes that
+    share of attempts fail, to exercise retries and dead-lettering.
+    """
+
+    def __init__(self, directory: str = OUTBOX_DIR, name: str = "email",
+                 fail_rate: float = 0.0):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self.fail_rate = fail_rate
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    async def send(self, delivery: Delivery) -> None:
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError("Simulated delivery failure")
+        self._file.write(json.dumps({"Outbox_ID": delivery.Outbox_ID,
+                                     "To": delivery.Recipient,
+                                     "Message": delivery.Message,
+                                     "Sent_At": datetime.now().isoformat()}) + "\n")
+        self._file.flush()
+
+    async def close(self) -> None:
+        self._file.close()
+
+
+class SmtpChannel(Channel):
+    """
+    Email through an SMTP server, e.g. a local sink for testing:
+    python -m aiosmtpd -n -l localhost:1025. smtplib blocks, so each send
+    runs on a thread, on one connection per send.
+    """
+    concurrency = 5
+
+    def __init__(self, host: str, port: int = 25, sender: str = "noreply@bus.local",
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+
+    def _send(self, delivery: Delivery) -> None:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = delivery.Recipient
+        message["Subject"] = "Bus Management System notification"
+        message.set_content(delivery.Message)
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or "")
+                smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(f"Recipient refused: {e.recipients}") from e
+
+    async def send(self, delivery: Delivery) -> None:
+        await asyncio.to_thread(self._send, delivery)
+
+
+def channels_from_env() -> Dict[str, Channel]:
+    """The channels named in the outbox: email over SMTP when BUS_SMTP_HOST is set, else to a file."""
+    host = os.environ.get("BUS_SMTP_HOST")
+    if host:
+        email: Channel = SmtpChannel(host, int(os.environ.get("BUS_SMTP_PORT", "25")),
+                                     os.environ.get("BUS_SMTP_SENDER", "noreply@bus.local"),
+                                     os.environ.get("BUS_SMTP_USER"),
+                                     os.environ.get("BUS_SMTP_PASSWORD"),
+                                     os.environ.get("BUS_SMTP_STARTTLS", "0") == "1")
+    else:
+        email = FileChannel(OUTBOX_DIR, "email")
+    return {"email": email}
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt of a delivery that has failed attempts times."""
+    return min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def _placeholders(values: Sequence[Any]) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def claim(pool: ConnectionPool, channels: Sequence[str], batch_size: int,
+          lease: float) -> List[Delivery]:
+    """
+    Claim up to batch_size due deliveries on the given channels, oldest due
+    first, skipping rows other workers hold. Each claimed row counts an
+    attempt and is not due again for lease seconds.
+    """
+    def work(conn) -> List[Delivery]:
+        with conn.cursor(dictionary=True) as cursor:
+            cursor.execute(f"""
+                SELECT Outbox_ID FROM notification_outbox
+                WHERE Status = 'Pending' AND Next_Attempt_At <= CURRENT_TIMESTAMP
+                AND Channel IN ({_placeholders(channels)})
+                ORDER BY Next_Attempt_At, Outbox_ID
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (*channels, batch_size))
+            ids = [row['Outbox_ID'] for row in cursor.fetchall()]
+            if not ids:
+                return []
+            cursor.execute(f"""
+                UPDATE notification_outbox
+                SET Attempts = Attempts + 1,
+                    Next_Attempt_At = CURRENT_TIMESTAMP + INTERVAL %s SECOND
+                WHERE Outbox_ID IN ({_placeholders(ids)})
+            """, (int(lease), *ids))
+            cursor.execute(f"""
+                SELECT o.Outbox_ID, o.Notification_ID, o.Channel, o.Recipient, o.Attempts,
+                       n.Message, n.Created_At
+                FROM notification_outbox o
+                JOIN notifications n ON n.Notification_ID = o.Notification_ID
+                WHERE o.Outbox_ID IN ({_placeholders(ids)})
+                ORDER BY o.Outbox_ID
+            """, tuple(ids))
+            return [Delivery(**row) for row in cursor.fetchall()]
+
+    return pool.run_transaction(work)
+
+
+def complete(pool: ConnectionPool, outcomes: Sequence[Tuple[Delivery, Optional[str], bool]],
+             max_attempts: int = OUTBOX_MAX_ATTEMPTS) -> None:
+    """
+    Record the outcome of each (delivery, error, permanent) of a batch.
+    Rows are only updated while still on the attempt that was claimed, so a
+    worker whose lease ran out cannot overwrite a newer attempt.
+    """
+    sent, retry, dead = [], [], []
+    for delivery, error, permanent in outcomes:
+        key = (delivery.Outbox_ID, delivery.Attempts)
+        if error is None:
+            sent.append(key)
+        elif permanent or delivery.Attempts >= max_attempts:
+            dead.append((error[:500], *key))
+        else:
+            retry.append((int(retry_delay(delivery.Attempts)), error[:500], *key))
+
+    def work(conn):
+        with conn.cursor() as cursor:
+            if sent:
+                cursor.executemany("""
+                    UPDATE notification_outbox
+                    SET Status = 'Sent', Sent_At = CURRENT_TIMESTAMP, Last_Error = NULL
+                    WHERE Outbox_ID = %s AND Attempts = %s AND Status = 'Pending'
+                """, sent)
+            if retry:
+                cursor.executemany("""
+                    UPDATE notification_outbox
+                    SET Next_Attempt_At = CURRENT_TIMESTAMP + INTERVAL %s SECOND, Last_Error = %s
+                    WHERE Outbox_ID = %s AND Attempts = %s AND Status = 'Pending'
+                """, retry)
+            if dead:
+                cursor.executemany("""
+                    UPDATE notification_outbox
+                    SET Status = 'Dead', Last_Error = %s
+                    WHERE Outbox_ID = %s AND Attempts = %s AND Status = 'Pending'
+                """, dead)
+
+    pool.run_transaction(work)
+
+
+class ChannelMetrics:
+    """Delivery counters and recent send latencies for one channel."""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self._sent_at: Deque[float] = deque()
+        self._latencies: Deque[float] = deque(maxlen=2000)
+
+    def observe(self, seconds: float, error: Optional[str], dead: bool) -> None:
+        self._latencies.append(seconds)
+        if error is None:
+            self.sent += 1
+            now = time.monotonic()
+            self._sent_at.append(now)
+            while self._sent_at and now - self._sent_at[0] > METRICS_WINDOW:
+                self._sent_at.popleft()
+        else:
+            self.failed += 1
+            self.dead += dead
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        now = time.monotonic()
+        recent = sum(1 for at in self._sent_at if now - at <= METRICS_WINDOW)
+
+        def ms(q: float) -> Optional[float]:
+            return round(1000 * latencies[int(q * (len(latencies) - 1))], 2) if latencies else None
+
+        return {"sent": self.sent, "failed": self.failed, "dead": self.dead,
+                "sent_per_sec": round(recent / METRICS_WINDOW, 2),
+                "p50_ms": ms(0.5), "p99_ms": ms(0.99)}
+
+
+class OutboxWorker:
+    """Claims, sends and settles outbox batches until stopped."""
+
+    def __init__(self, pool: ConnectionPool, channels: Dict[str, Channel],
+                 batch_size: int = OUTBOX_BATCH_SIZE, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.pool = pool
+        self.channels = channels
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        # A claim outlives the slowest possible send before the row is due again
+        self.lease = max(c.timeout for c in channels.values()) + 30
+        self.metrics = {name: ChannelMetrics() for name in channels}
+        self._limits = {name: asyncio.Semaphore(c.concurrency) for name, c in channels.items()}
+
+    async def _send(self, delivery: Delivery) -> Tuple[Delivery, Optional[str], bool]:
+        channel = self.channels[delivery.Channel]
+        error, permanent = None, False
+        async with self._limits[delivery.Channel]:
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(channel.send(delivery), channel.timeout)
+            except PermanentDeliveryError as e:
+                error, permanent = str(e), True
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+        dead = error is not None and (permanent or delivery.Attempts >= self.max_attempts)
+        self.metrics[delivery.Channel].observe(elapsed, error, dead)
+        return delivery, error, permanent
+
+    async def run_once(self) -> int:
+        """Deliver one batch. Returns the number of deliveries claimed."""
+        deliveries = await asyncio.to_thread(claim, self.pool, list(self.channels),
+                                             self.batch_size, self.lease)
+        if deliveries:
+            outcomes = await asyncio.gather(*(self._send(d) for d in deliveries))
+            await asyncio.to_thread(complete, self.pool, outcomes, self.max_attempts)
+        return len(deliveries)
+
+    async def run(self, stop: asyncio.Event, report_every: float = 0.0) -> None:
+        """Deliver batches until stop is set, finishing the batch in flight."""
+        last_report = time.monotonic()
+        while not stop.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("Outbox batch failed")
+                claimed = 0
+            if report_every and time.monotonic() - last_report >= report_every:
+                logger.info("Outbox deliveries: %s", json.dumps(self.stats()))
+                last_report = time.monotonic()
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        for channel in self.channels.values():
+            await channel.close()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metrics.stats() for name, metrics in self.metrics.items()}
+
+
+def outbox_stats(pool: ConnectionPool) -> List[Dict[str, Any]]:
+    """Queue depth per channel and status, with the oldest row of each."""
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT Channel, Status, COUNT(*) as Total, MIN(Created_At) as Oldest_Created_At
+            FROM notification_outbox
+            GROUP BY Channel, Status
+            ORDER BY Channel, Status
+        """)
+        return cursor.fetchall()
+
+
+def dead_letters(pool: ConnectionPool, limit: int = 50) -> List[Dict[str, Any]]:
+    """The most recently dead-lettered deliveries."""
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT Outbox_ID, Notification_ID, Channel, Recipient, Attempts, Last_Error,
+                   Created_At, Next_Attempt_At
+            FROM notification_outbox
+            WHERE Status = 'Dead'
+            ORDER BY Next_Attempt_At DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
+
+
+def requeue_dead(pool: ConnectionPool, outbox_ids: Optional[Sequence[int]] = None) -> int:
+    """Give dead deliveries (all, or the given ones) a fresh set of attempts. Returns the count."""
+    def work(conn) -> int:
+        with conn.cursor() as cursor:
+            only = f"AND Outbox_ID IN ({_placeholders(outbox_ids)})" if outbox_ids else ""
+            cursor.execute(f"""
+                UPDATE notification_outbox
+                SET Status = 'Pending', Attempts = 0, Next_Attempt_At = CURRENT_TIMESTAMP
+                WHERE Status = 'Dead' {only}
+            """, tuple(outbox_ids or ()))
+            return cursor.rowcount
+
+    return pool.run_transaction(work)
+
+
+async def _run_worker(args) -> None:
+    worker = OutboxWorker(create_pool(), channels_from_env(), args.batch_size, args.max_attempts)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    if args.once:
+        await worker.run_once()
+    else:
+        await worker.run(stop, args.report)
+    print(json.dumps(worker.stats(), indent=2))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Deliver queued notifications.")
+    parser.add_argument("command", choices=["run", "stats", "requeue"])
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--max-attempts", type=int, default=OUTBOX_MAX_ATTEMPTS)
+    parser.add_argument("--report", type=float, default=10.0,
+                        help="seconds between per-channel throughput log lines")
+    parser.add_argument("--once", action="store_true", help="deliver a single batch and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    if args.command == "run":
+        asyncio.run(_run_worker(args))
+    elif args.command == "stats":
+        for row in outbox_stats(create_pool()):
+            print(f"{row['Channel']:<10} {row['Status']:<8} {row['Total']:>9}  "
+                  f"oldest {row['Oldest_Created_At']}")
+    else:
+        print(f"Requeued {requeue_dead(create_pool())} dead deliveries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Demand-based fares.
+
+A route's base Fare is adjusted for how far ahead the trip is, whether it
+runs at the weekend, how full the bus already is and how many seats are
+booked at once. Fares for every route and upcoming date are computed in one
+vectorized NumPy pass and stored in route_fares, one row per route, travel
+date and occupancy tier. BookTicket and HoldSeats charge the row for the
+trip's occupancy at booking time, and FareQuotes answers the booking form
+from a cached copy of the same rows, so the quoted fare is the charged fare.
+Dates that have not been priced cost the base fare.
+
+    python pricing.py reprice --days 90     # e.g. nightly, as days-to-departure shifts
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fares import quote_fare
+from storage import Storage, create_storage
+
+# How many days ahead are priced
+PRICING_DAYS = int(os.environ.get("BUS_PRICING_DAYS", "90"))
+
+
+@dataclass(frozen=True)
+class PricingRules:
+    """
+    Multipliers on the base fare. Tiers are (threshold, multiplier) pairs in
+    ascending threshold order; the last tier whose threshold is reached applies.
+    """
+    # (share of seats already taken, multiplier)
+    occupancy_tiers: Tuple[Tuple[float, float], ...] = (
+        (0.0, 0.9), (0.5, 1.0), (0.75, 1.15), (0.9, 1.3))
+    # (days before departure, multiplier)
+    advance_tiers: Tuple[Tuple[int, float], ...] = (
+        (0, 1.25), (3, 1.1), (7, 1.0), (30, 0.9))
+    weekend_days: Tuple[int, ...] = (5, 6)
+    weekend_multiplier: float = 1.1
+    group_min_seats: int = 4
+    group_discount: float = 0.1
+    # Bounds on the final fare, relative to the base fare
+    floor: float = 0.7
+    ceiling: float = 1.6
+
+
+DEFAULT_RULES = PricingRules()
+
+
+def date_factors(travel_dates: np.ndarray, today: date,
+                 rules: PricingRules = DEFAULT_RULES) -> np.ndarray:
+    """Combined days-to-departure and weekend multiplier for each datetime64[D] date."""
+    days_out = (travel_dates - np.datetime64(today, "D")).astype(np.int64)
+    thresholds = np.array([t for t, _ in rules.advance_tiers])
+    multipliers = np.array([m for _, m in rules.advance_tiers])
+    advance = multipliers[np.clip(np.searchsorted(thresholds, days_out, side="right") - 1, 0, None)]
+    # 1970-01-01 was a Thursday; Monday is 0
+    weekday = (travel_dates.astype(np.int64) + 3) % 7
+    weekend = np.where(np.isin(weekday, rules.weekend_days), rules.weekend_multiplier, 1.0)
+    return advance * weekend
+
+
+def fare_matrix(base_fares: np.ndarray, travel_dates: np.ndarray, today: date,
+                rules: PricingRules = DEFAULT_RULES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-seat fares and group fares for every route, date and occupancy tier,
+    each an array of shape (routes, dates, tiers), rounded to paise.
+    """
+    base = base_fares.astype(float)[:, None, None]
+    tiers = np.array([m for _, m in rules.occupancy_tiers])
+    fares = base * date_factors(travel_dates, today, rules)[None, :, None] * tiers[None, None, :]
+    fares = np.clip(fares, base * rules.floor, base * rules.ceiling)
+    return np.round(fares, 2), np.round(fares * (1 - rules.group_discount), 2)
+
+
+def fare_rows(route_ids: np.ndarray, fares: np.ndarray, group_fares: np.ndarray,
+              day: int, rules: PricingRules = DEFAULT_RULES) -> List[tuple]:
+    """route_fares rows (Route_ID, Min_Load, Fare, Group_Fare, Group_Min_Seats) for one date."""
+    tier_count = len(rules.occupancy_tiers)
+    loads = [t for t, _ in rules.occupancy_tiers]
+    return list(zip(np.repeat(route_ids, tier_count).tolist(),
+                    loads * len(route_ids),
+                    fares[:, day, :].ravel().tolist(),
+                    group_fares[:, day, :].ravel().tolist(),
+                    [rules.group_min_seats] * (len(route_ids) * tier_count)))
+
+
+def reprice(storage: Storage, start: Optional[date] = None, days: int = PRICING_DAYS,
+            rules: PricingRules = DEFAULT_RULES,
+            progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Recompute the fare matrix for every route from start (today by default)
+    for the given number of days. Each date is replaced in its own
+    transaction, so bookings never see a partly written date. Fares of dates
+    already past are deleted, so route_fares only holds bookable dates.
+    """
+    start = start or date.today()
+    began = time.perf_counter()
+    routes = storage.list_routes()
+    route_ids = np.array([r['Route_ID'] for r in routes], dtype=np.int64)
+    base_fares = np.array([float(r['Fare']) for r in routes])
+    travel_dates = np.datetime64(start, "D") + np.arange(days)
+    fares, group_fares = fare_matrix(base_fares, travel_dates, date.today(), rules)
+    computed = time.perf_counter() - began
+
+    for day in range(days):
+        storage.save_fares(start + timedelta(days=day),
+                           fare_rows(route_ids, fares, group_fares, day, rules))
+        if progress:
+            progress(day + 1, days)
+    deleted = storage.delete_fares_before(date.today())
+    return {"routes": len(routes), "days": days, "rows": int(fares.size), "deleted": deleted,
+            "compute_seconds": round(computed, 3),
+            "seconds": round(time.perf_counter() - began, 3)}
+
+
+class FareQuotes:
+    """
+    Quotes for the booking form from the fare matrix, cached per travel date
+    for ttl seconds and dropped when the matrix is repriced. A quote is a
+    dict lookup and a scan of the few occupancy tiers.
+    """
+
+    def __init__(self, storage: Storage, ttl: float = 300.0):
+        self.storage = storage
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tiers: Dict[date, Tuple[float, Dict[int, List[Dict[str, Any]]]]] = {}
+        self._counters = {"hits": 0, "misses": 0}
+        # Bumped by invalidate(), so rows loaded before a reprice are not cached
+        self._generation = 0
+
+    def _date_tiers(self, travel_date: date) -> Dict[int, List[Dict[str, Any]]]:
+        with self._lock:
+            cached = self._tiers.get(travel_date)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                self._counters["hits"] += 1
+                return cached[1]
+            self._counters["misses"] += 1
+            generation = self._generation
+        # Loaded outside the lock, so a cold date does not hold up other quotes
+        tiers: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for row in self.storage.fares(travel_date):
+            tiers[row['Route_ID']].append(row)
+        with self._lock:
+            if generation == self._generation:
+                self._tiers[travel_date] = (time.monotonic(), tiers)
+        return tiers
+
+    def quote(self, route: Dict[str, Any], travel_date: date, num_seats: int,
+              available_seats: int) -> float:
+        """Per-seat fare for booking num_seats on a route with available_seats left."""
+        capacity = route['Seat_Capacity']
+        return quote_fare(self._date_tiers(travel_date).get(route['Route_ID'], []),
+                          route['Fare'], capacity, capacity - available_seats, num_seats)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._tiers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, cached_dates=len(self._tiers))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the route_fares matrix.")
+    parser.add_argument("command", choices=["reprice"])
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=None)
+    parser.add_argument("--days", type=int, default=PRICING_DAYS)
+    args = parser.parse_args(argv)
+
+    storage = create_storage()
+    result = reprice(storage, args.start, args.days)
+    storage.close()
+    print(f"Priced {result['routes']} routes x {result['days']} days ({result['rows']} fares): "
+          f"computed in {result['compute_seconds']}s, saved in {result['seconds']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,447 @@
+"""
+Query instrumentation for the connection pool.
+
+When a pool has a QueryProfiler, every connection it hands out is wrapped so
+that each execute(), executemany() and callproc() is timed together with the
+rows fetched from it, and attributed to a normalized statement and to the
+function that issued it. Connection wait time is recorded per caller as well.
+
+Latencies go into fixed log-scale histograms: cumulative ones for the
+Prometheus export and a rolling window of recent intervals for percentiles.
+Statements slower than the threshold are logged, with their EXPLAIN plan for
+SELECTs, which is fetched on a background thread off the request path.
+"""
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("bus.slow_query")
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Rolling percentiles cover WINDOW_INTERVALS intervals of INTERVAL seconds
+INTERVAL = 60.0
+WINDOW_INTERVALS = 5
+
+SLOW_LOG_SIZE = 100
+MAX_FINGERPRINTS = 2000
+
+# Modules whose frames are skipped when looking for the calling function
+_INTERNAL_MODULES = {__name__, "db", "contextlib"}
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+_VALUES_LISTS = re.compile(r"(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+", re.I)
+_SPACE = re.compile(r"\s+")
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                return
+
+    def merge(self, other: "_Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-th quantile by interpolating within its bucket."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(BUCKETS, self.counts):
+            if count and seen + count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+
+class _StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.max_seconds = 0.0
+        self.histogram = _Histogram()
+        # (interval number, histogram) for the rolling window
+        self.recent: Deque[Tuple[int, _Histogram]] = deque(maxlen=WINDOW_INTERVALS)
+
+    def observe(self, seconds: float, rows: int, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.rows += rows
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.histogram.observe(seconds)
+        interval = int(time.monotonic() // INTERVAL)
+        if not self.recent or self.recent[-1][0] != interval:
+            self.recent.append((interval, _Histogram()))
+        self.recent[-1][1].observe(seconds)
+
+    def window(self) -> _Histogram:
+        oldest = int(time.monotonic() // INTERVAL) - WINDOW_INTERVALS
+        merged = _Histogram()
+        for interval, histogram in self.recent:
+            if interval > oldest:
+                merged.merge(histogram)
+        return merged
+
+
+class _CallerStats:
+    __slots__ = ("calls", "seconds", "rows", "checkouts", "wait")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.checkouts = 0
+        self.wait = 0.0
+
+
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so that calls differing only in values group together."""
+    text = _SPACE.sub(" ", _LITERALS.sub("?", sql)).strip()
+    text = _IN_LISTS.sub("(?)", text.replace("%s", "?"))
+    return _VALUES_LISTS.sub(r"\1", text)
+
+
+def calling_function() -> str:
+    """module.function of the nearest frame outside the database plumbing."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module not in _INTERNAL_MODULES and frame.f_code.co_name != "<lambda>":
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class QueryProfiler:
+    """Collects per-statement and per-caller timings for one connection pool."""
+
+    def __init__(self, pool, slow_query_ms: float = 200.0):
+        self.pool = pool
+        self.slow_seconds = slow_query_ms / 1000
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._statements: Dict[str, _StatementStats] = {}
+        self._callers: Dict[str, _CallerStats] = {}
+        self._fingerprints: "OrderedDict[str, str]" = OrderedDict()
+        self.slow_log: Deque[Dict[str, Any]] = deque(maxlen=SLOW_LOG_SIZE)
+        self._explain_queue: "queue.Queue" = queue.Queue(maxsize=20)
+        threading.Thread(target=self._explain_worker, name="explain", daemon=True).start()
+
+    def _fingerprint(self, sql: str) -> str:
+        with self._lock:
+            key = self._fingerprints.get(sql)
+            if key is not None:
+                self._fingerprints.move_to_end(sql)
+                return key
+        key = fingerprint(sql)
+        with self._lock:
+            self._fingerprints[sql] = key
+            if len(self._fingerprints) > MAX_FINGERPRINTS:
+                self._fingerprints.popitem(last=False)
+        return key
+
+    def record_wait(self, caller: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._callers.get(caller) or self._callers.setdefault(caller, _CallerStats())
+            stats.checkouts += 1
+            stats.wait += seconds
+
+    def record(self, statement: str, caller: str, seconds: float, rows: int,
+               failed: bool, sql: Optional[str] = None, params: Any = None) -> None:
+        with self._lock:
+            stats = self._statements.get(statement) or self._statements.setdefault(statement, _StatementStats())
+            stats.observe(seconds, rows, failed)
+            caller_stats = self._callers.get(caller) or self._callers.setdefault(caller, _CallerStats())
+            caller_stats.calls += 1
+            caller_stats.seconds += seconds
+            caller_stats.rows += rows
+        if seconds >= self.slow_seconds:
+            entry = {"at": time.strftime("%Y-%m-%d %H:%M:%S"), "statement": statement,
+                     "caller": caller, "ms": round(1000 * seconds, 1), "rows": rows,
+                     "plan": None}
+            self.slow_log.append(entry)
+            logger.warning("slow query %.1f ms in %s: %s", 1000 * seconds, caller, statement)
+            if sql and sql.lstrip()[:6].upper() == "SELECT":
+                try:
+                    self._explain_queue.put_nowait((entry, sql, params))
+                except queue.Full:
+                    pass
+
+    def _explain_worker(self) -> None:
+        while True:
+            entry, sql, params = self._explain_queue.get()
+            try:
+                with self.pool.connection(instrument=False) as conn, conn.cursor(dictionary=True) as cursor:
+                    cursor.execute("EXPLAIN " + sql, params)
+                    entry["plan"] = cursor.fetchall()
+                logger.warning("plan for %s: %s", entry["statement"], entry["plan"])
+            except Exception as e:
+                # Keep the worker alive whatever went wrong with one plan
+                entry["plan"] = [{"error": str(e)}]
+
+    def statements(self) -> List[Dict[str, Any]]:
+        """Per-statement totals and rolling-window percentiles, slowest in total first."""
+        with self._lock:
+            rows = []
+            for statement, s in self._statements.items():
+                window = s.window()
+                rows.append({
+                    "statement": statement,
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "total_ms": round(1000 * s.seconds, 1),
+                    "avg_ms": round(1000 * s.seconds / s.calls, 2),
+                    "p50_ms": _ms(window.quantile(0.5)),
+                    "p95_ms": _ms(window.quantile(0.95)),
+                    "p99_ms": _ms(window.quantile(0.99)),
+                    "max_ms": round(1000 * s.max_seconds, 1),
+                    "rows_per_call": round(s.rows / s.calls, 1),
+                })
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def callers(self) -> List[Dict[str, Any]]:
+        """Per-function totals, including time spent waiting for a connection."""
+        with self._lock:
+            rows = [{
+                "caller": caller,
+                "statements": c.calls,
+                "total_ms": round(1000 * c.seconds, 1),
+                "rows": c.rows,
+                "checkouts": c.checkouts,
+                "avg_wait_ms": round(1000 * c.wait / c.checkouts, 3) if c.checkouts else 0.0,
+            } for caller, c in self._callers.items()]
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self._callers.clear()
+            self.slow_log.clear()
+            self.started_at = time.time()
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP bus_db_query_seconds Database statement latency.",
+            "# TYPE bus_db_query_seconds histogram",
+        ]
+        with self._lock:
+            statements = [(k, s.histogram.counts[:], s.seconds, s.calls, s.errors, s.rows)
+                          for k, s in self._statements.items()]
+            callers = [(k, c.calls, c.seconds, c.wait) for k, c in self._callers.items()]
+        for statement, counts, seconds, calls, _, _ in statements:
+            label = f'statement="{_escape(statement)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'bus_db_query_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"bus_db_query_seconds_sum{{{label}}} {seconds}")
+            lines.append(f"bus_db_query_seconds_count{{{label}}} {calls}")
+        for name, help_text, index in (("bus_db_query_errors_total", "Failed statements.", 4),
+                                       ("bus_db_query_rows_total", "Rows fetched.", 5)):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{statement="{_escape(s[0])}"}} {s[index]}' for s in statements]
+        for name, help_text, index in (
+            ("bus_db_caller_statements_total", "Statements run per calling function.", 1),
+            ("bus_db_caller_seconds_total", "Statement time per calling function.", 2),
+            ("bus_db_caller_wait_seconds_total", "Connection wait per calling function.", 3),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{caller="{_escape(c[0])}"}} {c[index]}' for c in callers]
+        lines += ["# HELP bus_db_pool Connection pool state and counters.", "# TYPE bus_db_pool gauge"]
+        for key, value in self.pool.stats().items():
+            lines.append(f'bus_db_pool{{metric="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(1000 * seconds, 1)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times statements and counts the rows fetched from them."""
+
+    def __init__(self, cursor, profiler: QueryProfiler, caller: str):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._caller = caller
+        self._pending: Optional[list] = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._add_rows(1)
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _flush(self) -> None:
+        if self._pending:
+            statement, seconds, rows, sql, params = self._pending
+            self._pending = None
+            self._profiler.record(statement, self._caller, seconds, rows, False, sql, params)
+
+    def _run(self, statement: str, sql: Optional[str], params, method, *args):
+        self._flush()
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        except Exception:
+            self._profiler.record(statement, self._caller, time.perf_counter() - start, 0, True)
+            raise
+        elapsed = time.perf_counter() - start
+        rowcount = self._cursor.rowcount if self._cursor.description is None else 0
+        # Kept open until the next statement so that fetch time and rows count too
+        self._pending = [statement, elapsed, max(rowcount, 0), sql, params]
+        return result
+
+    def _add_rows(self, rows: int, seconds: float = 0.0) -> None:
+        if self._pending:
+            self._pending[1] += seconds
+            self._pending[2] += rows
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self._add_rows(len(result), time.perf_counter() - start)
+        return result
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._run(self._profiler._fingerprint(operation), operation, params,
+                         lambda: self._cursor.execute(operation, params, *args, **kwargs))
+
+    def executemany(self, operation, seq_params):
+        return self._run(self._profiler._fingerprint(operation), None, None,
+                         lambda: self._cursor.executemany(operation, seq_params))
+
+    def callproc(self, procname, args=()):
+        return self._run(f"CALL {procname}", None, None,
+                         lambda: self._cursor.callproc(procname, args))
+
+    def stored_results(self):
+        for result in self._cursor.stored_results():
+            start = time.perf_counter()
+            rows = result.fetchall()
+            self._add_rows(len(rows), time.perf_counter() - start)
+            yield _BufferedResult(rows)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._add_rows(row is not None, time.perf_counter() - start)
+        return row
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def close(self):
+        self._flush()
+        return self._cursor.close()
+
+
+class _BufferedResult:
+    """A stored procedure result set that has already been fetched."""
+
+    def __init__(self, rows: list):
+        self._rows = rows
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class InstrumentedConnection:
+    """Connection wrapper whose cursors are instrumented."""
+
+    def __init__(self, conn, profiler: QueryProfiler, caller: str):
+        self._conn = conn
+        self._profiler = profiler
+        self._caller = caller
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._profiler, self._caller)
+
+    def commit(self):
+        start = time.perf_counter()
+        self._conn.commit()
+        self._profiler.record("COMMIT", self._caller, time.perf_counter() - start, 0, False)
+
+
+def start_metrics_server(profiler: QueryProfiler, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve profiler.prometheus() at /metrics on a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = profiler.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
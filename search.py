@@ -0,0 +1,160 @@
+"""Route search: city matching, indexed source/destination lookup and a connecting-route planner."""
+import difflib
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from db import ConnectionPool
+
+SORT_KEYS = ("fare", "duration")
+
+
+def normalize_city(name: str) -> str:
+    return " ".join(name.split()).lower()
+
+
+def _cost(route: Dict[str, Any], sort_by: str) -> float:
+    if sort_by == "fare":
+        return float(route['Fare'])
+    hours = route.get('Duration_Hours')
+    return float(hours) if hours is not None else math.inf
+
+
+def _ranking(sort_by: str):
+    """Sort key ranking journeys by total fare or duration, the other breaking ties."""
+    return lambda j: (j.fare, j.duration) if sort_by == "fare" else (j.duration, j.fare)
+
+
+@dataclass
+class Journey:
+    """One or two route legs from the searched source to the destination."""
+    legs: Tuple[Dict[str, Any], ...]
+
+    @property
+    def fare(self) -> float:
+        return sum(float(leg['Fare']) for leg in self.legs)
+
+    @property
+    def duration(self) -> float:
+        return sum(_cost(leg, "duration") for leg in self.legs)
+
+    @property
+    def via(self) -> Optional[str]:
+        return self.legs[0]['Destination'] if len(self.legs) > 1 else None
+
+
+class RouteGraph:
+    """
+    Directed graph of cities with one edge per route, kept in memory.
+    Edges are indexed by (source, destination) and by each city's outgoing and
+    incoming neighbours, so a two-leg search only visits the cities that are
+    both reachable from the source and connected to the destination.
+    """
+
+    def __init__(self, routes: Iterable[Dict[str, Any]] = ()):
+        self._lock = threading.Lock()
+        self._edges: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._out: Dict[str, set] = defaultdict(set)
+        self._in: Dict[str, set] = defaultdict(set)
+        self._names: Dict[str, str] = {}
+        for route in routes:
+            self.add_route(route)
+
+    def add_route(self, route: Dict[str, Any]) -> None:
+        """Add one route as an edge."""
+        source, destination = normalize_city(route['Source']), normalize_city(route['Destination'])
+        with self._lock:
+            self._edges[(source, destination)].append(route)
+            self._out[source].add(destination)
+            self._in[destination].add(source)
+            self._names.setdefault(source, route['Source'])
+            self._names.setdefault(destination, route['Destination'])
+
+    def cities(self) -> List[str]:
+        """Every city name, as first spelled in bus_routes."""
+        with self._lock:
+            return sorted(self._names.values())
+
+    def match_city(self, query: str, limit: int = 5) -> List[str]:
+        """
+        Resolve a typed city to known city names: an exact match wins, then
+        prefix matches, then close spellings.
+        """
+        key = normalize_city(query)
+        if not key:
+            return []
+        # A snapshot, as add_route may be adding cities from another session
+        with self._lock:
+            names = dict(self._names)
+        if key in names:
+            return [names[key]]
+        prefixed = sorted(name for k, name in names.items() if k.startswith(key))
+        if prefixed:
+            return prefixed[:limit]
+        close = difflib.get_close_matches(key, list(names), n=limit, cutoff=0.75)
+        return [names[k] for k in close]
+
+    def _best_edge(self, source: str, destination: str, sort_by: str,
+                   seats: Optional[Dict[int, int]], min_seats: int) -> Optional[Dict[str, Any]]:
+        candidates = [r for r in self._edges.get((source, destination), ())
+                      if seats is None or seats.get(r['Route_ID'], r['Seat_Capacity']) >= min_seats]
+        return min(candidates, key=lambda r: _cost(r, sort_by)) if candidates else None
+
+    def journeys(self, source: str, destination: str, sort_by: str = "fare",
+                 seats: Optional[Dict[int, int]] = None, min_seats: int = 1,
+                 limit: int = 10) -> List[Journey]:
+        """
+        Find direct and one-change journeys ranked by total fare or duration.
+        seats ({Route_ID: Available_Seats} for the travel date) filters out
+        full legs; routes missing from it are assumed to have every seat free.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"sort_by must be one of {SORT_KEYS}")
+        source, destination = normalize_city(source), normalize_city(destination)
+        with self._lock:
+            found = []
+            for route in self._edges.get((source, destination), ()):
+                if seats is None or seats.get(route['Route_ID'], route['Seat_Capacity']) >= min_seats:
+                    found.append(Journey((route,)))
+            for via in self._out.get(source, set()) & self._in.get(destination, set()):
+                if via in (source, destination):
+                    continue
+                first = self._best_edge(source, via, sort_by, seats, min_seats)
+                second = self._best_edge(via, destination, sort_by, seats, min_seats)
+                if first and second:
+                    found.append(Journey((first, second)))
+        found.sort(key=_ranking(sort_by))
+        return found[:limit]
+
+    def journeys_between(self, sources: Iterable[str], destinations: Iterable[str],
+                         sort_by: str = "fare", seats: Optional[Dict[int, int]] = None,
+                         min_seats: int = 1, limit: int = 10) -> List[Journey]:
+        """journeys() for every pair of matched source and destination cities, ranked together."""
+        destinations = list(destinations)
+        found = [journey
+                 for source in sources for destination in destinations
+                 if normalize_city(source) != normalize_city(destination)
+                 for journey in self.journeys(source, destination, sort_by, seats,
+                                              min_seats, limit)]
+        found.sort(key=_ranking(sort_by))
+        return found[:limit]
+
+
+def search_routes(pool: ConnectionPool, sources: List[str],
+                  destinations: List[str]) -> List[Dict[str, Any]]:
+    """Direct routes between any of the given cities, using idx_source_dest."""
+    if not sources or not destinations:
+        return []
+    source_marks = ", ".join(["%s"] * len(sources))
+    destination_marks = ", ".join(["%s"] * len(destinations))
+    with pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute(f"""
+            SELECT Route_ID, RouteName, Source, Destination, Distance, Duration,
+                   Distance_Km, Duration_Hours, Fare, Seat_Capacity
+            FROM bus_routes
+            WHERE Source IN ({source_marks}) AND Destination IN ({destination_marks})
+            ORDER BY Fare
+        """, tuple(sources) + tuple(destinations))
+        return cursor.fetchall()
@@ -0,0 +1,26 @@
+"""Seat bitmaps: the encoding of Seat_Map and Seat_Mask, and seat allocation."""
+from typing import Iterable, List, Optional
+
+# Seat_Map and Seat_Mask are BIGINT UNSIGNED bitmaps
+MAX_SEATS = 64
+
+
+def seats_from_mask(mask: int) -> List[int]:
+    """Decode a seat bitmap into 1-based seat numbers."""
+    return [i + 1 for i in range(MAX_SEATS) if mask >> i & 1]
+
+
+def mask_from_seats(seats: Iterable[int]) -> int:
+    """Encode 1-based seat numbers as a seat bitmap."""
+    mask = 0
+    for seat in seats:
+        if not 1 <= seat <= MAX_SEATS:
+            raise ValueError(f"Seat number must be between 1 and {MAX_SEATS}: {seat}")
+        mask |= 1 << (seat - 1)
+    return mask
+
+
+def allocate_seats(seat_map: int, capacity: int, count: int) -> Optional[List[int]]:
+    """The lowest numbered free seats, as BookTicket picks them, or None if too few are free."""
+    free = [i + 1 for i in range(capacity) if not seat_map >> i & 1]
+    return free[:count] if len(free) >= count else None
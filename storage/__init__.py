@@ -0,0 +1,30 @@
+"""
+Pluggable storage backends.
+
+    storage = create_storage()      # BUS_STORAGE=mysql (default) or sqlite
+
+The MySQL backend runs on the bus_mgmt database of d.sql. The SQLite backend
+keeps everything in one local file (BUS_SQLITE_PATH), created on first use,
+for tests and single-node deployments.
+"""
+from typing import Optional
+
+from config import DatabaseConfig, load_database_config
+
+from storage.base import Storage, StorageError
+
+
+def create_storage(config: Optional[DatabaseConfig] = None) -> Storage:
+    """Open the backend named by config.backend, reading the settings from the environment by default."""
+    config = config or load_database_config()
+    if config.backend == "sqlite":
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(config.sqlite_path)
+    if config.backend == "mysql":
+        from db import create_pool
+        from storage.mysql import MySQLStorage
+        return MySQLStorage(create_pool(config))
+    raise ValueError(f"Unknown storage backend {config.backend!r}")
+
+
+__all__ = ["Storage", "StorageError", "create_storage"]
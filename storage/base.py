@@ -0,0 +1,221 @@
+"""The storage interface shared by the MySQL and SQLite backends."""
+import functools
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class StorageError(Exception):
+    """A backend failed to read or write; the message comes from the database driver."""
+
+
+def translate_errors(*error_types):
+    """Re-raise the driver's errors from a backend method as StorageError."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            except error_types as e:
+                raise StorageError(str(e)) from e
+        return wrapper
+    return decorate
+
+
+class Storage(ABC):
+    """
+    Routes, tickets, seat holds, notifications, complaints and accounts.
+
+    Rows are plain dicts keyed by the column names of d.sql, and write
+    methods return {'result': ...} dicts like the stored procedures, so
+    callers do not depend on the backend. Every method raises StorageError
+    when the database fails. `pool` is the MySQL connection pool used by the
+    features only the MySQL backend has (jobs, imports, analytics, group
+    bookings), or None.
+    """
+
+    name: str = ""
+    pool = None
+
+    # Routes
+
+    @abstractmethod
+    def create_route(self, route: Dict[str, Any]) -> int:
+        """Insert a bus_routes row (without Route_ID) and return its Route_ID."""
+
+    @abstractmethod
+    def list_routes(self) -> List[Dict[str, Any]]:
+        """Every route, ordered by Route_ID."""
+
+    @abstractmethod
+    def search_routes(self, sources: Sequence[str],
+                      destinations: Sequence[str]) -> List[Dict[str, Any]]:
+        """Direct routes from any of sources to any of destinations, cheapest first."""
+
+    @abstractmethod
+    def availability(self, travel_date: date) -> Dict[int, int]:
+        """{Route_ID: Available_Seats} for the trips that exist on travel_date."""
+
+    # Fares
+
+    @abstractmethod
+    def fares(self, travel_date: date) -> List[Dict[str, Any]]:
+        """The route_fares rows of a travel date, by Route_ID and ascending Min_Load."""
+
+    @abstractmethod
+    def save_fares(self, travel_date: date, rows: Sequence[tuple]) -> None:
+        """
+        Replace a travel date's fares with rows of
+        (Route_ID, Min_Load, Fare, Group_Fare, Group_Min_Seats), atomically.
+        """
+
+    @abstractmethod
+    def delete_fares_before(self, travel_date: date) -> int:
+        """Delete the fares of travel dates before travel_date; returns how many rows went."""
+
+    # Tickets and seat holds
+
+    @abstractmethod
+    def book_ticket(self, route_id: int, passenger_name: str, passenger_email: str,
+                    passenger_phone: str, travel_date: date,
+                    num_seats: int) -> Optional[Dict[str, Any]]:
+        """
+        Take the lowest free seats and issue a ticket at the quoted fare, all
+        or nothing. Returns {'result': 'SUCCESS', 'Ticket_ID', 'Seat_Numbers',
+        'Total_Fare'} or {'result': 'INSUFFICIENT_SEATS'}.
+        """
+
+    @abstractmethod
+    def cancel_ticket(self, ticket_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a booked ticket and give its seats back, at most once.
+        Returns {'result': 'SUCCESS', 'Route_ID', 'Booking_Date'} or
+        {'result': 'ALREADY_CANCELLED'}.
+        """
+
+    @abstractmethod
+    def hold_seats(self, route_id: int, travel_date: date, num_seats: int,
+                   held_by: Optional[str], ttl: int) -> Optional[Dict[str, Any]]:
+        """
+        Hold seats for ttl seconds at the fare quoted now. Returns {'result':
+        'SUCCESS', 'Hold_ID', 'Seat_Numbers', 'Total_Fare', 'Expires_At'} or
+        {'result': 'INSUFFICIENT_SEATS'}.
+        """
+
+    @abstractmethod
+    def confirm_hold(self, hold_id: int, passenger_name: str, passenger_email: str,
+                     passenger_phone: str) -> Optional[Dict[str, Any]]:
+        """
+        Turn an unexpired hold into a ticket. Returns {'result': 'SUCCESS',
+        'Ticket_ID', ...}, also for an already confirmed hold, or
+        {'result': 'HOLD_EXPIRED'}.
+        """
+
+    @abstractmethod
+    def release_hold(self, hold_id: int) -> Optional[Dict[str, Any]]:
+        """Give a hold's seats back. Returns {'result': 'SUCCESS'} or {'result': 'NOT_HELD'}."""
+
+    @abstractmethod
+    def expire_holds(self, batch_size: int = 500) -> List[Tuple[int, date]]:
+        """Expire past-due holds; returns the (Route_ID, Travel_Date) of each one released."""
+
+    @abstractmethod
+    def seconds_until_next_expiry(self) -> Optional[float]:
+        """Seconds until the earliest active hold expires, or None if nothing is held."""
+
+    @abstractmethod
+    def route_tickets(self, route_id: int, status: Optional[str] = None,
+                      from_date: Optional[date] = None, to_date: Optional[date] = None,
+                      after: Optional[tuple] = None, limit: int = 50,
+                      archived: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        One page of a route's tickets, newest first, and the total matching count.
+        For the next page pass the (Created_At, Ticket_ID) of the last ticket as after.
+        With archived, the page comes from the archived tickets instead.
+        """
+
+    # Users and notifications
+
+    @abstractmethod
+    def list_users(self) -> List[Dict[str, Any]]:
+        """User_ID, Username, email and Role of every user, by username."""
+
+    @abstractmethod
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        """One user by username, or None."""
+
+    @abstractmethod
+    def create_notification(self, user_id: int, message: str) -> None:
+        """Send a notification to one user."""
+
+    @abstractmethod
+    def notifications(self, after: Optional[tuple] = None, limit: int = 25,
+                      archived: bool = False) -> List[Dict[str, Any]]:
+        """
+        One page of everyone's notifications, newest first, with the Recipient's
+        username; from the archived notifications with archived.
+        """
+
+    @abstractmethod
+    def user_notifications(self, user_id: int, after: Optional[tuple] = None,
+                           limit: int = 25, archived: bool = False) -> List[Dict[str, Any]]:
+        """One page of a user's notifications, newest first; archived ones with archived."""
+
+    @abstractmethod
+    def count_unread(self, user_id: int) -> int:
+        """How many of a user's notifications are unread."""
+
+    @abstractmethod
+    def mark_notifications_read(self, notification_ids: Sequence[int]) -> None:
+        """Mark notifications as read."""
+
+    # Complaints
+
+    @abstractmethod
+    def create_complaint(self, operator_id: int, subject: str, message: str) -> None:
+        """File a complaint from an operator."""
+
+    @abstractmethod
+    def complaints(self, status: Optional[str] = None, operator_id: Optional[int] = None,
+                   from_date: Optional[date] = None, to_date: Optional[date] = None,
+                   after: Optional[tuple] = None,
+                   limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        One page of the complaint queue, oldest first, with the Operator_Name
+        that filed each one, and the total matching count. Dates filter on
+        the day the complaint was filed. For the next page pass the
+        (Created_At, Complaint_ID) of the last complaint as after.
+        """
+
+    @abstractmethod
+    def complaint_stats(self, sla_hours: int) -> List[Dict[str, Any]]:
+        """Per Status: Total, Over_SLA (filed more than sla_hours ago) and Oldest_Created_At."""
+
+    @abstractmethod
+    def update_complaints_status(self, complaint_ids: Sequence[int], status: str) -> int:
+        """Set the status of several complaints at once; returns how many changed."""
+
+    # Accounts
+
+    @abstractmethod
+    def list_operators(self) -> List[Dict[str, Any]]:
+        """Operator_ID and Username of every operator, by username."""
+
+    @abstractmethod
+    def find_account(self, kind: str, username: str) -> Optional[Dict[str, Any]]:
+        """
+        The 'admin' or active 'operator' account with this username, including
+        its stored Password hash, or None.
+        """
+
+    @abstractmethod
+    def update_password(self, kind: str, account_id: int, new_hash: str, old_hash: str) -> bool:
+        """Replace an account's password hash, only if it is still old_hash."""
+
+    @abstractmethod
+    def register_operator(self, username: str, password_hash: str, first_name: str,
+                          last_name: str, email: str) -> Dict[str, Any]:
+        """Add an active operator. Returns {'result': 'SUCCESS'} or {'result': 'DUPLICATE'}."""
+
+    def close(self) -> None:
+        """Release the backend's connections."""
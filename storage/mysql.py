@@ -0,0 +1,312 @@
+"""MySQL storage backend: the bus_mgmt schema and stored procedures of d.sql."""
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mysql.connector import Error
+
+import booking
+import holds
+from db import ConnectionPool
+from inventory import get_availability
+from search import search_routes
+
+from storage.base import Storage, translate_errors
+
+_translated = translate_errors(Error)
+
+# Rows per multi-row INSERT when saving fares
+FARE_BATCH_SIZE = 5000
+
+# (lookup query, rehash update) per kind of account
+ACCOUNTS = {
+    "admin": (
+        "SELECT Admin_ID, Username, Role, Password FROM Administrators WHERE Username = %s",
+        "UPDATE Administrators SET Password = %s WHERE Admin_ID = %s AND Password = %s",
+    ),
+    "operator": (
+        """SELECT Operator_ID, Username, First_Name, Last_Name, Email, Status, Password
+           FROM Operators WHERE Username = %s AND Status = 'Active'""",
+        "UPDATE Operators SET Password = %s WHERE Operator_ID = %s AND Password = %s",
+    ),
+}
+
+
+def _procedure_rows(cursor) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for result in cursor.stored_results():
+        rows = result.fetchall()
+    return rows
+
+
+class MySQLStorage(Storage):
+    """Storage on a MySQL/MariaDB server, through the shared connection pool."""
+
+    name = "mysql"
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    @_translated
+    def create_route(self, route: Dict[str, Any]) -> int:
+        with self.pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.callproc('CreateBusRoute', (
+                route['RouteName'], route['Source'], route['Destination'],
+                route['Distance'], route['Duration'], route['Fare'], route['Seat_Capacity'],
+                route['Distance_Km'], route['Duration_Hours']
+            ))
+            route_id = _procedure_rows(cursor)[0]['Route_ID']
+            conn.commit()
+        return route_id
+
+    @_translated
+    def list_routes(self) -> List[Dict[str, Any]]:
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT Route_ID, RouteName, Source, Destination, Distance, Duration,
+                       Distance_Km, Duration_Hours, Fare, Seat_Capacity
+                FROM bus_routes
+                ORDER BY Route_ID
+            """)
+            return cursor.fetchall()
+
+    @_translated
+    def search_routes(self, sources: Sequence[str],
+                      destinations: Sequence[str]) -> List[Dict[str, Any]]:
+        return search_routes(self.pool, list(sources), list(destinations))
+
+    @_translated
+    def availability(self, travel_date: date) -> Dict[int, int]:
+        return get_availability(self.pool, travel_date)
+
+    @_translated
+    def fares(self, travel_date: date) -> List[Dict[str, Any]]:
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT Route_ID, Min_Load, Fare, Group_Fare, Group_Min_Seats
+                FROM route_fares
+                WHERE Travel_Date = %s
+                ORDER BY Route_ID, Min_Load
+            """, (travel_date,))
+            return cursor.fetchall()
+
+    @_translated
+    def save_fares(self, travel_date: date, rows: Sequence[tuple]) -> None:
+        def work(conn):
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM route_fares WHERE Travel_Date = %s", (travel_date,))
+                for i in range(0, len(rows), FARE_BATCH_SIZE):
+                    cursor.executemany("""
+                        INSERT INTO route_fares (Route_ID, Travel_Date, Min_Load, Fare,
+                                                 Group_Fare, Group_Min_Seats)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, [(r[0], travel_date, *r[1:]) for r in rows[i:i + FARE_BATCH_SIZE]])
+
+        self.pool.run_transaction(work)
+
+    @_translated
+    def delete_fares_before(self, travel_date: date) -> int:
+        def work(conn) -> int:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM route_fares WHERE Travel_Date < %s LIMIT %s",
+                               (travel_date, FARE_BATCH_SIZE))
+                return cursor.rowcount
+
+        # Batches in separate transactions, so a long backlog never holds many locks at once
+        deleted = 0
+        while True:
+            count = self.pool.run_transaction(work)
+            deleted += count
+            if count < FARE_BATCH_SIZE:
+                return deleted
+
+    @_translated
+    def book_ticket(self, route_id: int, passenger_name: str, passenger_email: str,
+                    passenger_phone: str, travel_date: date,
+                    num_seats: int) -> Optional[Dict[str, Any]]:
+        return booking.book_seats(self.pool, route_id, passenger_name, passenger_email,
+                                  passenger_phone, travel_date, num_seats)
+
+    @_translated
+    def cancel_ticket(self, ticket_id: int) -> Optional[Dict[str, Any]]:
+        return booking.cancel_booking(self.pool, ticket_id)
+
+    @_translated
+    def hold_seats(self, route_id: int, travel_date: date, num_seats: int,
+                   held_by: Optional[str], ttl: int) -> Optional[Dict[str, Any]]:
+        return holds.hold_seats(self.pool, route_id, travel_date, num_seats, held_by, ttl)
+
+    @_translated
+    def confirm_hold(self, hold_id: int, passenger_name: str, passenger_email: str,
+                     passenger_phone: str) -> Optional[Dict[str, Any]]:
+        return holds.confirm_hold(self.pool, hold_id, passenger_name,
+                                  passenger_email, passenger_phone)
+
+    @_translated
+    def release_hold(self, hold_id: int) -> Optional[Dict[str, Any]]:
+        return holds.release_hold(self.pool, hold_id)
+
+    @_translated
+    def expire_holds(self, batch_size: int = 500) -> List[Tuple[int, date]]:
+        return holds.expire_holds(self.pool, batch_size)
+
+    @_translated
+    def seconds_until_next_expiry(self) -> Optional[float]:
+        return holds.seconds_until_next_expiry(self.pool)
+
+    @_translated
+    def route_tickets(self, route_id: int, status: Optional[str] = None,
+                      from_date: Optional[date] = None, to_date: Optional[date] = None,
+                      after: Optional[tuple] = None, limit: int = 50,
+                      archived: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+        return booking.route_tickets(self.pool, route_id, status, from_date, to_date, after,
+                                     limit, archived)
+
+    @_translated
+    def list_users(self) -> List[Dict[str, Any]]:
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT User_ID, Username, email, Role
+                FROM users
+                ORDER BY Username
+            """)
+            return cursor.fetchall()
+
+    @_translated
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT User_ID, Username, email, Role
+                FROM users
+                WHERE Username = %s
+            """, (username,))
+            return cursor.fetchone()
+
+    @_translated
+    def create_notification(self, user_id: int, message: str) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.callproc('CreateNotification', (user_id, message))
+            conn.commit()
+
+    @_translated
+    def notifications(self, after: Optional[tuple] = None, limit: int = 25,
+                      archived: bool = False) -> List[Dict[str, Any]]:
+        after_created_at, after_id = after or (None, None)
+        table = "notifications_archive" if archived else "notifications"
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            # Walk idx_notification_date (or its archive twin) backwards from the cursor
+            cursor.execute(f"""
+                SELECT n.Notification_ID, n.User_ID, n.Message, n.is_read, n.Created_At,
+                       u.Username as Recipient
+                FROM {table} n
+                JOIN users u ON n.User_ID = u.User_ID
+                WHERE (%s IS NULL
+                       OR n.Created_At < %s
+                       OR (n.Created_At = %s AND n.Notification_ID < %s))
+                ORDER BY n.Created_At DESC, n.Notification_ID DESC
+                LIMIT %s
+            """, (after_created_at, after_created_at, after_created_at, after_id, limit))
+            return cursor.fetchall()
+
+    @_translated
+    def user_notifications(self, user_id: int, after: Optional[tuple] = None,
+                           limit: int = 25, archived: bool = False) -> List[Dict[str, Any]]:
+        after_created_at, after_id = after or (None, None)
+        procedure = 'GetArchivedUserNotifications' if archived else 'GetUserNotifications'
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.callproc(procedure, (user_id, after_created_at, after_id, limit))
+            return _procedure_rows(cursor)
+
+    @_translated
+    def count_unread(self, user_id: int) -> int:
+        with self.pool.read_connection() as conn, conn.cursor() as cursor:
+            # Answered from idx_notification_user
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM notifications
+                WHERE User_ID = %s AND is_read = FALSE
+            """, (user_id,))
+            return cursor.fetchone()[0]
+
+    @_translated
+    def mark_notifications_read(self, notification_ids: Sequence[int]) -> None:
+        if not notification_ids:
+            return
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            # One statement for the whole selection, through the primary key
+            cursor.execute(f"""
+                UPDATE notifications SET is_read = TRUE
+                WHERE Notification_ID IN ({", ".join(["%s"] * len(notification_ids))})
+            """, tuple(notification_ids))
+            conn.commit()
+
+    @_translated
+    def create_complaint(self, operator_id: int, subject: str, message: str) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.callproc('CreateComplaint', (operator_id, subject, message))
+            conn.commit()
+
+    @_translated
+    def complaints(self, status: Optional[str] = None, operator_id: Optional[int] = None,
+                   from_date: Optional[date] = None, to_date: Optional[date] = None,
+                   after: Optional[tuple] = None,
+                   limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        after_created_at, after_id = after or (None, None)
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.callproc('GetComplaintList', (
+                status, operator_id, from_date, to_date, after_created_at, after_id, limit
+            ))
+            results = [result.fetchall() for result in cursor.stored_results()]
+        return results[0], results[1][0]['Total']
+
+    @_translated
+    def complaint_stats(self, sla_hours: int) -> List[Dict[str, Any]]:
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.callproc('GetComplaintQueueStats', (sla_hours,))
+            return _procedure_rows(cursor)
+
+    @_translated
+    def update_complaints_status(self, complaint_ids: Sequence[int], status: str) -> int:
+        if not complaint_ids:
+            return 0
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            # One statement for the whole selection, through the primary key
+            cursor.execute(f"""
+                UPDATE complaints SET Status = %s
+                WHERE Complaint_ID IN ({", ".join(["%s"] * len(complaint_ids))})
+                AND Status <> %s
+            """, (status, *complaint_ids, status))
+            conn.commit()
+            return cursor.rowcount
+
+    @_translated
+    def list_operators(self) -> List[Dict[str, Any]]:
+        with self.pool.read_connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.execute("SELECT Operator_ID, Username FROM Operators ORDER BY Username")
+            return cursor.fetchall()
+
+    @_translated
+    def find_account(self, kind: str, username: str) -> Optional[Dict[str, Any]]:
+        with self.pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.execute(ACCOUNTS[kind][0], (username,))
+            return cursor.fetchone()
+
+    @_translated
+    def update_password(self, kind: str, account_id: int, new_hash: str, old_hash: str) -> bool:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(ACCOUNTS[kind][1], (new_hash, account_id, old_hash))
+            conn.commit()
+            return cursor.rowcount == 1
+
+    @_translated
+    def register_operator(self, username: str, password_hash: str, first_name: str,
+                          last_name: str, email: str) -> Dict[str, Any]:
+        with self.pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+            cursor.callproc('RegisterOperator', (
+                username, password_hash, first_name, last_name, email
+            ))
+            result = _procedure_rows(cursor)[0]
+            conn.commit()
+        return result
+
+    def close(self) -> None:
+        self.pool.close()
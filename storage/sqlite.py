@@ -0,0 +1,622 @@
+"""
+Embedded SQLite storage backend for tests and single-node deployments.
+
+The database is one file in WAL mode, so readers never wait for the writer.
+Each thread has its own connection, whose statement cache keeps the
+parameterized statements prepared. The stored procedures of d.sql are
+implemented here: every write runs in a BEGIN IMMEDIATE transaction, which
+takes the database's write lock before reading, so reading a trip's seat map
+and updating it is as atomic as BookTicket's SELECT ... FOR UPDATE.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fares import quote_fare
+from seats import allocate_seats, mask_from_seats
+
+from storage.base import Storage, translate_errors
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sqlite.sql")
+
+# SQLite integers are signed 64-bit; seat bitmaps use all 64 bits
+_TWO_64 = 1 << 64
+
+_NOW = "datetime('now', 'localtime')"
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "seconds"))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("BOOLEAN", lambda raw: raw not in (b"0", b""))
+
+_translated = translate_errors(sqlite3.Error)
+
+# (lookup query, rehash update) per kind of account
+ACCOUNTS = {
+    "admin": (
+        "SELECT Admin_ID, Username, Role, Password FROM Administrators WHERE Username = ?",
+        "UPDATE Administrators SET Password = ? WHERE Admin_ID = ? AND Password = ?",
+    ),
+    "operator": (
+        """SELECT Operator_ID, Username, First_Name, Last_Name, Email, Status, Password
+           FROM Operators WHERE Username = ? AND Status = 'Active'""",
+        "UPDATE Operators SET Password = ? WHERE Operator_ID = ? AND Password = ?",
+    ),
+}
+
+
+def _to_db(mask: int) -> int:
+    return mask - _TWO_64 if mask >= _TWO_64 >> 1 else mask
+
+
+def _from_db(value: int) -> int:
+    return value + _TWO_64 if value < 0 else value
+
+
+def _dict_row(cursor, row) -> Dict[str, Any]:
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteStorage(Storage):
+    """Storage in a local SQLite file, created with the schema on first use."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._create_schema()
+
+    @_translated
+    def _create_schema(self) -> None:
+        with open(SCHEMA_PATH) as f:
+            self._conn().executescript(f.read())
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   detect_types=(sqlite3.PARSE_DECLTYPES
+                                                 | sqlite3.PARSE_COLNAMES),
+                                   isolation_level=None, check_same_thread=False,
+                                   cached_statements=256)
+            conn.row_factory = _dict_row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction holding the database's write lock from the start."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _rows(self, sql: str, params: Any = ()) -> List[Dict[str, Any]]:
+        return self._conn().execute(sql, params).fetchall()
+
+    def _row(self, sql: str, params: Any = ()) -> Optional[Dict[str, Any]]:
+        return self._conn().execute(sql, params).fetchone()
+
+    # Routes
+
+    @_translated
+    def create_route(self, route: Dict[str, Any]) -> int:
+        with self._write() as conn:
+            cursor = conn.execute("""
+                INSERT INTO bus_routes (RouteName, Source, Destination, Distance, Duration,
+                                        Distance_Km, Duration_Hours, Fare, Seat_Capacity)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (route['RouteName'], route['Source'], route['Destination'],
+                  route['Distance'], route['Duration'], route['Distance_Km'],
+                  route['Duration_Hours'], route['Fare'], route['Seat_Capacity']))
+            return cursor.lastrowid
+
+    @_translated
+    def list_routes(self) -> List[Dict[str, Any]]:
+        return self._rows("""
+            SELECT Route_ID, RouteName, Source, Destination, Distance, Duration,
+                   Distance_Km, Duration_Hours, Fare, Seat_Capacity
+            FROM bus_routes
+            ORDER BY Route_ID
+        """)
+
+    @_translated
+    def search_routes(self, sources: Sequence[str],
+                      destinations: Sequence[str]) -> List[Dict[str, Any]]:
+        if not sources or not destinations:
+            return []
+        return self._rows(f"""
+            SELECT Route_ID, RouteName, Source, Destination, Distance, Duration,
+                   Distance_Km, Duration_Hours, Fare, Seat_Capacity
+            FROM bus_routes
+            WHERE Source IN ({", ".join("?" * len(sources))})
+            AND Destination IN ({", ".join("?" * len(destinations))})
+            ORDER BY Fare
+        """, tuple(sources) + tuple(destinations))
+
+    @_translated
+    def availability(self, travel_date: date) -> Dict[int, int]:
+        rows = self._rows("SELECT Route_ID, Available_Seats FROM trips WHERE Travel_Date = ?",
+                          (travel_date,))
+        return {row['Route_ID']: row['Available_Seats'] for row in rows}
+
+    @_translated
+    def fares(self, travel_date: date) -> List[Dict[str, Any]]:
+        return self._rows("""
+            SELECT Route_ID, Min_Load, Fare, Group_Fare, Group_Min_Seats
+            FROM route_fares
+            WHERE Travel_Date = ?
+            ORDER BY Route_ID, Min_Load
+        """, (travel_date,))
+
+    @_translated
+    def save_fares(self, travel_date: date, rows: Sequence[tuple]) -> None:
+        with self._write() as conn:
+            conn.execute("DELETE FROM route_fares WHERE Travel_Date = ?", (travel_date,))
+            conn.executemany("""
+                INSERT INTO route_fares (Route_ID, Travel_Date, Min_Load, Fare,
+                                         Group_Fare, Group_Min_Seats)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(r[0], travel_date, *r[1:]) for r in rows])
+
+    @_translated
+    def delete_fares_before(self, travel_date: date) -> int:
+        with self._write() as conn:
+            return conn.execute("DELETE FROM route_fares WHERE Travel_Date < ?",
+                                (travel_date,)).rowcount
+
+    # Tickets and seat holds: the procedures of d.sql
+
+    def _release(self, conn, hold_id: int, status: str) -> Optional[Dict[str, Any]]:
+        """ReleaseHold: end a hold and give its seats back to the trip."""
+        cursor = conn.execute(f"""
+            UPDATE seat_holds SET Status = ?
+            WHERE Hold_ID = ? AND Status = 'Held'
+            AND (? = 'Released' OR Expires_At <= {_NOW})
+        """, (status, hold_id, status))
+        if cursor.rowcount != 1:
+            return {'result': 'NOT_HELD'}
+        hold = conn.execute("""
+            SELECT Trip_ID, Route_ID, Travel_Date, Number_Of_Seats, Seat_Mask
+            FROM seat_holds WHERE Hold_ID = ?
+        """, (hold_id,)).fetchone()
+        conn.execute("""
+            UPDATE trips
+            SET Seat_Map = Seat_Map & ~?,
+                Available_Seats = Available_Seats + ?,
+                Held_Seats = Held_Seats - ?
+            WHERE Trip_ID = ?
+        """, (hold['Seat_Mask'], hold['Number_Of_Seats'], hold['Number_Of_Seats'],
+              hold['Trip_ID']))
+        return {'result': 'SUCCESS', 'Route_ID': hold['Route_ID'],
+                'Travel_Date': hold['Travel_Date']}
+
+    def _take_seats(self, conn, route_id: int, travel_date: date,
+                    num_seats: int) -> Optional[Tuple[int, int, int, int, str]]:
+        """
+        TakeSeats: mark the lowest free seats of the trip taken, creating the
+        trip on first use. Returns (Trip_ID, Capacity, Taken, Seat_Mask,
+        Seat_Numbers), Taken being the seats already taken before these, or
+        None when there are not enough free seats.
+        """
+        # No sweeper may be running, so expired holds on this trip are released first
+        due = conn.execute(f"""
+            SELECT Hold_ID FROM seat_holds
+            WHERE Route_ID = ? AND Travel_Date = ? AND Status = 'Held'
+            AND Expires_At <= {_NOW}
+        """, (route_id, travel_date)).fetchall()
+        for hold in due:
+            self._release(conn, hold['Hold_ID'], 'Expired')
+
+        conn.execute("""
+            INSERT INTO trips (Route_ID, Travel_Date, Capacity, Available_Seats, Seat_Map)
+            SELECT Route_ID, ?, Seat_Capacity, Seat_Capacity, 0
+            FROM bus_routes WHERE Route_ID = ?
+            ON CONFLICT (Route_ID, Travel_Date) DO NOTHING
+        """, (travel_date, route_id))
+        trip = conn.execute("""
+            SELECT Trip_ID, Capacity, Seat_Map FROM trips
+            WHERE Route_ID = ? AND Travel_Date = ?
+        """, (route_id, travel_date)).fetchone()
+        if trip is None or num_seats <= 0:
+            return None
+        seat_map = _from_db(trip['Seat_Map'])
+        seats = allocate_seats(seat_map, trip['Capacity'], num_seats)
+        if seats is None:
+            return None
+        mask = mask_from_seats(seats)
+        conn.execute("""
+            UPDATE trips
+            SET Seat_Map = Seat_Map | ?, Available_Seats = Available_Seats - ?
+            WHERE Trip_ID = ?
+        """, (_to_db(mask), num_seats, trip['Trip_ID']))
+        return (trip['Trip_ID'], trip['Capacity'], bin(seat_map).count("1"), mask,
+                ",".join(map(str, seats)))
+
+    def _quote(self, conn, route_id: int, travel_date: date, num_seats: int,
+               capacity: int, taken: int) -> float:
+        """QuoteFare: the total fare for num_seats on a trip with taken seats already taken."""
+        tiers = conn.execute("""
+            SELECT Min_Load, Fare, Group_Fare, Group_Min_Seats FROM route_fares
+            WHERE Route_ID = ? AND Travel_Date = ?
+            ORDER BY Min_Load
+        """, (route_id, travel_date)).fetchall()
+        base_fare = conn.execute("SELECT Fare FROM bus_routes WHERE Route_ID = ?",
+                                 (route_id,)).fetchone()['Fare']
+        return round(quote_fare(tiers, base_fare, capacity, taken, num_seats) * num_seats, 2)
+
+    def _issue_ticket(self, conn, route_id: int, passenger_name: str, passenger_email: str,
+                      passenger_phone: str, travel_date: date, num_seats: int,
+                      capacity: int, mask: int, seat_numbers: str, total_fare: float) -> int:
+        """IssueTicket: insert the ticket for taken seats and count it in the daily rollup."""
+        ticket_id = conn.execute("""
+            INSERT INTO tickets (Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
+                                 Booking_Date, Number_Of_Seats, Total_Fare, Seat_Numbers, Seat_Mask)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (route_id, passenger_name, passenger_email, passenger_phone, travel_date,
+              num_seats, total_fare, seat_numbers, _to_db(mask))).lastrowid
+        conn.execute("""
+            INSERT INTO route_daily_stats (Route_ID, Stat_Date, Capacity, Bookings,
+                                           Seats_Booked, Revenue)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT (Route_ID, Stat_Date) DO UPDATE SET
+                Capacity = excluded.Capacity,
+                Bookings = Bookings + 1,
+                Seats_Booked = Seats_Booked + excluded.Seats_Booked,
+                Revenue = Revenue + excluded.Revenue
+        """, (route_id, travel_date, capacity, num_seats, total_fare))
+        return ticket_id
+
+    @_translated
+    def book_ticket(self, route_id: int, passenger_name: str, passenger_email: str,
+                    passenger_phone: str, travel_date: date,
+                    num_seats: int) -> Optional[Dict[str, Any]]:
+        with self._write() as conn:
+            taken = self._take_seats(conn, route_id, travel_date, num_seats)
+            if taken is None:
+                return {'result': 'INSUFFICIENT_SEATS'}
+            _, capacity, already_taken, mask, seat_numbers = taken
+            total_fare = self._quote(conn, route_id, travel_date, num_seats,
+                                     capacity, already_taken)
+            ticket_id = self._issue_ticket(conn, route_id, passenger_name, passenger_email,
+                                           passenger_phone, travel_date, num_seats,
+                                           capacity, mask, seat_numbers, total_fare)
+        return {'result': 'SUCCESS', 'Ticket_ID': ticket_id, 'Seat_Numbers': seat_numbers,
+                'Total_Fare': total_fare}
+
+    @_translated
+    def cancel_ticket(self, ticket_id: int) -> Optional[Dict[str, Any]]:
+        with self._write() as conn:
+            # Conditional, so a ticket cancelled twice only releases its seats once
+            cursor = conn.execute("""
+                UPDATE tickets SET Status = 'Cancelled'
+                WHERE Ticket_ID = ? AND Status = 'Booked'
+            """, (ticket_id,))
+            if cursor.rowcount != 1:
+                return {'result': 'ALREADY_CANCELLED'}
+            ticket = conn.execute("""
+                SELECT Route_ID, Booking_Date, Seat_Mask, Number_Of_Seats, Total_Fare
+                FROM tickets WHERE Ticket_ID = ?
+            """, (ticket_id,)).fetchone()
+            conn.execute("""
+                UPDATE trips
+                SET Seat_Map = Seat_Map & ~?, Available_Seats = Available_Seats + ?
+                WHERE Route_ID = ? AND Travel_Date = ?
+            """, (ticket['Seat_Mask'], bin(_from_db(ticket['Seat_Mask'])).count("1"),
+                  ticket['Route_ID'], ticket['Booking_Date']))
+            conn.execute("""
+                INSERT INTO route_daily_stats (Route_ID, Stat_Date, Cancellations,
+                                               Seats_Cancelled, Refunds)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (Route_ID, Stat_Date) DO UPDATE SET
+                    Cancellations = Cancellations + 1,
+                    Seats_Cancelled = Seats_Cancelled + excluded.Seats_Cancelled,
+                    Refunds = Refunds + excluded.Refunds
+            """, (ticket['Route_ID'], ticket['Booking_Date'], ticket['Number_Of_Seats'],
+                  ticket['Total_Fare']))
+        return {'result': 'SUCCESS', 'Route_ID': ticket['Route_ID'],
+                'Booking_Date': ticket['Booking_Date']}
+
+    @_translated
+    def hold_seats(self, route_id: int, travel_date: date, num_seats: int,
+                   held_by: Optional[str], ttl: int) -> Optional[Dict[str, Any]]:
+        with self._write() as conn:
+            taken = self._take_seats(conn, route_id, travel_date, num_seats)
+            if taken is None:
+                return {'result': 'INSUFFICIENT_SEATS'}
+            trip_id, capacity, already_taken, mask, seat_numbers = taken
+            # The fare is locked in for the hold, whatever bookings come after it
+            total_fare = self._quote(conn, route_id, travel_date, num_seats,
+                                     capacity, already_taken)
+            conn.execute("UPDATE trips SET Held_Seats = Held_Seats + ? WHERE Trip_ID = ?",
+                         (num_seats, trip_id))
+            hold_id = conn.execute("""
+                INSERT INTO seat_holds (Trip_ID, Route_ID, Travel_Date, Number_Of_Seats,
+                                        Seat_Numbers, Seat_Mask, Total_Fare, Held_By, Expires_At)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now', 'localtime', ?))
+            """, (trip_id, route_id, travel_date, num_seats, seat_numbers, _to_db(mask),
+                  total_fare, held_by, f"+{int(ttl)} seconds")).lastrowid
+            return conn.execute("""
+                SELECT 'SUCCESS' as result, Hold_ID, Seat_Numbers, Total_Fare, Expires_At
+                FROM seat_holds WHERE Hold_ID = ?
+            """, (hold_id,)).fetchone()
+
+    @_translated
+    def confirm_hold(self, hold_id: int, passenger_name: str, passenger_email: str,
+                     passenger_phone: str) -> Optional[Dict[str, Any]]:
+        with self._write() as conn:
+            cursor = conn.execute(f"""
+                UPDATE seat_holds SET Status = 'Confirmed'
+                WHERE Hold_ID = ? AND Status = 'Held' AND Expires_At > {_NOW}
+            """, (hold_id,))
+            if cursor.rowcount != 1:
+                # Already confirmed (return its ticket again), or expired
+                return conn.execute("""
+                    SELECT CASE WHEN Status = 'Confirmed' THEN 'SUCCESS'
+                                ELSE 'HOLD_EXPIRED' END as result,
+                           Ticket_ID, Seat_Numbers, Total_Fare, Route_ID,
+                           Travel_Date as Booking_Date
+                    FROM seat_holds WHERE Hold_ID = ?
+                """, (hold_id,)).fetchone()
+            hold = conn.execute("""
+                SELECT Trip_ID, Route_ID, Travel_Date, Number_Of_Seats, Seat_Mask,
+                       Seat_Numbers, Total_Fare
+                FROM seat_holds WHERE Hold_ID = ?
+            """, (hold_id,)).fetchone()
+            capacity = conn.execute("SELECT Capacity FROM trips WHERE Trip_ID = ?",
+                                    (hold['Trip_ID'],)).fetchone()['Capacity']
+            conn.execute("UPDATE trips SET Held_Seats = Held_Seats - ? WHERE Trip_ID = ?",
+                         (hold['Number_Of_Seats'], hold['Trip_ID']))
+            ticket_id = self._issue_ticket(conn, hold['Route_ID'], passenger_name,
+                                           passenger_email, passenger_phone,
+                                           hold['Travel_Date'], hold['Number_Of_Seats'],
+                                           capacity, _from_db(hold['Seat_Mask']),
+                                           hold['Seat_Numbers'], hold['Total_Fare'])
+            conn.execute("UPDATE seat_holds SET Ticket_ID = ? WHERE Hold_ID = ?",
+                         (ticket_id, hold_id))
+        return {'result': 'SUCCESS', 'Ticket_ID': ticket_id, 'Seat_Numbers': hold['Seat_Numbers'],
+                'Total_Fare': hold['Total_Fare'], 'Route_ID': hold['Route_ID'], 'Booking_Date': hold['Travel_Date']}
+
+    @_translated
+    def release_hold(self, hold_id: int) -> Optional[Dict[str, Any]]:
+        with self._write() as conn:
+            return self._release(conn, hold_id, 'Released')
+
+    @_translated
+    def expire_holds(self, batch_size: int = 500) -> List[Tuple[int, date]]:
+        due = self._rows(f"""
+            SELECT Hold_ID FROM seat_holds
+            WHERE Status = 'Held' AND Expires_At <= {_NOW}
+            ORDER BY Expires_At
+            LIMIT ?
+        """, (batch_size,))
+        released = []
+        for hold in due:
+            with self._write() as conn:
+                result = self._release(conn, hold['Hold_ID'], 'Expired')
+            if result['result'] == 'SUCCESS':
+                released.append((result['Route_ID'], result['Travel_Date']))
+        return released
+
+    @_translated
+    def seconds_until_next_expiry(self) -> Optional[float]:
+        row = self._row(f"""
+            SELECT (julianday(MIN(Expires_At)) - julianday({_NOW})) * 86400.0 as Seconds
+            FROM seat_holds WHERE Status = 'Held'
+        """)
+        return None if row['Seconds'] is None else max(0.0, row['Seconds'])
+
+    @_translated
+    def route_tickets(self, route_id: int, status: Optional[str] = None,
+                      from_date: Optional[date] = None, to_date: Optional[date] = None,
+                      after: Optional[tuple] = None, limit: int = 50,
+                      archived: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+        after_created_at, after_ticket_id = after or (None, None)
+        table = "tickets_archive" if archived else "tickets"
+        params = {"route_id": route_id, "status": status, "from_date": from_date,
+                  "to_date": to_date, "after_created_at": after_created_at,
+                  "after_ticket_id": after_ticket_id, "limit": limit}
+        filters = """
+            WHERE Route_ID = :route_id
+            AND (:status IS NULL OR Status = :status)
+            AND (:from_date IS NULL OR Booking_Date >= :from_date)
+            AND (:to_date IS NULL OR Booking_Date <= :to_date)
+        """
+        conn = self._conn()
+        # One read transaction, so the page and the count see the same snapshot
+        conn.execute("BEGIN")
+        try:
+            tickets = conn.execute(f"""
+                SELECT Ticket_ID, Route_ID, Passenger_Name, Passenger_Email, Passenger_Phone,
+                       Booking_Date, Number_Of_Seats, Total_Fare, Seat_Numbers, Status, Created_At
+                FROM {table}
+                {filters}
+                AND (:after_created_at IS NULL
+                     OR Created_At < :after_created_at
+                     OR (Created_At = :after_created_at AND Ticket_ID < :after_ticket_id))
+                ORDER BY Created_At DESC, Ticket_ID DESC
+                LIMIT :limit
+            """, params).fetchall()
+            total = conn.execute(f"SELECT COUNT(*) as Total FROM {table} {filters}",
+                                 params).fetchone()['Total']
+        finally:
+            conn.execute("COMMIT")
+        return tickets, total
+
+    # Users and notifications
+
+    @_translated
+    def list_users(self) -> List[Dict[str, Any]]:
+        return self._rows("SELECT User_ID, Username, email, Role FROM users ORDER BY Username")
+
+    @_translated
+    def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        return self._row("SELECT User_ID, Username, email, Role FROM users WHERE Username = ?",
+                         (username,))
+
+    @_translated
+    def create_notification(self, user_id: int, message: str) -> None:
+        with self._write() as conn:
+            conn.execute("INSERT INTO notifications (User_ID, Message, is_read) VALUES (?, ?, 0)",
+                         (user_id, message))
+
+    def _notification_page(self, user_id: Optional[int], after: Optional[tuple],
+                           limit: int, archived: bool) -> List[Dict[str, Any]]:
+        after_created_at, after_id = after or (None, None)
+        table = "notifications_archive" if archived else "notifications"
+        return self._rows(f"""
+            SELECT n.Notification_ID, n.User_ID, n.Message, n.is_read, n.Created_At,
+                   u.Username as Recipient
+            FROM {table} n
+            JOIN users u ON n.User_ID = u.User_ID
+            WHERE (:user_id IS NULL OR n.User_ID = :user_id)
+            AND (:after_created_at IS NULL
+                 OR n.Created_At < :after_created_at
+                 OR (n.Created_At = :after_created_at AND n.Notification_ID < :after_id))
+            ORDER BY n.Created_At DESC, n.Notification_ID DESC
+            LIMIT :limit
+        """, {"user_id": user_id, "after_created_at": after_created_at,
+              "after_id": after_id, "limit": limit})
+
+    @_translated
+    def notifications(self, after: Optional[tuple] = None, limit: int = 25,
+                      archived: bool = False) -> List[Dict[str, Any]]:
+        return self._notification_page(None, after, limit, archived)
+
+    @_translated
+    def user_notifications(self, user_id: int, after: Optional[tuple] = None,
+                           limit: int = 25, archived: bool = False) -> List[Dict[str, Any]]:
+        return self._notification_page(user_id, after, limit, archived)
+
+    @_translated
+    def count_unread(self, user_id: int) -> int:
+        return self._row("""
+            SELECT COUNT(*) as Unread FROM notifications WHERE User_ID = ? AND is_read = 0
+        """, (user_id,))['Unread']
+
+    @_translated
+    def mark_notifications_read(self, notification_ids: Sequence[int]) -> None:
+        with self._write() as conn:
+            conn.executemany("UPDATE notifications SET is_read = 1 WHERE Notification_ID = ?",
+                             [(notification_id,) for notification_id in notification_ids])
+
+    # Complaints
+
+    @_translated
+    def create_complaint(self, operator_id: int, subject: str, message: str) -> None:
+        with self._write() as conn:
+            conn.execute("INSERT INTO complaints (Operator_ID, Subject, Message) VALUES (?, ?, ?)",
+                         (operator_id, subject, message))
+
+    @_translated
+    def complaints(self, status: Optional[str] = None, operator_id: Optional[int] = None,
+                   from_date: Optional[date] = None, to_date: Optional[date] = None,
+                   after: Optional[tuple] = None,
+                   limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        after_created_at, after_id = after or (None, None)
+        params = {"status": status, "operator_id": operator_id, "from_date": from_date,
+                  "to_end": to_date + timedelta(days=1) if to_date else None,
+                  "after_created_at": after_created_at, "after_id": after_id, "limit": limit}
+        filters = """
+            WHERE (:status IS NULL OR c.Status = :status)
+            AND (:operator_id IS NULL OR c.Operator_ID = :operator_id)
+            AND (:from_date IS NULL OR c.Created_At >= :from_date)
+            AND (:to_end IS NULL OR c.Created_At < :to_end)
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            complaints = conn.execute(f"""
+                SELECT c.Complaint_ID, c.Operator_ID, c.Subject, c.Message, c.Status,
+                       c.Created_At, o.Username as Operator_Name
+                FROM complaints c
+                JOIN Operators o ON c.Operator_ID = o.Operator_ID
+                {filters}
+                AND (:after_created_at IS NULL
+                     OR c.Created_At > :after_created_at
+                     OR (c.Created_At = :after_created_at AND c.Complaint_ID > :after_id))
+                ORDER BY c.Created_At, c.Complaint_ID
+                LIMIT :limit
+            """, params).fetchall()
+            total = conn.execute(f"SELECT COUNT(*) as Total FROM complaints c {filters}",
+                                 params).fetchone()['Total']
+        finally:
+            conn.execute("COMMIT")
+        return complaints, total
+
+    @_translated
+    def complaint_stats(self, sla_hours: int) -> List[Dict[str, Any]]:
+        return self._rows("""
+            SELECT Status,
+                   COUNT(*) as Total,
+                   SUM(Created_At < datetime('now', 'localtime', ?)) as Over_SLA,
+                   MIN(Created_At) as "Oldest_Created_At [TIMESTAMP]"
+            FROM complaints
+            GROUP BY Status
+        """, (f"-{int(sla_hours)} hours",))
+
+    @_translated
+    def update_complaints_status(self, complaint_ids: Sequence[int], status: str) -> int:
+        if not complaint_ids:
+            return 0
+        with self._write() as conn:
+            return conn.execute(f"""
+                UPDATE complaints SET Status = ?
+                WHERE Complaint_ID IN ({", ".join("?" * len(complaint_ids))})
+                AND Status <> ?
+            """, (status, *complaint_ids, status)).rowcount
+
+    # Accounts
+
+    @_translated
+    def list_operators(self) -> List[Dict[str, Any]]:
+        return self._rows("SELECT Operator_ID, Username FROM Operators ORDER BY Username")
+
+    @_translated
+    def find_account(self, kind: str, username: str) -> Optional[Dict[str, Any]]:
+        return self._row(ACCOUNTS[kind][0], (username,))
+
+    @_translated
+    def update_password(self, kind: str, account_id: int, new_hash: str, old_hash: str) -> bool:
+        with self._write() as conn:
+            return conn.execute(ACCOUNTS[kind][1], (new_hash, account_id, old_hash)).rowcount == 1
+
+    @_translated
+    def register_operator(self, username: str, password_hash: str, first_name: str,
+                          last_name: str, email: str) -> Dict[str, Any]:
+        with self._write() as conn:
+            exists = conn.execute("""
+                SELECT 1 FROM Operators WHERE Username = ? OR Email = ?
+            """, (username, email)).fetchone()
+            if exists:
+                return {'result': 'DUPLICATE'}
+            conn.execute("""
+                INSERT INTO Operators (Username, Password, First_Name, Last_Name, Email, Status)
+                VALUES (?, ?, ?, ?, ?, 'Active')
+            """, (username, password_hash, first_name, last_name, email))
+        return {'result': 'SUCCESS'}
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
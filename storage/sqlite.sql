@@ -0,0 +1,202 @@
+-- Schema for the embedded SQLite backend: the tables of d.sql that the
+-- storage interface uses, with the same names and columns. The stored
+-- procedures of d.sql are implemented in storage/sqlite.py.
+-- Seat_Map and Seat_Mask hold the 64-bit seat bitmaps as signed integers.
+-- Timestamps are local time, like MySQL's CURRENT_TIMESTAMP.
+
+CREATE TABLE IF NOT EXISTS users (
+    User_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Username VARCHAR(50) NOT NULL UNIQUE,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    Role VARCHAR(20) NOT NULL CHECK (Role IN ('user', 'operator', 'conductor')),
+    Created_At TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS bus_routes (
+    Route_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    RouteName VARCHAR(100) NOT NULL,
+    Source VARCHAR(100) NOT NULL,
+    Destination VARCHAR(100) NOT NULL,
+    Distance VARCHAR(50) NOT NULL,
+    Duration VARCHAR(50) NOT NULL,
+    Distance_Km REAL,
+    Duration_Hours REAL,
+    Fare REAL NOT NULL,
+    Seat_Capacity INTEGER NOT NULL DEFAULT 30 CHECK (Seat_Capacity BETWEEN 1 AND 64)
+);
+
+CREATE TABLE IF NOT EXISTS Administrators (
+    Admin_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Username VARCHAR(50) NOT NULL UNIQUE,
+    Password VARCHAR(256) NOT NULL,
+    Role VARCHAR(20) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Operators (
+    Operator_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Username VARCHAR(50) NOT NULL UNIQUE,
+    Password VARCHAR(255) NOT NULL,
+    First_Name VARCHAR(50) NOT NULL,
+    Last_Name VARCHAR(50) NOT NULL,
+    Email VARCHAR(100) NOT NULL UNIQUE,
+    Status VARCHAR(10) NOT NULL CHECK (Status IN ('Active', 'Inactive'))
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    Notification_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    User_ID INTEGER NOT NULL REFERENCES users(User_ID),
+    Message TEXT NOT NULL,
+    is_read BOOLEAN NOT NULL DEFAULT 0,
+    Created_At TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS complaints (
+    Complaint_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Operator_ID INTEGER NOT NULL REFERENCES Operators(Operator_ID),
+    Subject VARCHAR(200) NOT NULL,
+    Message TEXT NOT NULL,
+    Status VARCHAR(20) NOT NULL DEFAULT 'Pending'
+        CHECK (Status IN ('Pending', 'In Progress', 'Resolved')),
+    Created_At TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    Ticket_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Route_ID INTEGER NOT NULL REFERENCES bus_routes(Route_ID),
+    Passenger_Name VARCHAR(100) NOT NULL,
+    Passenger_Email VARCHAR(100) NOT NULL,
+    Passenger_Phone VARCHAR(20) NOT NULL,
+    Booking_Date DATE NOT NULL,
+    Number_Of_Seats INTEGER NOT NULL,
+    Total_Fare REAL NOT NULL,
+    Seat_Numbers VARCHAR(200),
+    Seat_Mask INTEGER NOT NULL DEFAULT 0,
+    Status VARCHAR(10) NOT NULL DEFAULT 'Booked' CHECK (Status IN ('Booked', 'Cancelled')),
+    Created_At TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS route_daily_stats (
+    Route_ID INTEGER NOT NULL REFERENCES bus_routes(Route_ID),
+    Stat_Date DATE NOT NULL,
+    Capacity INTEGER NOT NULL DEFAULT 0,
+    Bookings INTEGER NOT NULL DEFAULT 0,
+    Seats_Booked INTEGER NOT NULL DEFAULT 0,
+    Revenue REAL NOT NULL DEFAULT 0,
+    Cancellations INTEGER NOT NULL DEFAULT 0,
+    Seats_Cancelled INTEGER NOT NULL DEFAULT 0,
+    Refunds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (Route_ID, Stat_Date)
+);
+
+CREATE TABLE IF NOT EXISTS trips (
+    Trip_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Route_ID INTEGER NOT NULL REFERENCES bus_routes(Route_ID),
+    Travel_Date DATE NOT NULL,
+    Capacity INTEGER NOT NULL,
+    Available_Seats INTEGER NOT NULL,
+    Seat_Map INTEGER NOT NULL DEFAULT 0,
+    Held_Seats INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (Route_ID, Travel_Date)
+);
+
+CREATE TABLE IF NOT EXISTS seat_holds (
+    Hold_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Trip_ID INTEGER NOT NULL REFERENCES trips(Trip_ID),
+    Route_ID INTEGER NOT NULL,
+    Travel_Date DATE NOT NULL,
+    Number_Of_Seats INTEGER NOT NULL,
+    Seat_Numbers VARCHAR(200) NOT NULL,
+    Seat_Mask INTEGER NOT NULL,
+    Total_Fare REAL NOT NULL DEFAULT 0,
+    Held_By VARCHAR(100),
+    Status VARCHAR(10) NOT NULL DEFAULT 'Held'
+        CHECK (Status IN ('Held', 'Confirmed', 'Released', 'Expired')),
+    Ticket_ID INTEGER,
+    Created_At TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    Expires_At TIMESTAMP NOT NULL
+);
+
+-- Archived rows, read with archived=True. Nothing archives the SQLite
+-- backend yet; archiver.py works on the MySQL tables.
+CREATE TABLE IF NOT EXISTS tickets_archive (
+    Ticket_ID INTEGER PRIMARY KEY,
+    Route_ID INTEGER NOT NULL,
+    Passenger_Name VARCHAR(100) NOT NULL,
+    Passenger_Email VARCHAR(100) NOT NULL,
+    Passenger_Phone VARCHAR(20) NOT NULL,
+    Booking_Date DATE NOT NULL,
+    Number_Of_Seats INTEGER NOT NULL,
+    Total_Fare REAL NOT NULL,
+    Seat_Numbers VARCHAR(200),
+    Seat_Mask INTEGER NOT NULL DEFAULT 0,
+    Status VARCHAR(10),
+    Created_At TIMESTAMP,
+    Archived_At TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    Notification_ID INTEGER PRIMARY KEY,
+    User_ID INTEGER NOT NULL,
+    Message TEXT NOT NULL,
+    is_read BOOLEAN,
+    Created_At TIMESTAMP,
+    Archived_At TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS route_fares (
+    Route_ID INTEGER NOT NULL REFERENCES bus_routes(Route_ID),
+    Travel_Date DATE NOT NULL,
+    Min_Load REAL NOT NULL,
+    Fare REAL NOT NULL,
+    Group_Fare REAL NOT NULL,
+    Group_Min_Seats INTEGER NOT NULL,
+    PRIMARY KEY (Route_ID, Travel_Date, Min_Load)
+);
+
+CREATE INDEX IF NOT EXISTS idx_source_dest ON bus_routes(Source, Destination);
+CREATE INDEX IF NOT EXISTS idx_notification_user ON notifications(User_ID, is_read);
+CREATE INDEX IF NOT EXISTS idx_notification_date ON notifications(Created_At, Notification_ID);
+CREATE INDEX IF NOT EXISTS idx_notification_user_date ON notifications(User_ID, Created_At, Notification_ID);
+CREATE INDEX IF NOT EXISTS idx_ticket_route_created ON tickets(Route_ID, Created_At, Ticket_ID);
+CREATE INDEX IF NOT EXISTS idx_ticket_route_date ON tickets(Route_ID, Booking_Date, Status);
+CREATE INDEX IF NOT EXISTS idx_trip_date ON trips(Travel_Date, Route_ID, Available_Seats);
+CREATE INDEX IF NOT EXISTS idx_hold_expiry ON seat_holds(Status, Expires_At);
+CREATE INDEX IF NOT EXISTS idx_hold_trip ON seat_holds(Route_ID, Travel_Date, Status);
+CREATE INDEX IF NOT EXISTS idx_complaint_status ON complaints(Status, Created_At, Complaint_ID);
+CREATE INDEX IF NOT EXISTS idx_complaint_operator ON complaints(Operator_ID, Created_At, Complaint_ID);
+CREATE INDEX IF NOT EXISTS idx_complaint_created ON complaints(Created_At, Complaint_ID);
+CREATE INDEX IF NOT EXISTS idx_fare_date ON route_fares(Travel_Date);
+CREATE INDEX IF NOT EXISTS idx_archive_ticket_route_created ON tickets_archive(Route_ID, Created_At, Ticket_ID);
+CREATE INDEX IF NOT EXISTS idx_archive_notification_date ON notifications_archive(Created_At, Notification_ID);
+CREATE INDEX IF NOT EXISTS idx_archive_notification_user_date ON notifications_archive(User_ID, Created_At, Notification_ID);
+
+-- Initial data, as in d.sql. The admin and operator passwords are legacy
+-- SHA-256 digests of "123", rehashed with the current KDF on first login.
+INSERT OR IGNORE INTO Administrators (Username, Password, Role)
+VALUES ('admin', 'a665a45920422f9d417e4867efdc4fb8a04a1f3fff1fa07e998e86f7f7a27ae3', 'administrator');
+
+INSERT OR IGNORE INTO Operators (Username, Password, First_Name, Last_Name, Email, Status)
+VALUES ('testoperator', 'a665a45920422f9d417e4867efdc4fb8a04a1f3fff1fa07e998e86f7f7a27ae3',
+        'Test', 'Operator', 'testoperator@example.com', 'Active');
+
+INSERT OR IGNORE INTO users (Username, email, password, Role)
+VALUES
+    ('testuser1', 'test1@example.com', 'scrypt$16384$8$1$RnP/fsrGE5igmEel2Ajsiw$jZoqlop3MlWHoXL1augf8B2n+Z3ADcKPfQ3UXkuV2sA', 'user'),
+    ('operator1', 'operator1@example.com', 'scrypt$16384$8$1$KW3MHIFsFYi3+/9d1nczDg$PIox2GSyaVARJ7iOmbIlGWPP0h9wxHFGjoSEtuAc8BM', 'operator'),
+    ('conductor1', 'conductor1@example.com', 'scrypt$16384$8$1$DiMJt5LNTqN/E7Zos70N7A$sSPkUOF2IZ0oh7wUh34i9KgbdGtfT6HWlPrHEL7mzVw', 'conductor');
+
+INSERT INTO notifications (User_ID, Message)
+SELECT User_ID, 'Welcome to the Bus Management System!'
+FROM users
+WHERE Username IN ('testuser1', 'operator1', 'conductor1')
+AND NOT EXISTS (SELECT 1 FROM notifications);
+
+INSERT INTO bus_routes (RouteName, Source, Destination, Distance, Duration,
+                        Distance_Km, Duration_Hours, Fare, Seat_Capacity)
+SELECT * FROM (
+    VALUES ('Express-1', 'Bangalore', 'Mysore', '150 km', '3.5 hours', 150, 3.5, 450.00, 30),
+           ('Express-2', 'Bangalore', 'Hassan', '180 km', '4 hours', 180, 4, 500.00, 30),
+           ('Super-1', 'Mysore', 'Mangalore', '250 km', '6 hours', 250, 6, 750.00, 30)
+)
+WHERE NOT EXISTS (SELECT 1 FROM bus_routes);
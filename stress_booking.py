@@ -0,0 +1,140 @@
+"""
+Concurrent booking stress test against a local MySQL/MariaDB bus_mgmt database.
+
+Creates a fresh route, fires bookings (and optionally cancellations) at its
+trips over a few travel dates from many threads, then checks every trip:
+no seat is held by two tickets and the seats handed out never exceed the
+capacity.
+
+    python stress_booking.py --threads 32 --attempts 2000 --days 5
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from mysql.connector import Error
+
+from booking import book_seats, cancel_booking
+from db import create_pool, load_database_config
+from seats import MAX_SEATS
+
+
+def create_stress_route(pool, capacity: int) -> int:
+    """Insert a throwaway route with the given number of seats per trip."""
+    with pool.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO bus_routes (RouteName, Source, Destination, Distance,
+                                    Duration, Fare, Seat_Capacity)
+            VALUES (%s, 'Stress', 'Test', '1 km', '1 hours', 100.00, %s)
+        """, (f"Stress-{int(time.time())}", capacity))
+        conn.commit()
+        return cursor.lastrowid
+
+
+def check_route(pool, route_id: int) -> list:
+    """Compare each trip's seat map with the tickets actually held on it."""
+    with pool.connection() as conn, conn.cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT tr.Travel_Date, tr.Capacity, tr.Available_Seats, tr.Seat_Map,
+                   COALESCE(SUM(t.Number_Of_Seats), 0) AS Booked_Seats,
+                   BIT_OR(t.Seat_Mask) AS Booked_Map
+            FROM trips tr
+            LEFT JOIN tickets t ON t.Route_ID = tr.Route_ID
+                AND t.Booking_Date = tr.Travel_Date AND t.Status = 'Booked'
+            WHERE tr.Route_ID = %s
+            GROUP BY tr.Trip_ID
+        """, (route_id,))
+        rows = cursor.fetchall()
+
+    checks = []
+    for row in rows:
+        capacity, booked = int(row['Capacity']), int(row['Booked_Seats'])
+        seat_map = int(row['Seat_Map'])
+        checks.append({
+            "travel_date": row['Travel_Date'],
+            "capacity": capacity,
+            "booked_seats": booked,
+            "available_seats": int(row['Available_Seats']),
+            "oversold": max(0, booked - capacity),
+            # No seat given to two tickets, and the trip's map agrees with them
+            "consistent": (bin(seat_map).count("1") == booked
+                           and int(row['Booked_Map'] or 0) == seat_map
+                           and int(row['Available_Seats']) == capacity - booked),
+        })
+    return checks
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=1000,
+                        help="total booking attempts across all threads")
+    parser.add_argument("--capacity", type=int, default=40,
+                        help=f"seats per trip (at most {MAX_SEATS})")
+    parser.add_argument("--days", type=int, default=3,
+                        help="number of travel dates the bookings are spread over")
+    parser.add_argument("--max-seats", type=int, default=4,
+                        help="each booking asks for 1..max-seats seats")
+    parser.add_argument("--cancel-ratio", type=float, default=0.1,
+                        help="fraction of successful bookings cancelled again")
+    args = parser.parse_args(argv)
+
+    config = load_database_config()
+    config.pool_size = max(config.pool_size, args.threads)
+    pool = create_pool(config)
+    route_id = create_stress_route(pool, args.capacity)
+
+    counts = {"booked": 0, "rejected": 0, "cancelled": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def attempt(i: int) -> None:
+        rng = random.Random(i)
+        outcome = "errors"
+        try:
+            travel_date = date.today() + timedelta(days=rng.randrange(args.days))
+            result = book_seats(pool, route_id, f"Passenger {i}", f"p{i}@example.com",
+                                "0000000000", travel_date, rng.randint(1, args.max_seats))
+            if result and result['result'] == 'SUCCESS':
+                outcome = "booked"
+                if rng.random() < args.cancel_ratio:
+                    cancelled = cancel_booking(pool, result['Ticket_ID'])
+                    if cancelled and cancelled['result'] == 'SUCCESS':
+                        with lock:
+                            counts["cancelled"] += 1
+            else:
+                outcome = "rejected"
+        except Error as e:
+            print(f"attempt {i} failed: {e}", file=sys.stderr)
+        with lock:
+            counts[outcome] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(attempt, range(args.attempts)))
+    elapsed = time.perf_counter() - start
+
+    checks = check_route(pool, route_id)
+    print(f"route {route_id}: {args.attempts} attempts on {args.threads} threads in {elapsed:.2f}s")
+    print(f"  booked={counts['booked']} rejected={counts['rejected']} "
+          f"cancelled={counts['cancelled']} errors={counts['errors']}")
+    print(f"  bookings/sec={counts['booked'] / elapsed:.1f} attempts/sec={args.attempts / elapsed:.1f}")
+    for check in checks:
+        print(f"  {check['travel_date']}: seats booked={check['booked_seats']} "
+              f"available={check['available_seats']} capacity={check['capacity']} "
+              f"oversold={check['oversold']}")
+    print(f"  pool: {pool.stats()}")
+    pool.close()
+
+    if any(not c["consistent"] or c["oversold"] for c in checks):
+        print("FAIL: seat maps and tickets disagree", file=sys.stderr)
+        return 1
+    print("OK: no oversells")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
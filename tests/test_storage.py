@@ -0,0 +1,179 @@
+"""
+The storage contract, run against every backend.
+
+SQLite runs on a fresh file per test. MySQL runs only with BUS_TEST_MYSQL=1,
+against the database of the BUS_DB_* settings loaded from d.sql; each test
+works on its own route, travel date and operator, so it can share that
+database with other data.
+"""
+import os
+import threading
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from config import load_database_config
+from storage import create_storage
+
+TRAVEL_DATE = date.today() + timedelta(days=30)
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def storage(request, tmp_path):
+    if request.param == "mysql":
+        if os.environ.get("BUS_TEST_MYSQL") != "1":
+            pytest.skip("set BUS_TEST_MYSQL=1 to run against the BUS_DB_* MySQL server")
+        pytest.importorskip("mysql.connector")
+    storage = create_storage(load_database_config({
+        "backend": request.param,
+        "sqlite_path": str(tmp_path / "bus_mgmt.db"),
+        "profile": False,
+    }))
+    yield storage
+    storage.close()
+
+
+def create_route(storage, seats: int = 10) -> int:
+    name = f"Test-{uuid.uuid4().hex[:12]}"
+    return storage.create_route({
+        'RouteName': name, 'Source': f"{name} A", 'Destination': f"{name} B",
+        'Distance': "100 km", 'Duration': "2 hours", 'Distance_Km': 100,
+        'Duration_Hours': 2, 'Fare': 250, 'Seat_Capacity': seats,
+    })
+
+
+def create_operator(storage) -> int:
+    username = f"op_{uuid.uuid4().hex[:12]}"
+    assert storage.register_operator(username, "hash", "Test", "Operator",
+                                     f"{username}@example.com")['result'] == 'SUCCESS'
+    return storage.find_account("operator", username)['Operator_ID']
+
+
+def book(storage, route_id: int, seats: int = 1):
+    return storage.book_ticket(route_id, "Passenger", "p@example.com", "5550100",
+                               TRAVEL_DATE, seats)
+
+
+def test_concurrent_bookings_never_oversell(storage):
+    route_id = create_route(storage, seats=10)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(3):
+            result = book(storage, route_id, seats=2)
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    booked = [r for r in results if r['result'] == 'SUCCESS']
+    assert len(booked) == 5
+    assert all(r['result'] == 'INSUFFICIENT_SEATS' for r in results if r not in booked)
+    seats = [seat for r in booked for seat in r['Seat_Numbers'].split(",")]
+    assert sorted(map(int, seats)) == list(range(1, 11))
+    assert storage.availability(TRAVEL_DATE)[route_id] == 0
+
+
+def test_cancel_releases_seats_once(storage):
+    route_id = create_route(storage, seats=10)
+    ticket = book(storage, route_id, seats=3)
+    book(storage, route_id, seats=2)
+    assert storage.availability(TRAVEL_DATE)[route_id] == 5
+
+    assert storage.cancel_ticket(ticket['Ticket_ID'])['result'] == 'SUCCESS'
+    assert storage.cancel_ticket(ticket['Ticket_ID'])['result'] == 'ALREADY_CANCELLED'
+    assert storage.availability(TRAVEL_DATE)[route_id] == 8
+    # The freed seats are the ones handed out next
+    assert book(storage, route_id, seats=3)['Seat_Numbers'] == "1,2,3"
+
+
+def test_hold_lifecycle(storage):
+    route_id = create_route(storage, seats=10)
+
+    hold = storage.hold_seats(route_id, TRAVEL_DATE, 3, "tester", 600)
+    assert hold['result'] == 'SUCCESS'
+    assert storage.availability(TRAVEL_DATE)[route_id] == 7
+    confirmed = storage.confirm_hold(hold['Hold_ID'], "Passenger", "p@example.com", "5550100")
+    assert confirmed['result'] == 'SUCCESS'
+    again = storage.confirm_hold(hold['Hold_ID'], "Passenger", "p@example.com", "5550100")
+    assert (again['result'], again['Ticket_ID']) == ('SUCCESS', confirmed['Ticket_ID'])
+    assert storage.availability(TRAVEL_DATE)[route_id] == 7
+
+    hold = storage.hold_seats(route_id, TRAVEL_DATE, 2, "tester", 600)
+    assert storage.release_hold(hold['Hold_ID'])['result'] == 'SUCCESS'
+    assert storage.release_hold(hold['Hold_ID'])['result'] == 'NOT_HELD'
+    assert storage.availability(TRAVEL_DATE)[route_id] == 7
+
+    hold = storage.hold_seats(route_id, TRAVEL_DATE, 4, "tester", 0)
+    assert storage.availability(TRAVEL_DATE)[route_id] == 3
+    expired = storage.confirm_hold(hold['Hold_ID'], "Passenger", "p@example.com", "5550100")
+    assert expired['result'] == 'HOLD_EXPIRED'
+    assert (route_id, TRAVEL_DATE) in storage.expire_holds()
+    assert storage.availability(TRAVEL_DATE)[route_id] == 7
+
+
+def test_route_tickets_keyset_pages(storage):
+    route_id = create_route(storage, seats=10)
+    ticket_ids = [book(storage, route_id)['Ticket_ID'] for _ in range(5)]
+    storage.cancel_ticket(ticket_ids[0])
+
+    seen, after = [], None
+    while True:
+        page, total = storage.route_tickets(route_id, after=after, limit=2)
+        assert total == 5
+        if not page:
+            break
+        assert len(page) <= 2
+        seen.extend(t['Ticket_ID'] for t in page)
+        after = (page[-1]['Created_At'], page[-1]['Ticket_ID'])
+    assert seen == sorted(ticket_ids, reverse=True)
+
+    booked, total = storage.route_tickets(route_id, status='Booked')
+    assert total == 4 and ticket_ids[0] not in {t['Ticket_ID'] for t in booked}
+    assert storage.route_tickets(route_id, from_date=TRAVEL_DATE + timedelta(days=1)) == ([], 0)
+
+
+def test_complaint_filters(storage):
+    operator_id = create_operator(storage)
+    other_id = create_operator(storage)
+    for i in range(3):
+        storage.create_complaint(operator_id, f"Subject {i}", "Message")
+    storage.create_complaint(other_id, "Other", "Message")
+
+    mine, total = storage.complaints(operator_id=operator_id)
+    assert total == 3
+    assert {c['Operator_ID'] for c in mine} == {operator_id}
+    assert storage.update_complaints_status([mine[0]['Complaint_ID']], 'Resolved') == 1
+
+    pending, total = storage.complaints(status='Pending', operator_id=operator_id)
+    assert total == 2 and all(c['Status'] == 'Pending' for c in pending)
+    resolved, total = storage.complaints(status='Resolved', operator_id=operator_id)
+    assert [c['Complaint_ID'] for c in resolved] == [mine[0]['Complaint_ID']]
+
+    today = date.today()
+    assert storage.complaints(operator_id=operator_id, to_date=today)[1] == 3
+    assert storage.complaints(operator_id=operator_id,
+                              from_date=today + timedelta(days=1)) == ([], 0)
+
+    first, total = storage.complaints(operator_id=operator_id, limit=2)
+    rest, _ = storage.complaints(operator_id=operator_id, limit=2,
+                                 after=(first[-1]['Created_At'], first[-1]['Complaint_ID']))
+    assert total == 3
+    assert [c['Complaint_ID'] for c in first + rest] == [c['Complaint_ID'] for c in mine]
+
+
+def test_delete_fares_before(storage):
+    route_id = create_route(storage)
+    today = date.today()
+    for day in (today - timedelta(days=2), today - timedelta(days=1), today):
+        storage.save_fares(day, [(route_id, 0.0, 225, 200, 4), (route_id, 0.5, 250, 225, 4)])
+
+    assert storage.delete_fares_before(today) >= 4
+    assert storage.fares(today - timedelta(days=1)) == []
+    assert len([f for f in storage.fares(today) if f['Route_ID'] == route_id]) == 2